@@ -0,0 +1,61 @@
+"""Open vector layers inside downloaded ZIP archives without extracting them.
+
+The layer is located from the archive's member listing (no directory walk)
+and handed to pyogrio/GDAL as a ``/vsizip/`` path, so shapefiles and
+GeoJSON are read straight out of the archive.  A GeoPackage is an SQLite
+database that needs random access, which GDAL can only emulate on a
+compressed member by re-inflating from the start; such members are
+extracted once into ``EXTRACT_DIR`` (keyed by archive size and mtime) and
+reused on later runs.
+"""
+import os
+import shutil
+import zipfile
+
+EXTRACT_DIR = "data/cache/extracted"
+
+# Layer formats in order of preference
+LAYER_EXTENSIONS = ('.gpkg', '.shp', '.geojson', '.json')
+
+
+def find_layer_member(zip_path, extensions=LAYER_EXTENSIONS):
+    """Name of the best layer member in ``zip_path``, or ``None``."""
+    with zipfile.ZipFile(zip_path) as zf:
+        names = [name for name in zf.namelist()
+                 if not name.startswith('__MACOSX/') and not name.endswith('/')]
+    for ext in extensions:
+        matches = sorted(name for name in names if name.lower().endswith(ext))
+        if matches:
+            return matches[0]
+    return None
+
+
+def vsizip_path(zip_path, member):
+    return f"/vsizip/{os.path.abspath(zip_path)}/{member}"
+
+
+def _extract_once(zip_path, member, extract_dir=EXTRACT_DIR):
+    stat = os.stat(zip_path)
+    stem = os.path.splitext(os.path.basename(zip_path))[0]
+    target_dir = os.path.join(extract_dir, f"{stem}-{stat.st_size}-{int(stat.st_mtime)}")
+    target = os.path.join(target_dir, member)
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with zipfile.ZipFile(zip_path) as zf, zf.open(member) as src, \
+                open(target + ".tmp", "wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        os.replace(target + ".tmp", target)
+    return target
+
+
+def open_layer(zip_path, extensions=LAYER_EXTENSIONS, extract_dir=EXTRACT_DIR):
+    """Path pyogrio/geopandas can read for the layer inside ``zip_path``."""
+    member = find_layer_member(zip_path, extensions)
+    if member is None:
+        raise FileNotFoundError(f"No {'/'.join(extensions)} layer in {zip_path}")
+    if member.lower().endswith('.gpkg'):
+        with zipfile.ZipFile(zip_path) as zf:
+            stored = zf.getinfo(member).compress_type == zipfile.ZIP_STORED
+        if not stored:
+            return _extract_once(zip_path, member, extract_dir)
+    return vsizip_path(zip_path, member)
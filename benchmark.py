@@ -0,0 +1,277 @@
+"""Benchmark harness for the county map pipeline.
+
+Generates a synthetic boundary layer (irregular polygons in the spirit of
+``create_irregular_shape`` in ``uk_counties_real_data.py``, vectorised so
+it scales to thousands of polygons and millions of vertices), writes it as
+an ONS-style GeoPackage and times each pipeline stage separately:
+
+* ``read``            GeoPackage read (pyogrio, Arrow path when available)
+* ``name_detection``  name/code column detection and ``CountyIndex`` build
+* ``cache_build``     projection + level-of-detail cache (``build_cache``)
+* ``prep``            cached layer load + ``LodPaths`` conversion of the
+  levels the sampled counties use
+* ``draw``            per-county ``draw_county`` up to the fitted image
+  (sampled counties)
+* ``encode``          per-county PNG encode and write of that image
+* ``overview_draw`` / ``overview_encode``  the whole-layer ``render_overviews``
+* ``index_write``     manifest digests + MANIFEST.json + ``write_file_index``
+
+The draw stages call the production functions of
+``generate_all_counties_dark`` with an image-capturing writer in place of
+``ImageWriter``, so drawing and encoding are timed separately.
+
+Each stage runs ``--repeat`` times (``draw``/``encode`` once per sampled
+county per pass); the JSON report holds every run, the median and the
+library versions.  ``--compare BASELINE.json`` checks the
+new medians against an earlier report and exits non-zero when any stage is
+more than ``--threshold`` slower, e.g. after bumping matplotlib/geopandas::
+
+    python benchmark.py --counties 2000 --vertices 1000 --output base.json
+    python benchmark.py --counties 2000 --vertices 1000 --compare base.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import geopandas as gpd
+import matplotlib
+import numpy as np
+import pyogrio
+import shapely
+from PIL import Image
+
+from county_index import CountyIndex, find_name_column
+from generate_all_counties_dark import (DEFAULT_VARIANT, OVERVIEW_NAME, county_filename,
+                                        draw_county, make_renderer, render_overviews,
+                                        variant_digests, write_file_index)
+from geometry_cache import build_cache, load_boundaries, pick_tolerance, read_layer
+from geometry_paths import LodPaths
+from image_output import DEFAULT_FORMAT
+from render_manifest import RenderManifest
+
+# British National Grid extent the synthetic counties are spread over
+SYNTHETIC_EXTENT = (100_000, 0, 650_000, 1_000_000)
+
+
+def synthetic_boundaries(counties=200, vertices=200, seed=0):
+    """ONS-style layer of ``counties`` non-overlapping irregular polygons.
+
+    Each polygon has ``vertices`` points with randomised radii around a
+    cell of a grid covering ``SYNTHETIC_EXTENT``; every fifth one gets a
+    hole so ring handling is exercised too.
+    """
+    rng = np.random.default_rng(seed)
+    cols = int(np.ceil(np.sqrt(counties)))
+    rows = int(np.ceil(counties / cols))
+    minx, miny, maxx, maxy = SYNTHETIC_EXTENT
+    cell = min((maxx - minx) / cols, (maxy - miny) / rows)
+
+    i = np.arange(counties)
+    centers = np.column_stack([minx + (i % cols + 0.5) * cell, miny + (i // cols + 0.5) * cell])
+    angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+    radii = cell * 0.45 * (0.7 + 0.3 * rng.random((counties, vertices)))
+    coords = np.empty((counties, vertices + 1, 2))
+    coords[:, :-1, 0] = centers[:, [0]] + radii * np.cos(angles)
+    coords[:, :-1, 1] = centers[:, [1]] + radii * np.sin(angles)
+    coords[:, -1] = coords[:, 0]
+    shells = shapely.linearrings(coords)
+
+    # Inner ring at a fraction of the minimum radius, wound the other way
+    hole_coords = np.empty((counties, 9, 2))
+    hole_angles = np.linspace(2 * np.pi, 0, 9)
+    hole_coords[:, :, 0] = centers[:, [0]] + cell * 0.1 * np.cos(hole_angles)
+    hole_coords[:, :, 1] = centers[:, [1]] + cell * 0.1 * np.sin(hole_angles)
+    holes = shapely.linearrings(hole_coords)
+    with_hole = i % 5 == 0
+    polygons = shapely.polygons(shells)
+    polygons[with_hole] = shapely.polygons(shells[with_hole], holes[with_hole, None])
+
+    return gpd.GeoDataFrame({
+        'CTYUA23CD': [f"E{6000000 + n:08d}" for n in i],
+        'CTYUA23NM': [f"Synthetic County {n + 1}" for n in i],
+    }, geometry=polygons, crs="EPSG:27700")
+
+
+class StageTimer:
+    """Collects wall-clock timings per named stage."""
+
+    def __init__(self):
+        self.runs = defaultdict(list)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.runs[name].append(time.perf_counter() - start)
+
+    def report(self):
+        return {name: {"median": statistics.median(runs), "min": min(runs), "runs": runs}
+                for name, runs in self.runs.items()}
+
+
+class CaptureWriter:
+    """``ImageWriter`` stand-in that keeps the submitted images instead of encoding them."""
+
+    def __init__(self):
+        self.images = []
+
+    def submit(self, image, target, dpi, key=None):
+        self.images.append((image, target, dpi))
+
+    def encode(self, output_format=DEFAULT_FORMAT):
+        for image, target, dpi in self.images:
+            output_format.encode(image, target, dpi)
+        self.images = []
+
+
+def run_pipeline(source, workdir, timer, engine='matplotlib', sample=20, overview=True):
+    """One timed pass over every stage; returns the number of counties drawn."""
+    cache_dir = os.path.join(workdir, "cache")
+    output_dir = os.path.join(workdir, "output")
+    os.makedirs(output_dir, exist_ok=True)
+    variant = DEFAULT_VARIANT
+
+    with timer.stage("read"):
+        raw = read_layer(source)
+
+    with timer.stage("name_detection"):
+        find_name_column(raw)
+        CountyIndex(raw)
+
+    with timer.stage("cache_build"):
+        build_cache(source, cache_dir)
+
+    with timer.stage("prep"):
+        gdf = load_boundaries(source, cache_dir=cache_dir, columns=['code', 'name'])
+        lod = LodPaths(source, gdf.geometry.values, cache_dir=cache_dir)
+        indices = np.linspace(0, len(gdf) - 1, min(sample, len(gdf))).astype(int)
+        for idx in indices:
+            lod.level(pick_tolerance(lod.bounds[idx], variant.figsize, variant.dpi))
+
+    names = gdf['name'].tolist()
+    renderer = make_renderer(engine)
+    writer = CaptureWriter()
+
+    for idx in indices:
+        target = os.path.join(output_dir, county_filename(idx, names[idx]))
+        with timer.stage("draw"):
+            draw_county(renderer, idx, lod, names[idx], [(variant, target)], crs=gdf.crs,
+                        writer=writer)
+        with timer.stage("encode"):
+            writer.encode()
+
+    if overview:
+        with timer.stage("overview_draw"):
+            render_overviews(gdf, lod, [(variant, os.path.join(output_dir, OVERVIEW_NAME))],
+                             writer=writer)
+        with timer.stage("overview_encode"):
+            writer.encode()
+
+    with timer.stage("index_write"):
+        manifest = RenderManifest(output_dir)
+        digests = variant_digests(gdf.geometry.values, names, variant, engine, DEFAULT_FORMAT)
+        filenames = [county_filename(idx, name) for idx, name in enumerate(names)]
+        for filename, digest in zip(filenames, digests):
+            manifest.record(filename, digest)
+        manifest.save()
+        write_file_index(output_dir, variant)
+    return len(indices)
+
+
+def library_versions():
+    return {"python": platform.python_version(), "numpy": np.__version__,
+            "shapely": shapely.__version__, "geopandas": gpd.__version__,
+            "pyogrio": pyogrio.__version__, "matplotlib": matplotlib.__version__,
+            "pillow": Image.__version__}
+
+
+def run_benchmark(counties=200, vertices=200, repeat=3, sample=20, engine='matplotlib',
+                  overview=True, seed=0):
+    timer = StageTimer()
+    with tempfile.TemporaryDirectory(prefix="county-bench-") as workdir:
+        source = os.path.join(workdir, "synthetic.gpkg")
+        synthetic_boundaries(counties, vertices, seed).to_file(source, driver="GPKG")
+        for run in range(repeat):
+            run_dir = os.path.join(workdir, f"run{run}")
+            drawn = run_pipeline(source, run_dir, timer, engine, sample, overview)
+
+    return {
+        "params": {"counties": counties, "vertices": vertices, "repeat": repeat,
+                   "sample": drawn, "engine": engine, "overview": overview, "seed": seed},
+        "versions": library_versions(),
+        "stages": timer.report(),
+    }
+
+
+def compare(report, baseline, threshold=0.10):
+    """Print per-stage median ratios; returns the stages slower than ``threshold``."""
+    if report["params"] != baseline["params"]:
+        print(f"⚠️ Parameters differ from baseline: {baseline['params']}")
+    for lib, version in report["versions"].items():
+        if baseline["versions"].get(lib) != version:
+            print(f"📦 {lib}: {baseline['versions'].get(lib)} -> {version}")
+
+    regressions = []
+    print(f"\n{'stage':<18}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for stage, result in report["stages"].items():
+        base = baseline["stages"].get(stage)
+        if base is None:
+            print(f"{stage:<18}{'-':>12}{result['median']:>11.4f}s{'new':>8}")
+            continue
+        ratio = result["median"] / base["median"] if base["median"] else float('inf')
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(stage)
+            flag = "  ❌"
+        print(f"{stage:<18}{base['median']:>11.4f}s{result['median']:>11.4f}s{ratio:>7.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the county map pipeline")
+    parser.add_argument("--counties", type=int, default=200, help="Synthetic polygons")
+    parser.add_argument("--vertices", type=int, default=200, help="Vertices per polygon")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes per stage")
+    parser.add_argument("--sample", type=int, default=20, help="Counties drawn per pass")
+    parser.add_argument("--engine", choices=('matplotlib', 'raster'), default='matplotlib')
+    parser.add_argument("--no-overview", action="store_true", help="Skip the overview stages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Earlier report to check against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Allowed slowdown per stage before --compare fails (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.counties, args.vertices, args.repeat, args.sample,
+                           args.engine, not args.no_overview, args.seed)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f"📄 Benchmark report saved: {args.output}")
+    elif not args.compare:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} stage(s) slower than baseline by more than "
+                  f"{args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\n✅ No stage slower than baseline by more than {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Download layer for the boundary datasets.
+
+Every script fetches through ``fetch`` (or ``source_probe.resolve`` for
+several mirrors) instead of pulling whole archives into memory:
+
+* one keep-alive ``requests.Session`` with a pooled adapter is shared by
+  all downloads,
+* bodies stream straight to ``<dest>.part`` in 1 MiB chunks,
+* an interrupted ``.part`` resumes with an HTTP ``Range`` request
+  (guarded by ``If-Range`` on the ETag, so a changed file restarts); a
+  partial response that does not start where the ``.part`` ends also
+  restarts, and a ``.part`` that was already complete (HTTP 416) is
+  verified and finished,
+* a finished file gets a ``<dest>.meta.json`` sidecar with its URL, ETag,
+  SHA-256, size and mtime, and later calls return the local copy without
+  touching the network; it is only re-hashed when its size or mtime changed.
+
+URLs are taken as given, so everything works against a local HTTP server.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+
+DOWNLOAD_DIR = "data/downloads"
+CHUNK_SIZE = 1 << 20  # 1 MiB
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class FetchError(Exception):
+    pass
+
+
+class FetchCancelled(FetchError):
+    pass
+
+
+def get_session():
+    """Process-wide keep-alive session with a connection pool per host."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=2)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def default_dest(url, download_dir=DOWNLOAD_DIR):
+    """Stable local path for ``url``: ``<download_dir>/<urlhash>-<basename>``."""
+    basename = os.path.basename(url.split("?", 1)[0].rstrip("/")) or "download"
+    return os.path.join(download_dir, f"{hashlib.sha1(url.encode()).hexdigest()[:12]}-{basename}")
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+def _stamp(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def cached(url, dest=None, sha256=None):
+    """Path of a verified local copy of ``url``, or ``None``.
+
+    The SHA-256 is only recomputed when the file's size or mtime differs
+    from the sidecar's; a copy that still matches is re-stamped.
+    """
+    dest = dest or default_dest(url)
+    meta = _read_json(dest + ".meta.json")
+    if meta is None or meta.get("url") != url or not os.path.exists(dest):
+        return None
+    if sha256 is not None and meta.get("sha256") != sha256:
+        return None
+    stamp = _stamp(dest)
+    if stamp == {"size": meta.get("size"), "mtime": meta.get("mtime")}:
+        return dest
+    if stamp["size"] != meta.get("size") or file_sha256(dest) != meta.get("sha256"):
+        return None
+    _write_json(dest + ".meta.json", {**meta, **stamp})
+    return dest
+
+
+def _range_start(content_range):
+    """First byte of a ``bytes START-END/TOTAL`` Content-Range, or ``None``."""
+    unit, _, spec = content_range.partition(" ")
+    start = spec.partition("-")[0]
+    return int(start) if unit == "bytes" and start.isdigit() else None
+
+
+def _finish(url, dest, digest, etag, sha256):
+    """Check the finished ``.part`` against ``sha256`` and move it into place."""
+    part_path, part_meta_path = dest + ".part", dest + ".part.json"
+    if sha256 is not None and digest != sha256:
+        os.remove(part_path)
+        os.remove(part_meta_path)
+        raise FetchError(f"SHA-256 mismatch for {url}: expected {sha256}, got {digest}")
+
+    os.replace(part_path, dest)
+    os.remove(part_meta_path)
+    _write_json(dest + ".meta.json", {"url": url, "etag": etag, "sha256": digest,
+                                      **_stamp(dest)})
+    return dest
+
+
+def fetch(url, dest=None, sha256=None, timeout=30, session=None,
+          cancel=None, progress=True):
+    """Download ``url`` to ``dest`` (resuming/caching as described above).
+
+    ``sha256`` optionally pins the expected digest; ``cancel`` is a
+    ``threading.Event`` that aborts the transfer between chunks.
+    """
+    dest = dest or default_dest(url)
+    path = cached(url, dest, sha256)
+    if path is not None:
+        return path
+
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    session = session or get_session()
+    part_path, part_meta_path = dest + ".part", dest + ".part.json"
+
+    # Resume a previous partial download of the same URL
+    headers = {}
+    offset = 0
+    part_meta = _read_json(part_meta_path)
+    if part_meta and part_meta.get("url") == url and os.path.exists(part_path):
+        offset = os.path.getsize(part_path)
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            if part_meta.get("etag"):
+                headers["If-Range"] = part_meta["etag"]
+
+    with session.get(url, stream=True, timeout=timeout, headers=headers) as r:
+        if r.status_code == 416 and offset:
+            # Nothing left to send: the .part is complete if it has the full size
+            total = r.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit() and int(total) == offset:
+                return _finish(url, dest, file_sha256(part_path), part_meta.get("etag"), sha256)
+            os.remove(part_path)
+            os.remove(part_meta_path)
+            return fetch(url, dest, sha256, timeout, session, cancel, progress)
+        if r.status_code == 206:
+            content_range = r.headers.get("Content-Range", "")
+            if _range_start(content_range) != offset:
+                if not offset:
+                    raise FetchError(f"Unexpected Content-Range {content_range!r} for {url}")
+                # Not the continuation of the .part: appending would corrupt it
+                r.close()
+                os.remove(part_path)
+                os.remove(part_meta_path)
+                return fetch(url, dest, sha256, timeout, session, cancel, progress)
+            mode = "ab" if offset else "wb"
+        elif r.status_code == 200:
+            mode, offset = "wb", 0
+        else:
+            raise FetchError(f"HTTP {r.status_code} for {url}")
+
+        etag = r.headers.get("ETag")
+        _write_json(part_meta_path, {"url": url, "etag": etag})
+
+        h = hashlib.sha256()
+        if offset:
+            with open(part_path, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    h.update(chunk)
+
+        total = int(r.headers.get("content-length", 0)) + offset
+        with open(part_path, mode) as f, tqdm(
+            total=total or None, initial=offset, unit='B', unit_scale=True,
+            desc=os.path.basename(dest), disable=not progress
+        ) as bar:
+            for chunk in r.iter_content(CHUNK_SIZE):
+                if cancel is not None and cancel.is_set():
+                    raise FetchCancelled(url)
+                f.write(chunk)
+                h.update(chunk)
+                bar.update(len(chunk))
+
+    return _finish(url, dest, h.hexdigest(), etag, sha256)
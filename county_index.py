@@ -0,0 +1,95 @@
+"""Lookup index over a loaded boundary layer, keyed by GSS code and name.
+
+Builds plain dicts from GSS code (``CTYUA23CD``/``CTYUA21CD``) and from a
+normalised name to row positions, so selecting one area or a subset such as
+"just these 12 councils" is a dict lookup instead of a boolean scan of the
+whole frame per county.
+"""
+import re
+
+import pandas as pd
+
+# Candidate columns, in order of preference
+NAME_COLUMNS = ['CTYUA23NM', 'CTYUA21NM', 'NAME', 'name']
+CODE_COLUMNS = ['CTYUA23CD', 'CTYUA21CD', 'CODE', 'code']
+
+
+def find_column(gdf, candidates):
+    for col in candidates:
+        if col in gdf.columns:
+            return col
+    return None
+
+
+def find_name_column(gdf, candidates=NAME_COLUMNS):
+    return find_column(gdf, candidates)
+
+
+def find_code_column(gdf, candidates=CODE_COLUMNS):
+    return find_column(gdf, candidates)
+
+
+def normalise_name(name):
+    """Case/punctuation-insensitive key: "Bristol, City of" -> "bristol city of"."""
+    name = str(name).casefold().replace('&', ' and ')
+    name = re.sub(r"[^\w\s-]", "", name).replace('-', ' ')
+    return " ".join(name.split())
+
+
+class CountyIndex:
+    """Row-position index over ``gdf`` by GSS code and normalised name.
+
+    Names are not unique across vintages/datasets, so each name maps to a
+    list of positions; codes map to exactly one.
+    """
+
+    def __init__(self, gdf, name_col=None, code_col=None):
+        self.gdf = gdf
+        self.name_col = name_col or find_name_column(gdf)
+        self.code_col = code_col or find_code_column(gdf)
+
+        self._by_code = {}
+        if self.code_col is not None:
+            for pos, code in enumerate(gdf[self.code_col]):
+                if pd.isna(code):
+                    continue
+                self._by_code[str(code).upper()] = pos
+
+        self._by_name = {}
+        if self.name_col is not None:
+            for pos, name in enumerate(gdf[self.name_col]):
+                if pd.isna(name):
+                    continue
+                self._by_name.setdefault(normalise_name(name), []).append(pos)
+
+    def __len__(self):
+        return len(self.gdf)
+
+    def __contains__(self, key):
+        try:
+            self.positions(key)
+        except KeyError:
+            return False
+        return True
+
+    def positions(self, key):
+        """Row positions for one GSS code or area name."""
+        pos = self._by_code.get(str(key).upper())
+        if pos is not None:
+            return [pos]
+        positions = self._by_name.get(normalise_name(key))
+        if positions is None:
+            raise KeyError(f"No county with code or name {key!r}")
+        return list(positions)
+
+    def locate(self, keys):
+        """Sorted, de-duplicated row positions for several codes/names."""
+        return sorted({pos for key in keys for pos in self.positions(key)})
+
+    def select(self, keys):
+        return self.gdf.iloc[self.locate(keys)]
+
+    def names(self):
+        """``(name, positions)`` once per distinct normalised name, in file order."""
+        for positions in self._by_name.values():
+            yield self.gdf[self.name_col].iloc[positions[0]], list(positions)
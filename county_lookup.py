@@ -0,0 +1,205 @@
+"""Vectorised "which county contains this point" lookups.
+
+``CountyLocator`` answers point-in-county queries for NumPy arrays of
+coordinates (lon/lat by default, any CRS via pyproj) against a loaded
+boundary layer:
+
+* a grid over the layer labels every cell that no boundary crosses with
+  the county it lies in (or none), so most points are answered by one
+  array index,
+* points in boundary cells go through a shapely ``STRtree`` bounding-box
+  query and ``intersects_xy`` against the prepared county geometries,
+  in batches so memory stays bounded.
+
+Points on a shared border get the first county in layer order; points
+outside every county get ``-1`` / ``None``.  ``counties_in_bbox`` lists the
+counties intersecting a box.
+
+    python county_lookup.py --gpkg data/Counties.gpkg -1.55 53.8 -0.13 51.5
+    python county_lookup.py --csv points.csv located.csv     # lon,lat columns
+    python county_lookup.py --bench 1000000
+"""
+import argparse
+import csv
+import time
+
+import numpy as np
+import pyproj
+import shapely
+
+from county_index import find_code_column, find_name_column
+from geometry_cache import GPKG_PATH, load_boundaries, text_values
+
+LONLAT = "EPSG:4326"
+GRID_CELLS = 2048  # cells along the layer's longer side
+MIXED = -2         # grid label of cells a boundary passes through
+EXACT_BATCH = 1 << 18
+
+
+class CountyLocator:
+    """Point and box lookups against ``gdf`` (positions are row positions)."""
+
+    def __init__(self, gdf, grid_cells=GRID_CELLS):
+        self.gdf = gdf
+        self.crs = pyproj.CRS.from_user_input(gdf.crs)
+        self.geometries = np.asarray(gdf.geometry.values)
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+
+        # One extra slot so position -1 reads back as None
+        code_col, name_col = find_code_column(gdf), find_name_column(gdf)
+        self.codes = np.array([None if code_col is None or not isinstance(code, str) else code
+                               for code in (gdf[code_col] if code_col else [None] * len(gdf))]
+                              + [None], dtype=object)
+        self.names = np.array((text_values(gdf[name_col]) if name_col else [None] * len(gdf)) + [None],
+                              dtype=object)
+        self._transformers = {}
+        self._build_grid(grid_cells)
+
+    @classmethod
+    def from_source(cls, source=GPKG_PATH, **kwargs):
+        """Locator over a boundary file, via the projected geometry cache."""
+        return cls(load_boundaries(source, columns=['code', 'name']), **kwargs)
+
+    def _build_grid(self, cells):
+        minx, miny, maxx, maxy = shapely.total_bounds(self.geometries)
+        self._cell = max(maxx - minx, maxy - miny) / cells
+        self._origin = (minx, miny)
+        nx = int((maxx - minx) // self._cell) + 1
+        ny = int((maxy - miny) // self._cell) + 1
+
+        # Boundary vertices at most half a cell apart: every cell a border
+        # crosses is a vertex cell or next to one, so dilate by one cell
+        rings = shapely.segmentize(shapely.boundary(self.geometries), self._cell / 2)
+        coords = shapely.get_coordinates(rings)
+        ix, iy = self._cell_index(coords[:, 0], coords[:, 1])
+        mixed = np.zeros((ny, nx), dtype=bool)
+        mixed[np.clip(iy, 0, ny - 1), np.clip(ix, 0, nx - 1)] = True
+        mixed[1:] |= mixed[:-1].copy()
+        mixed[:-1] |= mixed[1:].copy()
+        mixed[:, 1:] |= mixed[:, :-1].copy()
+        mixed[:, :-1] |= mixed[:, 1:].copy()
+
+        # Every other cell lies wholly inside one county (or none), and so does
+        # each run of such cells along a row: look up one centre per run
+        free = ~mixed
+        starts = free.copy()
+        starts[:, 1:] &= mixed[:, :-1]
+        sy, sx = np.nonzero(starts)
+        labels = self._exact(minx + (sx + 0.5) * self._cell, miny + (sy + 0.5) * self._cell)
+        run = np.cumsum(starts.ravel()) - 1
+        self._grid = np.where(free.ravel(), labels[run], MIXED).reshape(ny, nx).astype(np.int32)
+
+    def _cell_index(self, x, y):
+        ix = np.floor((x - self._origin[0]) / self._cell).astype(np.intp)
+        iy = np.floor((y - self._origin[1]) / self._cell).astype(np.intp)
+        return ix, iy
+
+    def _exact(self, x, y):
+        positions = np.full(len(x), -1, dtype=np.intp)
+        for start in range(0, len(x), EXACT_BATCH):
+            xs, ys = x[start:start + EXACT_BATCH], y[start:start + EXACT_BATCH]
+            point_idx, county_idx = self.tree.query(shapely.points(xs, ys))
+            hit = shapely.intersects_xy(self.geometries[county_idx], xs[point_idx], ys[point_idx])
+            # Reversed so the first county in layer order wins on shared borders
+            positions[start + point_idx[hit][::-1]] = county_idx[hit][::-1]
+        return positions
+
+    def _project(self, x, y, crs):
+        crs = pyproj.CRS.from_user_input(crs)
+        if crs == self.crs:
+            return x, y
+        if crs not in self._transformers:
+            self._transformers[crs] = pyproj.Transformer.from_crs(crs, self.crs, always_xy=True)
+        return self._transformers[crs].transform(x, y)
+
+    def locate(self, x, y, crs=LONLAT):
+        """Row position of the county containing each point, ``-1`` for none.
+
+        ``x``/``y`` are arrays in ``crs`` (longitude/latitude by default).
+        """
+        x, y = self._project(np.asarray(x, dtype=float), np.asarray(y, dtype=float), crs)
+        x, y = np.atleast_1d(x), np.atleast_1d(y)
+        positions = np.full(len(x), -1, dtype=np.intp)
+        ny, nx = self._grid.shape
+        with np.errstate(invalid='ignore'):
+            ix, iy = self._cell_index(np.nan_to_num(x, nan=-np.inf), np.nan_to_num(y, nan=-np.inf))
+        inside = (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny) & np.isfinite(x) & np.isfinite(y)
+        positions[inside] = self._grid[iy[inside], ix[inside]]
+
+        mixed = np.flatnonzero(positions == MIXED)
+        positions[mixed] = self._exact(x[mixed], y[mixed])
+        return positions
+
+    def codes_at(self, x, y, crs=LONLAT):
+        """GSS code per point (``None`` outside every county or without a code)."""
+        return self.codes[self.locate(x, y, crs)]
+
+    def names_at(self, x, y, crs=LONLAT):
+        return self.names[self.locate(x, y, crs)]
+
+    def counties_in_bbox(self, minx, miny, maxx, maxy, crs=LONLAT):
+        """Sorted row positions of the counties intersecting a box given in ``crs``."""
+        crs = pyproj.CRS.from_user_input(crs)
+        if crs != self.crs:
+            # Densified edges, since a projected box is no longer a box
+            transformer = pyproj.Transformer.from_crs(crs, self.crs, always_xy=True)
+            minx, miny, maxx, maxy = transformer.transform_bounds(minx, miny, maxx, maxy)
+        hits = self.tree.query(shapely.box(minx, miny, maxx, maxy), predicate='intersects')
+        return np.sort(hits)
+
+
+def _bench(locator, count, seed=0):
+    """Time ``count`` random lon/lat points over the layer's extent."""
+    lon_lat = locator.gdf.to_crs(LONLAT).total_bounds
+    rng = np.random.default_rng(seed)
+    lon = rng.uniform(lon_lat[0], lon_lat[2], count)
+    lat = rng.uniform(lon_lat[1], lon_lat[3], count)
+    start = time.perf_counter()
+    positions = locator.locate(lon, lat)
+    elapsed = time.perf_counter() - start
+    print(f"⚡ {count:,} points in {elapsed:.2f}s ({count / elapsed:,.0f} points/s), "
+          f"{(positions >= 0).mean():.0%} inside a county")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the county containing lon/lat points")
+    parser.add_argument("coords", nargs="*", type=float, metavar="LON LAT",
+                        help="Longitude/latitude pairs")
+    parser.add_argument("--gpkg", default=GPKG_PATH, help="Boundary GeoPackage to query")
+    parser.add_argument("--crs", default=LONLAT, help="CRS of the input coordinates")
+    parser.add_argument("--csv", nargs=2, metavar=("IN", "OUT"),
+                        help="Locate the lon,lat columns of IN and write them with code,name to OUT")
+    parser.add_argument("--bench", type=int, metavar="N", help="Time N random points")
+    args = parser.parse_args()
+    if len(args.coords) % 2:
+        parser.error("coordinates must come in LON LAT pairs")
+
+    locator = CountyLocator.from_source(args.gpkg)
+
+    if args.coords:
+        x, y = np.array(args.coords[0::2]), np.array(args.coords[1::2])
+        for px, py, code, name in zip(x, y, locator.codes_at(x, y, args.crs),
+                                      locator.names_at(x, y, args.crs)):
+            print(f"{px:.6f},{py:.6f}\t{code or '-'}\t{name or '(no county)'}")
+
+    if args.csv:
+        with open(args.csv[0], newline='') as f:
+            rows = list(csv.DictReader(f))
+        x = np.array([float(row['lon']) for row in rows])
+        y = np.array([float(row['lat']) for row in rows])
+        positions = locator.locate(x, y, args.crs)
+        fieldnames = list(rows[0]) if rows else ['lon', 'lat']
+        with open(args.csv[1], 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames + ['code', 'name'])
+            writer.writeheader()
+            for row, code, name in zip(rows, locator.codes[positions], locator.names[positions]):
+                writer.writerow({**row, 'code': code, 'name': name})
+        print(f"📄 {len(rows)} points located: {args.csv[1]}")
+
+    if args.bench:
+        _bench(locator, args.bench)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Page layout shared by the render engines.
+
+Works out, from the data extent and the title (and label) sizes alone, the
+crop that matplotlib's ``bbox_inches='tight'`` would find by drawing the
+figure: the extent fitted into the default subplot box, the title above it,
+any labels reaching past its edges and ``pad_inches`` all round.  Knowing it up front lets ``MapRenderer`` size
+the figure before the one draw that writes the PNG, and gives
+``RasterRenderer`` the same image size and framing.
+"""
+from collections import namedtuple
+
+# matplotlib's default subplot box as a fraction of the figure
+# (left=0.125, right=0.9, bottom=0.11, top=0.88)
+SUBPLOT_FRACTION = (0.775, 0.77)
+
+# Image size, data->pixel scale and the axes box in pixels; ``left`` and
+# ``bottom`` are measured from the lower-left corner like matplotlib's
+# display coordinates
+FrameLayout = namedtuple('FrameLayout', 'width height scale left bottom axes_w axes_h')
+
+
+def fit_frame(extent_w, extent_h, figsize, dpi, title_w=0.0, title_h=0.0, pad_inches=0.1,
+              overhang=(0.0, 0.0, 0.0, 0.0)):
+    """Layout of an axes showing ``extent_w`` x ``extent_h`` data units.
+
+    ``extent_h`` is already multiplied by the axes aspect.  ``title_w`` is
+    the title's width and ``title_h`` how far it reaches above the axes, in
+    pixels; ``overhang`` is how far anything else (labels near the edge)
+    reaches past the left, bottom, right and top of the axes.  The crop is
+    truncated to whole pixels at the top and right, as matplotlib does.
+    """
+    box_w = figsize[0] * SUBPLOT_FRACTION[0] * dpi
+    box_h = figsize[1] * SUBPLOT_FRACTION[1] * dpi
+    scale = min(box_w / extent_w, box_h / extent_h)
+    axes_w, axes_h = extent_w * scale, extent_h * scale
+
+    pad = pad_inches * dpi
+    title_side = max(title_w - axes_w, 0) / 2  # a long title widens the crop, centred on the axes
+    left, bottom, right, top = overhang
+    left, right = max(title_side, left), max(title_side, right)
+    bottom, top = max(bottom, 0), max(title_h, top)
+    return FrameLayout(int(axes_w + left + right + 2 * pad), int(axes_h + bottom + top + 2 * pad),
+                       scale, pad + left, pad + bottom, axes_w, axes_h)
@@ -1,29 +1,37 @@
-import geopandas as gpd
-import matplotlib.pyplot as plt
+import argparse
 import os
-from tqdm import tqdm  # For progress bar
+import time
+import uuid
+from collections import namedtuple
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from importlib.metadata import version
 
-print("🗺️ Generating all 218 UK counties as dark maps...")
+from archive_layers import open_layer
+from county_index import CountyIndex
+from geometry_cache import (GPKG_PATH, LOD_PIXEL_FRACTION, LOD_TOLERANCES, RENDER_CRS, build_cache,
+                            is_fresh, layer_columns, load_boundaries, pick_tolerance, text_values)
+from geometry_paths import LodPaths
+from image_output import DEFAULT_FORMAT, FORMATS, IMAGE_EXTENSIONS, ImageWriter, OutputFormat
+from label_layout import ANCHOR_COLUMNS, anchors_of
+from layer_stream import CHUNK_FEATURES
+from render_manifest import RenderManifest, county_digests, settings_digest
+from render_metrics import NO_METRICS, RenderMetrics, select_rows, slowest, write_metrics
+from sprite_atlas import ATLAS_DIR, ATLAS_NAME, DEFAULT_PAGE_SIZE, build_atlas, county_entries
+from work_queue import DEFAULT_ATTEMPTS, DEFAULT_LEASE, WorkQueue, default_worker_id
 
-# Load the real UK county data
-gpkg_path = "data/Counties_and_Unitary_Authorities_May_2023_UK_BGC.gpkg"
-uk_gdf = gpd.read_file(gpkg_path)
+# The renderers (and so matplotlib), tile pyramid, layer streaming, profiler
+# and progress bars are imported by the code that uses them, so a run with
+# nothing to render only loads the layer, index and manifests
 
-print(f"📊 Loaded {len(uk_gdf)} real UK administrative areas")
+OUTPUT_DIR = "output_counties/all_dark_counties"
+OVERVIEW_NAME = "000_UK_ALL_DARK_OVERVIEW.png"
+# Written into each output folder by --queue, so workers can tell they share it
+QUEUE_MARKER = ".queue_run"
 
-# Find the name column
-name_columns = ['CTYUA23NM', 'CTYUA21NM', 'NAME', 'name']
-name_col = None
-
-for col in name_columns:
-    if col in uk_gdf.columns:
-        name_col = col
-        break
-
-print(f"📝 Using '{name_col}' for county names")
-
-# Create output directory
-os.makedirs("output_counties/all_dark_counties", exist_ok=True)
+# County render engines: the matplotlib figure, or the direct Pillow
+# rasteriser for plain silhouettes (the overview always uses matplotlib)
+ENGINES = ('matplotlib', 'raster')
 
 # Dark color schemes to choose from
 color_schemes = {
@@ -34,122 +42,916 @@ color_schemes = {
     'dark_purple': {'fill': '#301934', 'edge': '#512b58', 'bg': 'white'}
 }
 
-# Choose your preferred color scheme
-scheme = color_schemes['black']  # Change to 'charcoal', 'navy', etc. if preferred
+# Everything besides geometry, name and colour scheme that affects a
+# county PNG.  These are hashed into the manifest, so changing any of them
+# re-renders the affected files on the next run.
+county_settings = {
+    'figsize': (10, 8),
+    'dpi': 300,
+    'linewidth': 2,
+    'title': {'fontsize': 16, 'weight': 'bold', 'pad': 15, 'color': 'black'},
+    'savefig': {'pad_inches': 0.1, 'facecolor': 'white', 'edgecolor': 'none'},
+    'lod': (LOD_TOLERANCES, LOD_PIXEL_FRACTION),
+    'matplotlib': version('matplotlib'),
+}
+
+overview_settings = {
+    'figsize': (24, 20),
+    'dpi': 300,
+    'linewidth': 0.3,
+    'alpha': 0.9,
+    'borders': 'arcs',  # shared borders stroked once (topology.py)
+    'title': {'fontsize': 24, 'weight': 'bold', 'pad': 40, 'color': 'black'},
+    'savefig': {'pad_inches': 0.4, 'facecolor': 'white'},
+    # County names with --overview-labels, placed without overlaps
+    'labels': {'fontsize': 5, 'weight': 'bold', 'color': 'black',
+               'bbox': {'boxstyle': 'round,pad=0.2', 'facecolor': 'white', 'alpha': 0.7,
+                        'linewidth': 0}},
+    'lod': (LOD_TOLERANCES, LOD_PIXEL_FRACTION),
+    'matplotlib': version('matplotlib'),
+}
+
+
+def safe_filename(county_name):
+    return (county_name.replace('/', '_')
+                       .replace(' ', '_')
+                       .replace("'", "")
+                       .replace(',', '')
+                       .replace('&', 'and'))
 
-print(f"🎨 Using color scheme: {list(color_schemes.keys())[0]} (black shapes)")
-print(f"📁 Output folder: output_counties/all_dark_counties/")
 
-# Generate individual maps for all 218 counties
-print(f"\n⚡ Generating {len(uk_gdf)} individual county maps...")
+def county_filename(idx, county_name, extension='.png'):
+    return f"{idx+1:03d}_{safe_filename(county_name)}{extension}"
 
-# Create progress bar
-failed_counties = []
-success_count = 0
 
-for idx, (_, county_row) in enumerate(tqdm(uk_gdf.iterrows(), total=len(uk_gdf), desc="Creating maps")):
+def county_names(names, start=0):
+    """Titles for the layer's names; areas without one are "Area N" by position."""
+    return [name if isinstance(name, str) else f"Area {start + idx + 1}"
+            for idx, name in enumerate(names)]
+
+
+# One output set per (colour scheme, DPI, figure size).  The default set
+# keeps the original folder; every other set gets a sibling folder with its
+# own manifest and FILE_INDEX.txt.
+Variant = namedtuple('Variant', 'scheme_name dpi figsize')
+DEFAULT_VARIANT = Variant('black', county_settings['dpi'], county_settings['figsize'])
+
+
+def parse_size(text):
+    """``"10x8"`` -> ``(10, 8)`` figure size in inches."""
     try:
-        county_name = county_row[name_col]
-        
-        # Create single county GeoDataFrame
-        county_gdf = gpd.GeoDataFrame([county_row], crs=uk_gdf.crs)
-        
-        # Create the map
-        fig, ax = plt.subplots(figsize=(10, 8))
-        county_gdf.plot(ax=ax, 
-                       color=scheme['fill'], 
-                       edgecolor=scheme['edge'], 
-                       linewidth=2)
-        
-        # Clean styling
-        ax.set_title(f"{county_name}", fontsize=16, weight='bold', pad=15, color='black')
-        ax.axis('off')
-        ax.set_facecolor(scheme['bg'])
-        
-        # Create clean filename
-        safe_name = (county_name.replace('/', '_')
-                               .replace(' ', '_')
-                               .replace("'", "")
-                               .replace(',', '')
-                               .replace('&', 'and'))
-        
-        # Save with consistent naming
-        output_path = f"output_counties/all_dark_counties/{idx+1:03d}_{safe_name}.png"
-        plt.savefig(output_path, 
-                   bbox_inches='tight', 
-                   pad_inches=0.1, 
-                   dpi=300, 
-                   facecolor='white',
-                   edgecolor='none')
-        
-        plt.close()  # Important: close to free memory
-        success_count += 1
-        
+        size = tuple(float(part) for part in text.lower().split('x'))
+    except ValueError:
+        size = ()
+    if len(size) != 2:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT in inches, got {text!r}")
+    return tuple(int(v) if v.is_integer() else v for v in size)
+
+
+def variant_dir(variant):
+    if variant == DEFAULT_VARIANT:
+        return OUTPUT_DIR
+    width, height = variant.figsize
+    return f"{OUTPUT_DIR}_{variant.scheme_name}_{variant.dpi}dpi_{width:g}x{height:g}"
+
+
+def variant_settings(variant):
+    return dict(county_settings, dpi=variant.dpi, figsize=variant.figsize)
+
+
+def variant_digests(geometries, names, variant, engine, output_format):
+    """Manifest digests of the county images of ``variant``, in ``geometries`` order."""
+    return county_digests(geometries, names,
+                          (color_schemes[variant.scheme_name], variant_settings(variant), engine,
+                           output_format._asdict()))
+
+
+def make_renderer(engine='matplotlib'):
+    if engine == 'raster':
+        from raster_engine import RasterRenderer
+        return RasterRenderer(figsize=county_settings['figsize'])
+    from render_engine import MapRenderer
+    return MapRenderer(figsize=county_settings['figsize'])
+
+
+def instrument_renderer(renderer, metrics):
+    """Time the renderer's internal hot spots as their own ``metrics`` stages."""
+    from raster_engine import RasterRenderer
+    if isinstance(renderer, RasterRenderer):
+        metrics.instrument(renderer, 'rasterise', 'rasterise')
+    else:
+        # The one draw inside savefig; the rest of ``save`` is PNG encoding
+        metrics.instrument(renderer.fig, 'draw', 'draw')
+
+
+def draw_county(renderer, idx, lod, county_name, targets, crs=None, metrics=NO_METRICS,
+                writer=None):
+    """Save county ``idx`` once per ``(variant, target)``; targets are paths or file objects.
+
+    Variants that share a frame are drawn once: the matplotlib figure is
+    built per (figure size, level of detail) and only recoloured and drawn
+    at each DPI; the rasteriser scan-converts per (figure size, DPI) and
+    only composites each scheme.  Images go to ``writer`` (keyed by
+    ``idx``); by default they are written as PNG before this returns.
+
+    ``metrics`` gets ``paths``, ``plot`` and ``save`` stages; ``save``
+    covers encoding only when the writer is synchronous.
+    """
+    from raster_engine import RasterRenderer
+    writer = writer or ImageWriter()
+    raster = isinstance(renderer, RasterRenderer)
+    groups = {}
+    for variant, target in targets:
+        tolerance = pick_tolerance(lod.bounds[idx], variant.figsize, variant.dpi)
+        key = (variant.figsize, variant.dpi if raster else tolerance, tolerance)
+        groups.setdefault(key, []).append((variant, target))
+
+    for (figsize, _, tolerance), group in groups.items():
+        renderer.set_figsize(figsize)
+        with metrics.stage("paths"):
+            paths = lod.level(tolerance)
+        outputs = [(color_schemes[variant.scheme_name], target) for variant, target in group]
+
+        if raster:
+            with metrics.stage("save"):
+                dpi = group[0][0].dpi
+                images = renderer.render_images(paths, idx, [scheme for scheme, _ in outputs],
+                                                dpi=dpi,
+                                                linewidth=county_settings['linewidth'],
+                                                title=f"{county_name}",
+                                                title_kw=county_settings['title'],
+                                                pad_inches=county_settings['savefig']['pad_inches'],
+                                                facecolor=county_settings['savefig']['facecolor'])
+                for image, (_, target) in zip(images, outputs):
+                    writer.submit(image, target, dpi, key=idx)
+            continue
+
+        with metrics.stage("plot"):
+            # Swap this county's precomputed path, simplified for its pixel size, into the shared figure
+            renderer.clear()
+            collection = renderer.add_paths([paths.path(idx)], lod.bounds[idx],
+                                            color=outputs[0][0]['fill'],
+                                            edgecolor=outputs[0][0]['edge'],
+                                            linewidth=county_settings['linewidth'])
+            renderer.frame(crs=crs)
+
+            # Clean styling
+            renderer.set_title(f"{county_name}", **county_settings['title'])
+
+        # Save each target, recolouring the same frame per scheme
+        for (variant, _), (scheme, target) in zip(group, outputs):
+            collection.set_facecolor(scheme['fill'])
+            collection.set_edgecolor(scheme['edge'])
+            renderer.ax.set_facecolor(scheme['bg'])
+            with metrics.stage("save"):
+                image = renderer.render_fitted(variant.dpi, **county_settings['savefig'])
+                writer.submit(image, target, variant.dpi, key=idx)
+
+
+def render_county(renderer, idx, lod, county_name, variants, crs=None, metrics=NO_METRICS,
+                  writer=None):
+    """Write county ``idx`` into every variant's folder; returns the output paths."""
+    writer = writer or ImageWriter()
+    # Save with consistent naming
+    filename = county_filename(idx, county_name, writer.output_format.extension)
+    targets = [(variant, f"{variant_dir(variant)}/{filename}") for variant in variants]
+    draw_county(renderer, idx, lod, county_name, targets, crs=crs, metrics=metrics, writer=writer)
+    return [target for _, target in targets]
+
+
+def render_one(renderer, names, crs, lod, idx, variants, metrics=NO_METRICS, writer=None):
+    """Render county ``idx`` for ``variants``; returns ``None`` or a failure message.
+
+    Write errors of an asynchronous ``writer`` come from ``writer.wait``.
+    """
+    county_name = None
+    try:
+        county_name = names[idx]
+        with metrics.county(idx, county_name):
+            render_county(renderer, idx, lod, county_name, variants, crs=crs, metrics=metrics,
+                          writer=writer)
+        return None
+    except Exception as e:
+        return f"{county_name}: {str(e)}"
+
+
+def render_overviews(uk_gdf, lod, outputs, writer=None, labels=False):
+    """Write the overview for each ``(variant, output_path)`` (writer key ``'overview'``).
+
+    The overview has a fixed figure size, so variants differing only in
+    county figure size get the same image.  ``labels`` names the counties
+    at their cached label anchors, largest first, skipping any that collide.
+    """
+    from render_engine import MapRenderer
+    writer = writer or ImageWriter()
+    # One frame for every county, so one (coverage-simplified, gap-free) level
+    bounds = lod.total_bounds()
+    renderer = MapRenderer(figsize=overview_settings['figsize'])
+    collection = tolerance = None
+    images = {}
+    for variant, output_path in sorted(outputs, key=lambda o: -o[0].dpi):
+        key = (variant.scheme_name, variant.dpi)
+        if key not in images:
+            level = pick_tolerance(bounds, overview_settings['figsize'], variant.dpi)
+            if level != tolerance:
+                renderer.clear()
+                # Fill without edges, then stroke each shared border once
+                collection = renderer.add_paths(lod.level(level).paths(), bounds,
+                                                color='black', edgecolor='none',
+                                                alpha=overview_settings['alpha'])
+                borders = renderer.add_lines(lod.topology(level).arc_coordinates(), bounds,
+                                             color='white', linewidth=overview_settings['linewidth'],
+                                             alpha=overview_settings['alpha'])
+                renderer.frame(crs=uk_gdf.crs)
+                renderer.set_title(f"All UK Counties & Unitary Authorities - Dark Style\n{len(uk_gdf)} Administrative Areas (ONS May 2023)",
+                                   **overview_settings['title'])
+                if labels:
+                    renderer.add_labels(county_names(uk_gdf['name']), anchors_of(uk_gdf), gap=0.2,
+                                        **overview_settings['labels'])
+                tolerance = level
+
+            scheme = color_schemes[variant.scheme_name]
+            collection.set_facecolor(scheme['fill'])
+            borders.set_color(scheme['edge'])
+            renderer.ax.set_facecolor(scheme['bg'])
+            images[key] = renderer.render_fitted(variant.dpi, **overview_settings['savefig'])
+        writer.submit(images[key], output_path, variant.dpi, key='overview')
+
+
+# Per-process state for the parallel renderer: each worker loads the
+# cached layer once in its initializer, converts each level of detail to
+# paths in one pass as needed, keeps one reusable figure and then renders
+# rows by index.
+_worker_names = None
+_worker_crs = None
+_worker_lod = None
+_worker_renderer = None
+_worker_metrics = None
+_worker_writer = None
+
+
+def _init_worker(gpkg_path, engine='matplotlib', output_format=DEFAULT_FORMAT, write_threads=0):
+    global _worker_names, _worker_crs, _worker_lod, _worker_renderer, _worker_metrics, _worker_writer
+    gdf = load_boundaries(gpkg_path, columns=['name'])
+    _worker_names = county_names(gdf['name'])
+    _worker_crs = gdf.crs
+    _worker_lod = LodPaths(gpkg_path, gdf.geometry.values)
+    _worker_renderer = make_renderer(engine)
+    _worker_metrics = RenderMetrics()
+    instrument_renderer(_worker_renderer, _worker_metrics)
+    _worker_writer = ImageWriter(output_format, write_threads)
+
+
+def _render_in_worker(idx, variants):
+    failure = render_one(_worker_renderer, _worker_names, _worker_crs, _worker_lod,
+                         idx, variants, metrics=_worker_metrics, writer=_worker_writer)
+    # Report only once the files exist; the other workers keep the CPU busy meanwhile
+    error = _worker_writer.wait([idx]).get(idx)
+    if failure is None and error is not None:
+        failure = f"{_worker_names[idx]}: {error}"
+    return idx, failure, _worker_metrics.take_rows()
+
+
+def _queued_variant(data):
+    """``Variant`` back from its JSON list form."""
+    scheme_name, dpi, figsize = data
+    return Variant(scheme_name, dpi, tuple(figsize))
+
+
+def _render_queued_overview(gpkg_path, outputs, labels=False):
+    """Overview task in a queue worker; returns ``None`` or a failure message."""
+    try:
+        uk_gdf = load_boundaries(gpkg_path, columns=['name'] + ANCHOR_COLUMNS)
+        targets = [(_queued_variant(variant), f"{variant_dir(_queued_variant(variant))}/{filename}")
+                   for variant, filename, _ in outputs]
+        render_overviews(uk_gdf, _worker_lod, targets, writer=_worker_writer, labels=labels)
+        error = _worker_writer.wait(['overview']).get('overview')
     except Exception as e:
-        failed_counties.append(f"{county_name}: {str(e)}")
-        plt.close()  # Clean up even on error
-        continue
+        error = e
+    return None if error is None else f"overview: {str(error)}"
+
+
+def prepare_queue_worker(queue_path):
+    """Check this machine can work on ``queue_path``; returns the run's settings.
+
+    Workers write straight into the coordinator's output folders (a shared
+    mount), which ``--merge`` then indexes, so a folder without the run's
+    marker is refused.  The geometry cache is built here, once, rather than
+    by every worker process at the same time.
+    """
+    with WorkQueue(queue_path) as queue:
+        run = queue.meta()
+    for variant in map(_queued_variant, run['variants']):
+        try:
+            with open(os.path.join(variant_dir(variant), QUEUE_MARKER)) as f:
+                token = f.read().strip()
+        except OSError:
+            token = None
+        if token != run['token']:
+            raise SystemExit(f"❌ {os.path.abspath(variant_dir(variant))}/ is not the output folder "
+                             f"{queue_path} was queued for; mount the coordinator's output folders "
+                             f"here (and run from the same directory)")
+    if not is_fresh(run['gpkg']):
+        build_cache(run['gpkg'])
+    return run
+
+
+def run_queue_worker(queue_path, worker=None, lease_s=DEFAULT_LEASE, max_attempts=DEFAULT_ATTEMPTS):
+    """Claim and render tasks from ``queue_path`` until none are runnable.
+
+    The layer is loaded once, as in a ``--workers`` process; call
+    ``prepare_queue_worker`` first.  Returns ``(done, failed)`` attempt
+    counts for this worker; tasks whose lease it lost count as neither.
+    """
+    worker = worker or default_worker_id()
+    with WorkQueue(queue_path) as queue:
+        run = queue.meta()
+        _init_worker(run['gpkg'], run['engine'], OutputFormat(**run['output_format']),
+                     run['write_threads'])
+        done = failed = 0
+        while True:
+            claimed = queue.claim(worker, lease_s, max_attempts)
+            if claimed is None:
+                break
+            task_id, task = claimed
+            if task['idx'] is None:
+                failure = _render_queued_overview(run['gpkg'], task['outputs'], run['overview_labels'])
+            else:
+                variants = [_queued_variant(variant) for variant, _, _ in task['outputs']]
+                _, failure, _ = _render_in_worker(task['idx'], variants)
+            recorded = (queue.complete(task_id, worker) if failure is None
+                        else queue.fail(task_id, worker, failure, max_attempts))
+            if not recorded:
+                # The lease ran out mid-render and another worker claimed the task
+                print(f"⚠️ {worker}: lost the lease on task {task_id}, not counted")
+            elif failure is None:
+                done += 1
+            else:
+                failed += 1
+                print(f"⚠️ {worker}: {failure}")
+    return done, failed
+
+
+def submit_queue(queue_path, run, jobs, overview_jobs, names, codes, filenames, digests,
+                 overview_name, overview_digests):
+    """Put one task per stale county (plus one for the overviews) on a fresh queue.
 
-print(f"\n🎊 BATCH PROCESSING COMPLETE!")
-print(f"✅ Successfully created: {success_count} county maps")
-print(f"❌ Failed: {len(failed_counties)} counties")
+    Marks each output folder with the run's token; see ``prepare_queue_worker``.
+    """
+    run = dict(run, token=uuid.uuid4().hex)
+    for variant in run['variants']:
+        with open(os.path.join(variant_dir(variant), QUEUE_MARKER), 'w') as f:
+            f.write(run['token'])
+    tasks = [{'idx': idx, 'name': names[idx], 'code': codes[idx],
+              'outputs': [[variant, filenames[idx], digests[variant][idx]] for variant in job]}
+             for idx, job in jobs.items()]
+    if overview_jobs:
+        tasks.append({'idx': None, 'name': None, 'code': None,
+                      'outputs': [[variant, overview_name, overview_digests[variant]]
+                                  for variant, _ in overview_jobs]})
+    with WorkQueue(queue_path) as queue:
+        queue.submit(run, tasks)
+    return len(tasks)
 
-if failed_counties:
-    print("\n⚠️ Failed counties:")
-    for failure in failed_counties[:5]:  # Show first 5 failures
+
+def merge_queue(queue_path):
+    """Record the queue's finished tasks in each output set's manifest and FILE_INDEX.txt.
+
+    A finished task whose file is not in the output folder (a worker that
+    did not share it) is reported and left out.  Orphaned maps are only
+    removed once a full run has no task left to do.  Returns the queue's
+    status counts.
+    """
+    with WorkQueue(queue_path) as queue:
+        run, tasks, counts = queue.meta(), queue.tasks(), queue.counts()
+    manifests = {variant: RenderManifest(variant_dir(variant))
+                 for variant in map(_queued_variant, run['variants'])}
+    for _, task, status, error in tasks:
+        if status == 'failed':
+            print(f"  • {task['name'] or 'overview'}: {error}")
+        if status != 'done':
+            continue
+        extra = {} if task['idx'] is None else {'code': task['code'], 'name': task['name']}
+        for variant, filename, digest in task['outputs']:
+            variant = _queued_variant(variant)
+            if not os.path.exists(os.path.join(variant_dir(variant), filename)):
+                print(f"  • {variant_dir(variant)}/{filename}: done, but missing here")
+                continue
+            manifests[variant].record(filename, digest, **extra)
+
+    finished = counts['pending'] == counts['claimed'] == 0
+    for variant, manifest in manifests.items():
+        if finished and run['expected'] is not None:
+            orphans = manifest.remove_orphans(run['expected'])
+            if orphans:
+                print(f"🧹 Removed {len(orphans)} orphaned maps from {variant_dir(variant)}/")
+        manifest.save()
+        write_file_index(variant_dir(variant), variant)
+        print(f"📄 File index saved: {variant_dir(variant)}/FILE_INDEX.txt")
+    return counts
+
+
+def render_all(names, crs, lod, jobs, gpkg_path=GPKG_PATH, workers=1, engine='matplotlib',
+               metrics=NO_METRICS, output_format=DEFAULT_FORMAT, write_threads=0):
+    """Render ``jobs`` (``{county index: [variants]}``); returns ``(rendered, failed_counties)``.
+
+    Images are encoded as ``output_format`` on ``write_threads`` background
+    threads per process (0 = inline).  Per-county stage timings from every
+    process end up in ``metrics``.
+    """
+    if not jobs:  # up to date: no renderer (or matplotlib) needed
+        return [], []
+    from tqdm import tqdm
+    results = {}
+    if workers == 1:
+        renderer = make_renderer(engine)
+        instrument_renderer(renderer, metrics)
+        with ImageWriter(output_format, write_threads) as writer:
+            for idx, variants in tqdm(jobs.items(), desc="Creating maps"):
+                results[idx] = render_one(renderer, names, crs, lod, idx, variants,
+                                          metrics=metrics, writer=writer)
+            for idx, error in writer.wait().items():
+                results[idx] = results[idx] or f"{names[idx]}: {error}"
+    else:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=(gpkg_path, engine, output_format,
+                                           write_threads)) as pool:
+            futures = [pool.submit(_render_in_worker, idx, variants)
+                       for idx, variants in jobs.items()]
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Creating maps"):
+                idx, failure, rows = future.result()
+                results[idx] = failure
+                metrics.rows.extend(rows)
+
+    # Report failures in county order regardless of completion order
+    rendered = [idx for idx in sorted(results) if results[idx] is None]
+    failed_counties = [results[idx] for idx in sorted(results) if results[idx] is not None]
+    return rendered, failed_counties
+
+
+def write_file_index(output_dir, variant):
+    scheme = color_schemes[variant.scheme_name]
+    files = sorted([f for f in os.listdir(output_dir) if f.endswith(IMAGE_EXTENSIONS)])
+
+    with open(f"{output_dir}/FILE_INDEX.txt", 'w') as f:
+        f.write(f"UK Counties Dark Maps - Generated Files\n")
+        f.write(f"=====================================\n\n")
+        f.write(f"Total files: {len(files)}\n")
+        f.write(f"Color scheme: {variant.scheme_name} ({scheme['fill']} shapes with {scheme['edge']} borders)\n")
+        f.write(f"Resolution: {variant.dpi} DPI\n")
+        f.write(f"Figure size: {variant.figsize[0]:g} x {variant.figsize[1]:g} in\n")
+        f.write(f"Data source: ONS May 2023\n\n")
+        f.write("Files:\n")
+        for i, filename in enumerate(files, 1):
+            f.write(f"{i:3d}. {filename}\n")
+
+
+def profile_county(names, crs, lod, idx, variants, engine, output_path, repeat=1):
+    """Render one county under cProfile in this process and save the stats.
+
+    Runs in the main process (also with ``--workers``), so an external
+    sampler can attach to the printed PID instead, e.g.
+    ``py-spy record --pid PID``; ``repeat`` keeps it busy for longer.
+    """
+    import cProfile
+    import pstats
+    renderer = make_renderer(engine)
+    print(f"🔬 Profiling {names[idx]} x{repeat} in process {os.getpid()}...")
+    profiler = cProfile.Profile()
+    profiler.enable()
+    for _ in range(repeat):
+        render_county(renderer, idx, lod, names[idx], variants, crs=crs)
+    profiler.disable()
+    profiler.dump_stats(output_path)
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+    print(f"📄 Profile saved: {output_path} (open with snakeviz or pstats)")
+
+
+def render_tiles(args, workers):
+    from tile_pyramid import build_pyramid
+    print(f"🧱 Rendering zoom {args.zoom[0]}-{args.zoom[1]} tiles with {workers} worker(s)...")
+    for scheme_name in dict.fromkeys(args.schemes):
+        output = args.tiles
+        if len(set(args.schemes)) > 1:
+            stem, ext = os.path.splitext(args.tiles)
+            output = f"{stem}_{scheme_name}{ext}"
+        count = build_pyramid(args.gpkg, output, color_schemes[scheme_name],
+                              zooms=tuple(args.zoom), workers=workers,
+                              name=f"UK Counties - Dark Style ({scheme_name})")
+        print(f"✅ {count} tiles saved: {output}")
+
+
+def render_streaming(args, variants, output_format):
+    """``--stream``: render straight from the source layer, a chunk of features at a time.
+
+    Only one chunk of geometry is held at once: its county maps are drawn as
+    it arrives, then it is drawn onto each overview canvas and dropped, so
+    memory is bounded by the chunk size and the canvases rather than the
+    layer.  Levels of detail are simplified per chunk (the geometry cache
+    needs the whole layer) and borders between chunks are stroked from both
+    sides.  Always renders serially.
+    """
+    from layer_stream import ChunkPaths, iter_chunks, layer_summary
+    from render_engine import MapRenderer
+    from tqdm import tqdm
+    layer = open_layer(args.gpkg) if args.gpkg.lower().endswith('.zip') else args.gpkg
+    name_col, code_col = layer_columns(layer)
+    count, crs, bounds = layer_summary(layer, to_crs=RENDER_CRS)
+    print(f"🌊 Streaming {count} areas from {args.gpkg}, {args.stream} at a time...")
+
+    manifests = {}
+    for variant in variants:
+        os.makedirs(variant_dir(variant), exist_ok=True)
+        manifests[variant] = RenderManifest(variant_dir(variant))
+    overview_name = os.path.splitext(OVERVIEW_NAME)[0] + output_format.extension
+    renderer = make_renderer(args.engine)
+    metrics = RenderMetrics()
+    instrument_renderer(renderer, metrics)
+    run_start = time.perf_counter()
+
+    filenames, digests, failed_counties = [], {variant: [] for variant in variants}, []
+    rendered = {variant: set() for variant in variants}  # county indices, for the metrics
+    success_count = 0
+    with ExitStack() as stack:
+        writer = stack.enter_context(ImageWriter(output_format, args.write_threads))
+
+        # One overview canvas per (scheme, DPI), framed from the layer metadata
+        canvases = {}
+        for variant in variants:
+            key = (variant.scheme_name, variant.dpi)
+            if key in canvases:
+                continue
+            overview = MapRenderer(figsize=overview_settings['figsize'])
+            overview.frame(bounds, crs=crs)
+            overview.set_title(f"All UK Counties & Unitary Authorities - Dark Style\n{count} Administrative Areas (ONS May 2023)",
+                               **overview_settings['title'])
+            overview.ax.set_facecolor(color_schemes[variant.scheme_name]['bg'])
+            flush = stack.enter_context(overview.accumulate(variant.dpi, **overview_settings['savefig']))
+            canvases[key] = (overview, flush,
+                             pick_tolerance(bounds, overview_settings['figsize'], variant.dpi))
+
+        columns = [col for col in (name_col, code_col) if col]
+        # Each chunk read is its own stage, so its peak is in the metrics too
+        chunks = metrics.iterate(iter_chunks(layer, args.stream, columns=columns, to_crs=RENDER_CRS),
+                                 "read")
+        for start, chunk in tqdm(chunks, total=-(-count // args.stream), desc="Streaming chunks"):
+            # Same normalisation as the geometry cache, so digests match cached runs
+            names = county_names(text_values(chunk[name_col]) if name_col
+                                 else (chunk.index + start).astype(str), start)
+            codes = text_values(chunk[code_col]) if code_col else [None] * len(chunk)
+            lod = ChunkPaths(chunk.geometry.values)
+            chunk_digests = {variant: variant_digests(chunk.geometry, names, variant,
+                                                      args.engine, output_format)
+                             for variant in variants}
+
+            # County maps; writer keys are positions within the chunk
+            jobs, failures = {}, {}
+            for local, name in enumerate(names):
+                filename = county_filename(start + local, name, output_format.extension)
+                filenames.append(filename)
+                jobs[local] = [variant for variant in variants
+                               if args.force or not manifests[variant].is_fresh(
+                                   filename, chunk_digests[variant][local])]
+                if not jobs[local]:
+                    continue
+                targets = [(variant, f"{variant_dir(variant)}/{filename}") for variant in jobs[local]]
+                try:
+                    with metrics.county(start + local, name):
+                        draw_county(renderer, local, lod, name, targets, crs=chunk.crs,
+                                    metrics=metrics, writer=writer)
+                except Exception as e:
+                    failures[local] = f"{name}: {str(e)}"
+            for local, error in writer.wait().items():
+                failures.setdefault(local, f"{names[local]}: {error}")
+            for local, job in jobs.items():
+                if local in failures:
+                    failed_counties.append(failures[local])
+                    continue
+                for variant in job:
+                    manifests[variant].record(filenames[start + local], chunk_digests[variant][local],
+                                              code=codes[local], name=names[local])
+                    rendered[variant].add(start + local)
+                    success_count += 1
+
+            # Then the chunk goes onto every overview canvas
+            with metrics.county(None, "overview"):
+                for (scheme_name, _), (overview, flush, tolerance) in canvases.items():
+                    scheme = color_schemes[scheme_name]
+                    overview.add_paths(lod.level(tolerance).paths(), bounds, color=scheme['fill'],
+                                       edgecolor='none', alpha=overview_settings['alpha'])
+                    overview.add_lines(lod.topology(tolerance).arc_coordinates(), bounds,
+                                       color=scheme['edge'], linewidth=overview_settings['linewidth'],
+                                       alpha=overview_settings['alpha'])
+                    flush()
+            for variant in variants:
+                digests[variant].extend(chunk_digests[variant])
+
+        for variant in variants:
+            overview = canvases[(variant.scheme_name, variant.dpi)][0]
+            writer.submit(overview.canvas_image(), f"{variant_dir(variant)}/{overview_name}",
+                          variant.dpi, key='overview')
+        overview_error = writer.wait().get('overview')
+
+    if overview_error is not None:
+        print(f"⚠️ Overview failed: {overview_error}")
+    run_info = {"engine": args.engine, "workers": 1, "stream": args.stream,
+                "variants": [variant._asdict() for variant in variants],
+                "counties": len(filenames), "wall_s": time.perf_counter() - run_start}
+    for variant in variants:
+        output_dir = variant_dir(variant)
+        if overview_error is None:
+            # Chunk seams and metadata framing differ from the cached overview
+            manifests[variant].record(overview_name, settings_digest(
+                digests[variant], color_schemes[variant.scheme_name],
+                dict(overview_settings, dpi=variant.dpi, stream=args.stream)))
+        orphans = manifests[variant].remove_orphans(filenames + [overview_name])
+        if orphans:
+            print(f"🧹 Removed {len(orphans)} orphaned maps from {output_dir}/")
+        manifests[variant].save()
+        write_file_index(output_dir, variant)
+        write_metrics(output_dir, select_rows(metrics.rows, rendered[variant]), run_info,
+                      top=args.top)
+
+    peak = max((row['peak_rss_mb'] for row in metrics.rows), default=0)
+    print(f"✅ {success_count} county maps, {len(failed_counties)} failed, "
+          f"{len(variants)} overview(s); peak RSS {peak:.0f} MB")
+    for failure in failed_counties[:5]:
         print(f"  • {failure}")
-    if len(failed_counties) > 5:
-        print(f"  ... and {len(failed_counties) - 5} more")
-
-# Create a summary overview with all counties in dark style
-print(f"\n🌍 Creating dark overview map of all {len(uk_gdf)} counties...")
-
-fig, ax = plt.subplots(figsize=(24, 20))
-uk_gdf.plot(ax=ax, 
-           color=scheme['fill'], 
-           edgecolor=scheme['edge'], 
-           linewidth=0.3,
-           alpha=0.9)
-
-ax.set_title(f"All UK Counties & Unitary Authorities - Dark Style\n{len(uk_gdf)} Administrative Areas (ONS May 2023)", 
-            fontsize=24, weight='bold', pad=40, color='black')
-ax.axis('off')
-ax.set_facecolor(scheme['bg'])
-
-# Save dark overview
-overview_path = "output_counties/all_dark_counties/000_UK_ALL_DARK_OVERVIEW.png"
-plt.savefig(overview_path, 
-           bbox_inches='tight', 
-           pad_inches=0.4, 
-           dpi=300, 
-           facecolor='white')
-
-plt.close()
-
-# Create file listing
-print(f"\n📋 Creating file index...")
-files = sorted([f for f in os.listdir("output_counties/all_dark_counties/") if f.endswith('.png')])
-
-with open("output_counties/all_dark_counties/FILE_INDEX.txt", 'w') as f:
-    f.write(f"UK Counties Dark Maps - Generated Files\n")
-    f.write(f"=====================================\n\n")
-    f.write(f"Total files: {len(files)}\n")
-    f.write(f"Color scheme: Black shapes with white borders\n")
-    f.write(f"Resolution: 300 DPI\n")
-    f.write(f"Data source: ONS May 2023\n\n")
-    f.write("Files:\n")
-    for i, filename in enumerate(files, 1):
-        f.write(f"{i:3d}. {filename}\n")
-
-print(f"📄 File index saved: output_counties/all_dark_counties/FILE_INDEX.txt")
-
-print(f"\n🎯 FINAL SUMMARY:")
-print(f"📂 Location: output_counties/all_dark_counties/")
-print(f"📊 Individual maps: {success_count}")
-print(f"🌍 Overview map: 1")
-print(f"📄 File index: 1")
-print(f"🎨 Style: Dark/black county shapes")
-print(f"📐 Resolution: 300 DPI")
-print(f"💾 Total files: {len(os.listdir('output_counties/all_dark_counties/'))}")
-
-print(f"\n✨ All 218 UK counties now available as dark individual maps!")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate dark maps for all UK counties")
+    parser.add_argument("--gpkg", default=GPKG_PATH, help="Boundary GeoPackage to render")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Render processes (1 = serial, 0 = one per CPU core)")
+    parser.add_argument("--only", nargs="+", metavar="CODE_OR_NAME",
+                        help="Render just these counties (GSS codes or names)")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-render everything, ignoring the manifest")
+    parser.add_argument("--engine", choices=ENGINES, default='matplotlib',
+                        help="County render engine (raster = direct Pillow rasteriser)")
+    parser.add_argument("--schemes", nargs="+", choices=list(color_schemes),
+                        default=[DEFAULT_VARIANT.scheme_name],
+                        help="Colour schemes to render (one output set each)")
+    parser.add_argument("--dpi", nargs="+", type=int, default=[DEFAULT_VARIANT.dpi],
+                        help="Resolutions to render, e.g. --dpi 300 72")
+    parser.add_argument("--size", nargs="+", type=parse_size, default=[DEFAULT_VARIANT.figsize],
+                        metavar="WxH", help="County figure sizes in inches, e.g. --size 10x8 4x3")
+    parser.add_argument("--top", type=int, default=5,
+                        help="Slowest counties to list after the run")
+    parser.add_argument("--profile", metavar="CODE_OR_NAME",
+                        help="cProfile one county in the main process before the batch")
+    parser.add_argument("--profile-repeat", type=int, default=1,
+                        help="Render the profiled county this many times")
+    parser.add_argument("--tiles", metavar="PATH",
+                        help="Render an XYZ tile pyramid instead (directory, or *.mbtiles)")
+    parser.add_argument("--zoom", nargs=2, type=int, default=[0, 8], metavar=("MIN", "MAX"),
+                        help="Zoom levels for --tiles")
+    parser.add_argument("--format", choices=list(FORMATS), default=DEFAULT_FORMAT.format,
+                        help="Image format of the maps")
+    parser.add_argument("--compress-level", type=int, choices=range(10),
+                        default=DEFAULT_FORMAT.compress_level, metavar="0-9",
+                        help="PNG zlib level (1 = fastest, 9 = smallest)")
+    parser.add_argument("--colors", type=int, default=DEFAULT_FORMAT.colors,
+                        help="Quantise to a palette of this many colours (0 = truecolour)")
+    parser.add_argument("--quality", type=int, default=DEFAULT_FORMAT.quality,
+                        help="WebP/AVIF quality")
+    parser.add_argument("--lossless", action="store_true", help="Lossless WebP/AVIF")
+    parser.add_argument("--write-threads", type=int, default=2,
+                        help="Background encode/write threads per process (0 = inline)")
+    parser.add_argument("--overview-labels", action="store_true",
+                        help="Label the counties on the overview map (not with --stream)")
+    parser.add_argument("--stream", type=int, nargs="?", const=CHUNK_FEATURES, metavar="N",
+                        help="Read the layer N features at a time, bypassing the geometry "
+                             f"cache, to bound memory (default N: {CHUNK_FEATURES}; serial, "
+                             "ignores --only/--workers)")
+    parser.add_argument("--queue", metavar="PATH",
+                        help="Put the stale maps on a SQLite work queue instead of rendering them")
+    parser.add_argument("--work", metavar="PATH",
+                        help="Render tasks from a work queue until it is drained "
+                             "(--workers processes on this machine; the output folders must be "
+                             "the --queue machine's, e.g. a shared mount)")
+    parser.add_argument("--merge", metavar="PATH",
+                        help="Record a work queue's finished maps in the manifests and FILE_INDEX.txt")
+    parser.add_argument("--lease", type=float, default=DEFAULT_LEASE,
+                        help="Seconds before a claimed task may be retried by another worker")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_ATTEMPTS,
+                        help="Tries per task before it is marked failed")
+    parser.add_argument("--atlas", action="store_true",
+                        help="Also pack each output set into sprite-sheet pages + ATLAS.json")
+    parser.add_argument("--atlas-scale", type=float, default=0.25,
+                        help="Resize factor of the maps in the atlas")
+    parser.add_argument("--atlas-page-size", type=int, default=DEFAULT_PAGE_SIZE,
+                        help="Maximum atlas page width/height in pixels")
+    args = parser.parse_args()
+    workers = args.workers or os.cpu_count()
+    try:
+        output_format = OutputFormat(args.format, args.compress_level, args.colors,
+                                     args.quality, args.lossless)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.tiles:
+        render_tiles(args, workers)
+        return
+    if args.work:
+        prepare_queue_worker(args.work)
+        print(f"👷 Working on {args.work} with {workers} process(es)...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_queue_worker, [args.work] * workers, [None] * workers,
+                                    [args.lease] * workers, [args.max_attempts] * workers))
+        print(f"✅ {sum(done for done, _ in results)} task(s) done, "
+              f"{sum(failed for _, failed in results)} failed attempt(s)")
+        return
+    if args.merge:
+        counts = merge_queue(args.merge)
+        print(f"📋 Queue: {', '.join(f'{n} {status}' for status, n in counts.items())}")
+        return
+    variants = [Variant(scheme_name, dpi, figsize)
+                for scheme_name in dict.fromkeys(args.schemes)
+                for dpi in dict.fromkeys(args.dpi)
+                for figsize in dict.fromkeys(args.size)]
+    if args.stream:
+        render_streaming(args, variants, output_format)
+        return
+
+    print("🗺️ Generating all 218 UK counties as dark maps...")
+
+    # Load the real UK county data (projected + normalised, via the geometry cache)
+    uk_gdf = load_boundaries(args.gpkg, columns=['code', 'name'] + ANCHOR_COLUMNS)
+
+    print(f"📊 Loaded {len(uk_gdf)} real UK administrative areas")
+
+    # Index by GSS code / name and find the name column
+    index = CountyIndex(uk_gdf)
+    name_col = index.name_col
+
+    print(f"📝 Using '{name_col}' for county names")
+
+    # Keep each county's position in the full layer so NNN_ numbering is stable
+    indices = index.locate(args.only) if args.only else range(len(uk_gdf))
+
+    print(f"🎨 Rendering {len(variants)} output set(s):")
+    for variant in variants:
+        # Create output directory
+        os.makedirs(variant_dir(variant), exist_ok=True)
+        print(f"  • {variant.scheme_name}, {variant.dpi} DPI, "
+              f"{variant.figsize[0]:g}x{variant.figsize[1]:g} in -> {variant_dir(variant)}/")
+    print(f"🖌️ Render engine: {args.engine}")
+    print(f"🗜️ Output: {output_format.format.upper()}"
+          + (f", {output_format.colors} colours" if output_format.colors else "")
+          + f", {args.write_threads} write thread(s)")
+
+    # Work out which PNGs are stale from each set's content-addressed manifest
+    names = county_names(uk_gdf[name_col])
+    codes = text_values(uk_gdf[index.code_col]) if index.code_col else [None] * len(uk_gdf)
+    filenames = [county_filename(idx, name, output_format.extension) for idx, name in enumerate(names)]
+    overview_name = os.path.splitext(OVERVIEW_NAME)[0] + output_format.extension
+    manifests, digests, overview_digests = {}, {}, {}
+    jobs = {}
+    overview_jobs = []
+    for variant in variants:
+        scheme = color_schemes[variant.scheme_name]
+        manifest = manifests[variant] = RenderManifest(variant_dir(variant))
+        digests[variant] = variant_digests(uk_gdf.geometry, names, variant, args.engine,
+                                           output_format)
+        for idx in indices:
+            if args.force or not manifest.is_fresh(filenames[idx], digests[variant][idx]):
+                jobs.setdefault(idx, []).append(variant)
+
+        overview_digests[variant] = settings_digest(digests[variant], scheme,
+                                                    dict(overview_settings, dpi=variant.dpi,
+                                                         labels=args.overview_labels
+                                                         and overview_settings['labels']))
+        if args.force or not manifest.is_fresh(overview_name, overview_digests[variant]):
+            overview_jobs.append((variant, f"{variant_dir(variant)}/{overview_name}"))
+
+    total = len(indices) * len(variants)
+    stale_count = sum(len(job) for job in jobs.values())
+    print(f"♻️ {total - stale_count} maps up to date, {stale_count} to render")
+
+    if args.queue:
+        run = {'gpkg': args.gpkg, 'engine': args.engine, 'output_format': output_format._asdict(),
+               'write_threads': args.write_threads, 'overview_labels': args.overview_labels,
+               'variants': variants,
+               'expected': None if args.only else filenames + [overview_name]}
+        count = submit_queue(args.queue, run, jobs, overview_jobs, names, codes, filenames,
+                             digests, overview_name, overview_digests)
+        print(f"📬 Queued {count} task(s) in {args.queue}; start workers with "
+              f"--work {args.queue}, then collect with --merge {args.queue}")
+        return
+
+    # Paths for each level of detail are built in one vectorised pass on first use
+    lod = LodPaths(args.gpkg, uk_gdf.geometry.values)
+
+    if args.profile:
+        idx = index.positions(args.profile)[0]
+        profile_path = f"{variant_dir(variants[0])}/PROFILE_{os.path.splitext(filenames[idx])[0]}.prof"
+        profile_county(names, uk_gdf.crs, lod, idx, variants, args.engine,
+                       profile_path, repeat=args.profile_repeat)
+
+    metrics = RenderMetrics()
+    run_start = time.perf_counter()
+
+    # Generate individual maps for all 218 counties
+    print(f"\n⚡ Generating {stale_count} individual county maps ({len(jobs)} counties) with {workers} worker(s)...")
+
+    rendered, failed_counties = render_all(names, uk_gdf.crs, lod, jobs,
+                                           gpkg_path=args.gpkg,
+                                           workers=workers,
+                                           engine=args.engine,
+                                           metrics=metrics,
+                                           output_format=output_format,
+                                           write_threads=args.write_threads)
+    success_count = 0
+    for idx in rendered:
+        for variant in jobs[idx]:
+            manifests[variant].record(filenames[idx], digests[variant][idx],
+                                      code=codes[idx], name=names[idx])
+            success_count += 1
+
+    print(f"\n🎊 BATCH PROCESSING COMPLETE!")
+    print(f"✅ Successfully created: {success_count} county maps")
+    print(f"❌ Failed: {len(failed_counties)} counties")
+
+    if failed_counties:
+        print("\n⚠️ Failed counties:")
+        for failure in failed_counties[:5]:  # Show first 5 failures
+            print(f"  • {failure}")
+        if len(failed_counties) > 5:
+            print(f"  ... and {len(failed_counties) - 5} more")
+
+    # Create a summary overview with all counties in dark style
+    if overview_jobs:
+        print(f"\n🌍 Creating {len(overview_jobs)} dark overview map(s) of all {len(uk_gdf)} counties...")
+        with metrics.county(None, "overview"), ImageWriter(output_format, args.write_threads) as writer:
+            render_overviews(uk_gdf, lod, overview_jobs, writer=writer, labels=args.overview_labels)
+            error = writer.wait().get('overview')
+        if error is None:
+            for variant, _ in overview_jobs:
+                manifests[variant].record(overview_name, overview_digests[variant])
+        else:
+            print(f"⚠️ Overview failed: {error}")
+    else:
+        print(f"\n🌍 Dark overview maps are up to date")
+
+    run_info = {"engine": args.engine, "workers": workers,
+                "variants": [variant._asdict() for variant in variants],
+                "counties": len(jobs), "wall_s": time.perf_counter() - run_start}
+
+    print(f"\n📋 Creating file indexes...")
+    metrics_written = False
+    for variant in variants:
+        output_dir = variant_dir(variant)
+
+        # Drop PNGs the current layer no longer produces (full runs only)
+        if not args.only:
+            orphans = manifests[variant].remove_orphans(filenames + [overview_name])
+            if orphans:
+                print(f"🧹 Removed {len(orphans)} orphaned maps from {output_dir}/")
+        manifests[variant].save()
+
+        # Create file listing
+        write_file_index(output_dir, variant)
+        print(f"📄 File index saved: {output_dir}/FILE_INDEX.txt")
+
+        # Timing/memory metrics of this run's maps in this set, next to the index
+        rows = select_rows(metrics.rows, {idx for idx, job in jobs.items() if variant in job},
+                           overview=any(v == variant for v, _ in overview_jobs))
+        if write_metrics(output_dir, rows, run_info, top=args.top):
+            metrics_written = True
+
+        if args.atlas:
+            layer = dict(zip(filenames, zip(codes, names)))
+            atlas = build_atlas(output_dir, county_entries(output_dir, layer), output_format,
+                                scale=args.atlas_scale, page_size=args.atlas_page_size)
+            if atlas is None:
+                print(f"🧩 Atlas is up to date: {output_dir}/{ATLAS_DIR}/")
+            else:
+                print(f"🧩 Atlas saved: {output_dir}/{ATLAS_DIR}/{ATLAS_NAME} "
+                      f"({len(atlas['pages'])} page(s), {atlas['fill']:.0%} filled)")
+
+    if metrics_written:
+        print(f"⏱️ Render metrics saved: RENDER_METRICS.csv / RENDER_METRICS.json")
+    slow = slowest(metrics.rows, args.top)
+    if slow:
+        print(f"\n🐢 Slowest {len(slow)} counties:")
+        for row in slow:
+            print(f"  • {row['name']}: {row['wall_s']:.2f}s wall, {row['cpu_s']:.2f}s CPU, "
+                  f"peak {row['peak_rss_mb']:.0f} MB")
+
+    print(f"\n🎯 FINAL SUMMARY:")
+    print(f"📂 Locations: {', '.join(variant_dir(v) + '/' for v in variants)}")
+    print(f"📊 Individual maps: {success_count}")
+    print(f"🌍 Overview maps: {len(overview_jobs)}")
+    print(f"📄 File indexes: {len(variants)}")
+    print(f"🎨 Styles: {', '.join(dict.fromkeys(v.scheme_name for v in variants))}")
+    print(f"📐 Resolutions: {', '.join(f'{dpi} DPI' for dpi in dict.fromkeys(v.dpi for v in variants))}")
+    print(f"💾 Total files: {sum(len(os.listdir(variant_dir(v))) for v in variants)}")
+
+    print(f"\n✨ All 218 UK counties now available as dark individual maps!")
+
+
+if __name__ == "__main__":
+    main()
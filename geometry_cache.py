@@ -0,0 +1,202 @@
+"""Pre-projected, pre-simplified geometry cache for the boundary datasets.
+
+``build_cache`` turns a source layer (e.g.
+``Counties_and_Unitary_Authorities_May_2023_UK_BGC.gpkg`` or
+``CountyUnitary.gpkg``) into ``data/cache/<stem>-<path hash>.cache.gpkg``
+holding:
+
+* geometries already reprojected to the render CRS (British National Grid),
+* one layer per simplification tolerance in ``LOD_TOLERANCES`` (``lod_0``
+  is the unsimplified geometry), simplified as a coverage so neighbouring
+  areas keep identical shared borders,
+* normalised ``code``/``name``/``name_key`` columns, so renderers no longer
+  re-detect the name column (missing values stay null),
+* ``label_x``/``label_y``/``label_r`` label anchors (see ``label_layout``),
+  computed once from the full-detail geometry and repeated on every level.
+
+``load_boundaries`` rebuilds the cache when the source changed and then
+reads the requested level with a single pyogrio read.  The source may also
+be a downloaded ``.zip``; its layer is read in place via ``archive_layers``.
+
+All reads go through ``read_layer``: pyogrio's Arrow path (``use_arrow``)
+when pyarrow is installed, restricted to the columns actually used.
+
+Run ``python geometry_cache.py <source.gpkg>`` to build a cache up front.
+"""
+import hashlib
+import json
+import os
+import sys
+
+import geopandas as gpd
+import pandas as pd
+import pyogrio
+import shapely
+
+from archive_layers import open_layer
+from county_index import CODE_COLUMNS, NAME_COLUMNS, normalise_name
+from label_layout import label_anchors
+
+try:
+    import pyarrow  # noqa: F401  (enables pyogrio's Arrow read path)
+    USE_ARROW = True
+except ImportError:
+    USE_ARROW = False
+
+# The ONS layer the render scripts, lookup and service use by default
+GPKG_PATH = "data/Counties_and_Unitary_Authorities_May_2023_UK_BGC.gpkg"
+CACHE_DIR = "data/cache"
+RENDER_CRS = "EPSG:27700"
+
+# Simplification tolerances in render-CRS metres.  At 300 DPI a 10 inch
+# frame is ~3000 px wide, so 5 m suits frames up to ~15 km across, 25 m up
+# to ~75 km, 125 m up to ~375 km, and 500 m the ~1,000 km UK overview.
+LOD_TOLERANCES = (0, 5, 25, 125, 500)
+
+# Detail finer than this fraction of an output pixel is simplified away
+LOD_PIXEL_FRACTION = 0.5
+
+CACHE_FORMAT = 4
+
+
+def read_layer(path, columns=None, **kwargs):
+    """Columnar read of ``path`` (Arrow-backed when pyarrow is available)."""
+    return pyogrio.read_dataframe(path, columns=columns, use_arrow=USE_ARROW, **kwargs)
+
+
+def cache_path(source, cache_dir=CACHE_DIR):
+    """Cache file of ``source``, keyed by its resolved path as well as its stem.
+
+    ``CountyUnitary.gpkg`` and ``CountyUnitary.zip`` (or same-named files in
+    different folders) thus get caches of their own.
+    """
+    stem = os.path.splitext(os.path.basename(source))[0]
+    key = hashlib.sha1(os.path.realpath(source).encode()).hexdigest()[:8]
+    return os.path.join(cache_dir, f"{stem}-{key}.cache.gpkg")
+
+
+def _source_stamp(source):
+    stat = os.stat(source)
+    return {"source": os.path.abspath(source), "size": stat.st_size,
+            "mtime": stat.st_mtime, "crs": RENDER_CRS,
+            "levels": list(LOD_TOLERANCES), "format": CACHE_FORMAT}
+
+
+def _read_stamp(path):
+    try:
+        with open(path + ".json") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_fresh(source, cache_dir=CACHE_DIR):
+    path = cache_path(source, cache_dir)
+    return os.path.exists(path) and _read_stamp(path) == _source_stamp(source)
+
+
+def simplify(geometries, tolerance):
+    """Topology-preserving simplification of a whole layer.
+
+    Valid coverages (the ONS/OS layers) go through GEOS coverage
+    simplification, which simplifies each shared border once so adjacent
+    areas stay gap- and overlap-free.  Anything else falls back to
+    per-geometry ``preserve_topology`` simplification.
+    """
+    if tolerance == 0:
+        return geometries
+    if shapely.coverage_is_valid(geometries):
+        return shapely.coverage_simplify(geometries, tolerance)
+    return shapely.simplify(geometries, tolerance, preserve_topology=True)
+
+
+def pick_tolerance(bounds, figsize, dpi, margin=0.05):
+    """Coarsest cached tolerance that stays below ``LOD_PIXEL_FRACTION`` px.
+
+    ``bounds`` is the extent the frame is fitted to and ``figsize``/``dpi``
+    the output size; the pixel size is taken over the whole figure, which
+    slightly overestimates the pixels the axes get (i.e. errs on detail).
+    """
+    minx, miny, maxx, maxy = bounds
+    metres_per_pixel = max((maxx - minx) * (1 + 2 * margin) / (figsize[0] * dpi),
+                           (maxy - miny) * (1 + 2 * margin) / (figsize[1] * dpi))
+    return tolerance_for_pixel(metres_per_pixel)
+
+
+def tolerance_for_pixel(metres_per_pixel):
+    """Coarsest cached tolerance below ``LOD_PIXEL_FRACTION`` of a pixel this size."""
+    allowed = metres_per_pixel * LOD_PIXEL_FRACTION
+    return max(t for t in LOD_TOLERANCES if t <= allowed)
+
+
+def layer_columns(layer):
+    """``(name_col, code_col)`` of ``layer`` from its schema alone (``None`` if absent)."""
+    fields = list(pyogrio.read_info(layer)["fields"])
+    return (next((col for col in NAME_COLUMNS if col in fields), None),
+            next((col for col in CODE_COLUMNS if col in fields), None))
+
+
+def text_values(column):
+    """Values as strings, missing ones as ``None`` (``astype(str)`` would give ``'nan'``)."""
+    return [None if pd.isna(value) else str(value) for value in column]
+
+
+def build_cache(source, cache_dir=CACHE_DIR):
+    """Project, normalise and simplify ``source`` into its cache file."""
+    layer = open_layer(source) if source.lower().endswith('.zip') else source
+
+    # Only read the name/code attributes, never the rest of the table
+    name_col, code_col = layer_columns(layer)
+    gdf = read_layer(layer, columns=[col for col in (name_col, code_col) if col])
+
+    if gdf.crs is not None and gdf.crs != RENDER_CRS:
+        gdf = gdf.to_crs(RENDER_CRS)
+
+    names = text_values(gdf[name_col]) if name_col else list(gdf.index.astype(str))
+    anchors = label_anchors(gdf.geometry.values)
+    base = gpd.GeoDataFrame({
+        "code": text_values(gdf[code_col]) if code_col else None,
+        "name": names,
+        "name_key": [None if name is None else normalise_name(name) for name in names],
+        "label_x": anchors[:, 0],
+        "label_y": anchors[:, 1],
+        "label_r": anchors[:, 2],
+    }, geometry=gdf.geometry.values, crs=gdf.crs or RENDER_CRS)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(source, cache_dir)
+    # Per-process temporary names: processes building the same cache at
+    # once each write their own copy, and the last rename wins
+    tmp_path = f"{path}.{os.getpid()}.tmp.gpkg"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    for tolerance in LOD_TOLERANCES:
+        level = base.set_geometry(simplify(base.geometry.values, tolerance), crs=base.crs)
+        pyogrio.write_dataframe(level, tmp_path, layer=f"lod_{tolerance}", driver="GPKG")
+    os.replace(tmp_path, path)
+
+    with open(f"{path}.{os.getpid()}.json", "w") as f:
+        json.dump(_source_stamp(source), f, indent=1)
+    os.replace(f"{path}.{os.getpid()}.json", path + ".json")
+    return path
+
+
+def load_boundaries(source, tolerance=0, cache_dir=CACHE_DIR, columns=None):
+    """Load ``source`` from its cache at simplification level ``tolerance``.
+
+    Returns a GeoDataFrame in ``RENDER_CRS`` with ``code``, ``name``,
+    ``name_key`` and label anchor columns.  The cache is (re)built first if needed.
+    """
+    if tolerance not in LOD_TOLERANCES:
+        raise ValueError(f"tolerance must be one of {LOD_TOLERANCES}, got {tolerance!r}")
+    if not is_fresh(source, cache_dir):
+        build_cache(source, cache_dir)
+    return read_layer(cache_path(source, cache_dir), columns=columns,
+                      layer=f"lod_{tolerance}")
+
+
+if __name__ == "__main__":
+    for source in sys.argv[1:]:
+        print(f"🗂️ Building geometry cache for {source}...")
+        path = build_cache(source)
+        print(f"💾 Saved: {path} (levels: {', '.join(f'lod_{t}' for t in LOD_TOLERANCES)})")
@@ -0,0 +1,114 @@
+"""Bulk shapely -> matplotlib ``Path`` conversion for a whole boundary layer.
+
+Instead of walking every polygon ring in Python per county, the entire
+geometry array is flattened once with shapely 2's vectorised
+``get_parts``/``get_rings``/``get_coordinates`` into a single vertex buffer,
+a matching path-code buffer and a per-geometry offset table.  Fetching one
+county's ``Path`` is then just a pair of array slices (views, no copies).
+"""
+import numpy as np
+import shapely
+
+from geometry_cache import CACHE_DIR, load_boundaries, pick_tolerance
+from topology import Topology
+
+# ``matplotlib.path.Path`` codes; matplotlib itself is only imported to build
+# ``Path`` objects, so code that just needs the buffers doesn't load it
+MOVETO, LINETO, CLOSEPOLY = 1, 2, 79
+CODE_TYPE = np.uint8
+
+
+class PathBuffer:
+    """Flat vertex/code buffers for a sequence of (Multi)Polygons.
+
+    ``vertices[offsets[i]:offsets[i + 1]]`` holds every ring of geometry
+    ``i``; ``bounds[i]`` is its ``(minx, miny, maxx, maxy)``.
+    """
+
+    def __init__(self, vertices, codes, offsets, bounds):
+        self.vertices = vertices
+        self.codes = codes
+        self.offsets = offsets
+        self.bounds = bounds
+
+    @classmethod
+    def from_geometries(cls, geometries):
+        geoms = np.asarray(geometries, dtype=object)
+        # Exterior CCW / holes CW so holes stay empty under the non-zero fill rule
+        geoms = shapely.orient_polygons(geoms)
+
+        parts, part_geom = shapely.get_parts(geoms, return_index=True)
+        rings, ring_part = shapely.get_rings(parts, return_index=True)
+        vertices, vertex_ring = shapely.get_coordinates(rings, return_index=True)
+
+        # Every ring opens with MOVETO and closes with CLOSEPOLY
+        ring_sizes = np.bincount(vertex_ring, minlength=len(rings))
+        ring_ends = np.cumsum(ring_sizes)
+        non_empty = ring_sizes > 0
+        codes = np.full(len(vertices), LINETO, dtype=CODE_TYPE)
+        codes[(ring_ends - ring_sizes)[non_empty]] = MOVETO
+        codes[ring_ends[non_empty] - 1] = CLOSEPOLY
+
+        vertex_geom = part_geom[ring_part][vertex_ring]
+        offsets = np.zeros(len(geoms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(vertex_geom, minlength=len(geoms)), out=offsets[1:])
+
+        return cls(vertices, codes, offsets, shapely.bounds(geoms))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def path(self, i):
+        from matplotlib.path import Path
+        start, stop = self.offsets[i], self.offsets[i + 1]
+        return Path(self.vertices[start:stop], self.codes[start:stop])
+
+    def paths(self, indices=None):
+        indices = range(len(self)) if indices is None else indices
+        return [self.path(i) for i in indices]
+
+    def total_bounds(self, indices=None):
+        bounds = self.bounds if indices is None else self.bounds[list(indices)]
+        return (np.nanmin(bounds[:, 0]), np.nanmin(bounds[:, 1]),
+                np.nanmax(bounds[:, 2]), np.nanmax(bounds[:, 3]))
+
+
+class LodPaths:
+    """Per-level ``PathBuffer``s for a cached layer, loaded on first use.
+
+    ``geometries`` are the full-detail (``lod_0``) geometries the caller
+    already has; they provide the framing bounds so every level of detail
+    frames identically.
+    """
+
+    def __init__(self, source, geometries, cache_dir=CACHE_DIR):
+        self.source = source
+        self.cache_dir = cache_dir
+        self.bounds = shapely.bounds(np.asarray(geometries, dtype=object))
+        self._geometries = geometries
+        self._buffers = {}
+        self._topologies = {}
+
+    def _level_geometries(self, tolerance):
+        if tolerance == 0:
+            return self._geometries
+        return load_boundaries(self.source, tolerance, self.cache_dir, columns=[]).geometry.values
+
+    def level(self, tolerance):
+        if tolerance not in self._buffers:
+            self._buffers[tolerance] = PathBuffer.from_geometries(self._level_geometries(tolerance))
+        return self._buffers[tolerance]
+
+    def topology(self, tolerance):
+        """Shared-border ``Topology`` of a level, for stroking each border once."""
+        if tolerance not in self._topologies:
+            self._topologies[tolerance] = Topology.from_geometries(self._level_geometries(tolerance))
+        return self._topologies[tolerance]
+
+    def total_bounds(self):
+        return (np.nanmin(self.bounds[:, 0]), np.nanmin(self.bounds[:, 1]),
+                np.nanmax(self.bounds[:, 2]), np.nanmax(self.bounds[:, 3]))
+
+    def path(self, idx, figsize, dpi):
+        """County ``idx``'s path at the level of detail for that output size."""
+        return self.level(pick_tolerance(self.bounds[idx], figsize, dpi)).path(idx)
@@ -1,23 +1,30 @@
-import geopandas as gpd
-import matplotlib.pyplot as plt
 import os
 
-# Load shapefile/GeoPackage
-gdf = gpd.read_file("data/Counties.gpkg")
+from county_index import CountyIndex
+from geometry_cache import load_boundaries
+from geometry_paths import PathBuffer
+from render_engine import MapRenderer
+
+# Load shapefile/GeoPackage (through the projected geometry cache)
+gdf = load_boundaries("data/Counties.gpkg", columns=['code', 'name'])
+
+# Index by GSS code and name
+index = CountyIndex(gdf)
+paths = PathBuffer.from_geometries(gdf.geometry)
 
 # Ensure an output folder exists
 os.makedirs("output_counties", exist_ok=True)
 
-# Loop through counties
-for _, row in gdf.iterrows():
-    name = row["CTYUA21NM"]  # Column with county name (may vary, check gdf.columns)
-    county = gdf[gdf["CTYUA21NM"] == name]
-    
-    fig, ax = plt.subplots(figsize=(6,6))
-    county.plot(ax=ax, color="skyblue", edgecolor="black")
-    ax.axis("off")
+# One reusable figure for every county
+renderer = MapRenderer(figsize=(6,6))
+
+# Loop through counties, once per distinct name (all parts sharing a name go in one map)
+for name, positions in index.names():
+    renderer.clear()
+    renderer.add_paths(paths.paths(positions), paths.total_bounds(positions),
+                       color="skyblue", edgecolor="black")
+    renderer.frame(crs=gdf.crs)
     
-    plt.savefig(f"output_counties/{name}.png", bbox_inches="tight", pad_inches=0, dpi=300)
-    plt.close()
+    renderer.save_fitted(f"output_counties/{name}.png", pad_inches=0, dpi=300)
 
 print("All county PNGs saved in output_counties/")
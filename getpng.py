@@ -1,39 +1,24 @@
-import geopandas as gpd
-import matplotlib.pyplot as plt
 import os
 import re
-import zipfile
-import requests
 from tqdm import tqdm  # for progress bar
+from boundary_fetch import cached, fetch
+from geometry_cache import load_boundaries
+from geometry_paths import PathBuffer
+from render_engine import MapRenderer
 
 # --- 1. Download Boundary-Line dataset ---
 url = "https://osdatahub.os.uk/downloads/open/BoundaryLine/GB/CountyUnitary.gpkg.zip"
 zip_path = "CountyUnitary.zip"
 
-if not os.path.exists(zip_path):
+if cached(url, zip_path) is None:
     print("Downloading Boundary-Line dataset...")
-    r = requests.get(url, stream=True)
-    total_size = int(r.headers.get('content-length', 0))
-    with open(zip_path, "wb") as f, tqdm(
-        total=total_size, unit='B', unit_scale=True, desc="Downloading"
-    ) as bar:
-        for chunk in r.iter_content(1024):
-            f.write(chunk)
-            bar.update(len(chunk))
+    fetch(url, zip_path)  # streams, resumes and records the SHA-256
 else:
     print("Boundary-Line ZIP already exists, skipping download.")
 
-# --- 2. Extract ZIP ---
-extract_dir = "data"
-os.makedirs(extract_dir, exist_ok=True)
-
-with zipfile.ZipFile(zip_path, "r") as zip_ref:
-    zip_ref.extractall(extract_dir)
-print(f"Extracted to {extract_dir}/")
-
-# --- 3. Load GeoPackage ---
-gpkg_path = os.path.join(extract_dir, "CountyUnitary.gpkg")
-gdf = gpd.read_file(gpkg_path)
+# --- 2./3. Load GeoPackage straight from the ZIP (no extractall) ---
+gdf = load_boundaries(zip_path, columns=["name"])
+print(f"Loaded {len(gdf)} areas from {zip_path}")
 
 # --- 4. Prepare output folder ---
 output_dir = "output_counties"
@@ -41,17 +26,15 @@ os.makedirs(output_dir, exist_ok=True)
 
 # --- 5. Loop through counties and save PNGs ---
 print("Generating PNGs for each county/unitary authority...")
-for idx, row in tqdm(gdf.iterrows(), total=len(gdf), desc="Counties"):
-    name = row["CTYUA21NM"]  # adjust if column name differs
+paths = PathBuffer.from_geometries(gdf.geometry)
+renderer = MapRenderer(figsize=(6,6))
+for i, name in enumerate(tqdm(gdf["name"].tolist(), desc="Counties")):
     safe_name = re.sub(r'[\\/*?:"<>|]', "_", name)
     
-    county = gpd.GeoDataFrame([row], crs=gdf.crs)
-    
-    fig, ax = plt.subplots(figsize=(6,6))
-    county.plot(ax=ax, color="skyblue", edgecolor="black")
-    ax.axis("off")
+    renderer.clear()
+    renderer.add_paths([paths.path(i)], paths.bounds[i], color="skyblue", edgecolor="black")
+    renderer.frame(crs=gdf.crs)
     
-    plt.savefig(f"{output_dir}/{safe_name}.png", bbox_inches="tight", pad_inches=0, dpi=300)
-    plt.close()
+    renderer.save_fitted(f"{output_dir}/{safe_name}.png", pad_inches=0, dpi=300)
 
 print(f"All county PNGs saved in {output_dir}/")
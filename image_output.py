@@ -0,0 +1,104 @@
+"""Configurable image encoding and background writes for rendered maps.
+
+``OutputFormat`` holds everything that decides the bytes of an output
+file: the format (PNG, WebP or AVIF), the PNG zlib level, optional palette
+quantisation and the lossy quality.  The dark maps are a fill, an edge and
+antialiasing ramps between them on white, so a 16 colour palette is
+visually lossless and typically under half the size of the truecolour PNG.
+
+``ImageWriter`` encodes and writes on a small thread pool so the render
+loop can draw the next frame meanwhile.  The number of images in flight is
+bounded to keep memory flat at 300 DPI.
+"""
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, features
+
+FORMATS = {'png': '.png', 'webp': '.webp', 'avif': '.avif'}
+IMAGE_EXTENSIONS = tuple(FORMATS.values())
+
+
+class OutputFormat(namedtuple('OutputFormat', 'format compress_level colors quality lossless')):
+    """Encoder settings; ``colors=0`` keeps truecolour, ``quality`` is for WebP/AVIF."""
+
+    __slots__ = ()
+
+    def __new__(cls, format='png', compress_level=6, colors=0, quality=90, lossless=False):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown output format {format!r}; expected one of {list(FORMATS)}")
+        if format != 'png' and not features.check(format):
+            raise ValueError(f"This Pillow build cannot write {format.upper()}")
+        return super().__new__(cls, format, compress_level, colors, quality, lossless)
+
+    @property
+    def extension(self):
+        return FORMATS[self.format]
+
+    def encode(self, image, target, dpi):
+        """Write ``image`` to ``target`` (a path or binary file object)."""
+        if self.colors:
+            image = image.quantize(self.colors, method=Image.Quantize.FASTOCTREE,
+                                   dither=Image.Dither.NONE)
+        if self.format == 'png':
+            image.save(target, format='PNG', compress_level=self.compress_level, dpi=(dpi, dpi))
+        else:
+            if image.mode == 'P':
+                image = image.convert('RGB')  # WebP/AVIF have no palette mode
+            image.save(target, format=self.format.upper(), quality=self.quality,
+                       lossless=self.lossless)
+
+
+DEFAULT_FORMAT = OutputFormat()
+
+
+class ImageWriter:
+    """Encodes and writes images on ``threads`` background threads.
+
+    ``threads=0`` writes inline, so errors surface from ``submit`` itself.
+    Otherwise writes are grouped by ``key`` (e.g. county index) and
+    ``wait`` reports which groups failed.
+    """
+
+    def __init__(self, output_format=DEFAULT_FORMAT, threads=0, max_pending=None):
+        self.output_format = output_format
+        self.threads = threads
+        self._pool = ThreadPoolExecutor(max_workers=threads) if threads else None
+        self._slots = threading.BoundedSemaphore(max_pending or 2 * threads or 1)
+        self._pending = {}
+
+    def submit(self, image, target, dpi, key=None):
+        if self._pool is None:
+            self.output_format.encode(image, target, dpi)
+            return
+        self._slots.acquire()  # blocks the renderer when the writers fall behind
+        future = self._pool.submit(self.output_format.encode, image, target, dpi)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._pending.setdefault(key, []).append(future)
+
+    def wait(self, keys=None):
+        """Block until the writes for ``keys`` (default: all) finish.
+
+        Returns ``{key: exception}`` for groups where a write failed.
+        """
+        keys = list(self._pending) if keys is None else keys
+        errors = {}
+        for key in keys:
+            for future in self._pending.pop(key, []):
+                error = future.exception()
+                if error is not None and key not in errors:
+                    errors[key] = error
+        return errors
+
+    def close(self):
+        errors = self.wait()
+        if self._pool is not None:
+            self._pool.shutdown()
+        return errors
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,102 @@
+"""Label anchors and collision-free label placement for combined maps.
+
+Anchors are poles of inaccessibility: the centre of each area's maximum
+inscribed circle, computed for the whole layer in one vectorised
+``shapely.maximum_inscribed_circle`` call.  Unlike a centroid it always
+lies inside the area, also for concave and multi-part counties (where it
+lands in the part with most room).  ``geometry_cache`` stores them as
+``label_x``/``label_y``/``label_r`` columns, so renderers read them with the
+geometry instead of recomputing.
+
+``place_labels`` is a greedy placer: labels are tried in priority order
+(largest inscribed circle first by default) at a few candidate positions
+around their anchor, and kept at the first one whose box does not overlap a
+label already placed.  Placed boxes go into a uniform grid, so each test
+only looks at the few boxes in the cells it covers.
+"""
+import numpy as np
+import shapely
+
+ANCHOR_COLUMNS = ['label_x', 'label_y', 'label_r']
+
+# Candidate label centres, as fractions of the label's half width/height
+# away from the anchor: on it, then above/below, then to the sides
+CANDIDATES = ((0, 0), (0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (-1, 1), (1, -1), (-1, -1))
+
+
+def label_anchors(geometries, tolerance=None):
+    """``(n, 3)`` array of anchor x, y and inscribed radius per geometry.
+
+    ``tolerance`` defaults to shapely's ``max(width, height) / 1000`` per
+    geometry; empty or missing geometries get NaN.
+    """
+    geometries = np.asarray(geometries, dtype=object)
+    circles = shapely.maximum_inscribed_circle(geometries, tolerance)
+    centres = shapely.get_point(circles, 0)
+    return np.column_stack([shapely.get_x(centres), shapely.get_y(centres),
+                            shapely.length(circles)])
+
+
+def anchors_of(gdf):
+    """Cached anchors of a ``load_boundaries`` frame, computed if the columns are missing."""
+    if all(col in gdf.columns for col in ANCHOR_COLUMNS):
+        return gdf[ANCHOR_COLUMNS].to_numpy(dtype=float)
+    return label_anchors(gdf.geometry.values)
+
+
+class _BoxGrid:
+    """Uniform grid of placed ``(minx, miny, maxx, maxy)`` boxes."""
+
+    def __init__(self, cell):
+        self.cell = cell
+        self.cells = {}
+        self.boxes = []
+
+    def _keys(self, box):
+        ix0, iy0, ix1, iy1 = (int(np.floor(v / self.cell)) for v in box)
+        return [(ix, iy) for ix in range(ix0, ix1 + 1) for iy in range(iy0, iy1 + 1)]
+
+    def free(self, box):
+        for key in self._keys(box):
+            for other in self.cells.get(key, ()):
+                other = self.boxes[other]
+                if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                    return False
+        return True
+
+    def add(self, box):
+        for key in self._keys(box):
+            self.cells.setdefault(key, []).append(len(self.boxes))
+        self.boxes.append(box)
+
+
+def place_labels(anchors, sizes, priority=None, candidates=CANDIDATES):
+    """Greedy collision-free label centres.
+
+    ``anchors`` is ``(n, 3)`` x, y, radius (see ``label_anchors``) and
+    ``sizes`` ``(n, 2)`` label width and height, both in data units.  A
+    candidate is only used while its centre stays within the anchor's
+    inscribed circle.  Returns ``(n, 2)`` centres, NaN for labels that did
+    not fit anywhere.
+    """
+    anchors = np.asarray(anchors, dtype=float)
+    sizes = np.asarray(sizes, dtype=float)
+    priority = anchors[:, 2] if priority is None else np.asarray(priority, dtype=float)
+    placed = np.full((len(anchors), 2), np.nan)
+    valid = np.isfinite(anchors).all(axis=1) & np.isfinite(sizes).all(axis=1)
+    if not valid.any():
+        return placed
+
+    grid = _BoxGrid(max(np.median(sizes[valid].max(axis=1)), 1e-9))
+    offsets = np.asarray(candidates, dtype=float)
+    for i in sorted(np.flatnonzero(valid), key=lambda i: -np.nan_to_num(priority[i], nan=-np.inf)):
+        (x, y, radius), (w, h) = anchors[i], sizes[i]
+        for dx, dy in offsets * (w / 2, h / 2):
+            if (dx or dy) and np.hypot(dx, dy) > radius:
+                continue
+            box = (x + dx - w / 2, y + dy - h / 2, x + dx + w / 2, y + dy + h / 2)
+            if grid.free(box):
+                grid.add(box)
+                placed[i] = (x + dx, y + dy)
+                break
+    return placed
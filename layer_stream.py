@@ -0,0 +1,56 @@
+"""Chunked reads of boundary layers too large to hold in memory at once.
+
+``iter_chunks`` reads a layer ``chunk_size`` features at a time with
+pyogrio's ``skip_features``/``max_features`` (GeoPackage and shapefile
+layers seek to a feature index directly), optionally reprojecting each
+chunk.  ``layer_summary`` gets the feature count and extent from the layer
+metadata, so an overview can be framed before any geometry is read.
+
+``ChunkPaths`` is the ``LodPaths`` counterpart for one chunk: the geometry
+cache needs the whole layer, so its levels of detail are simplified in
+memory instead.
+"""
+import pyogrio
+import pyproj
+
+from geometry_cache import read_layer, simplify
+from geometry_paths import LodPaths
+
+CHUNK_FEATURES = 16
+
+
+def layer_summary(layer, to_crs=None):
+    """``(feature count, crs, total bounds)`` of ``layer``, bounds in ``to_crs`` if given."""
+    info = pyogrio.read_info(layer, force_feature_count=True, force_total_bounds=True)
+    crs = pyproj.CRS.from_user_input(info["crs"]) if info["crs"] else None
+    bounds = tuple(info["total_bounds"])
+    if to_crs is not None and crs is not None and crs != pyproj.CRS.from_user_input(to_crs):
+        # Densified edges, since a projected box is no longer a box
+        transformer = pyproj.Transformer.from_crs(crs, to_crs, always_xy=True)
+        bounds, crs = transformer.transform_bounds(*bounds), pyproj.CRS.from_user_input(to_crs)
+    return info["features"], crs, bounds
+
+
+def iter_chunks(layer, chunk_size=CHUNK_FEATURES, columns=None, to_crs=None):
+    """Yield ``(start, GeoDataFrame)`` for consecutive runs of ``chunk_size`` features."""
+    start = 0
+    while True:
+        gdf = read_layer(layer, columns=columns, skip_features=start, max_features=chunk_size)
+        if len(gdf) == 0:
+            return
+        if to_crs is not None and gdf.crs is not None and gdf.crs != to_crs:
+            gdf = gdf.to_crs(to_crs)
+        yield start, gdf
+        if len(gdf) < chunk_size:
+            return
+        start += len(gdf)
+
+
+class ChunkPaths(LodPaths):
+    """``LodPaths`` over one chunk's geometries, simplified in memory per level."""
+
+    def __init__(self, geometries):
+        super().__init__(None, geometries)
+
+    def _level_geometries(self, tolerance):
+        return simplify(self._geometries, tolerance)
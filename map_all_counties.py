@@ -1,13 +1,17 @@
-import geopandas as gpd
-import matplotlib.pyplot as plt
 import os
 
+from geometry_cache import load_boundaries
+from geometry_paths import PathBuffer
+from label_layout import ANCHOR_COLUMNS, anchors_of
+from render_engine import MapRenderer
+
 # Load the realistic test data that was created
 print("Loading the 5 test counties...")
-gdf = gpd.read_file("data/UK_Test_Realistic.gpkg")
+gdf = load_boundaries("data/UK_Test_Realistic.gpkg", columns=['name'] + ANCHOR_COLUMNS)
+names = gdf['name'].tolist()
 
 print(f"Found {len(gdf)} counties:")
-for i, name in enumerate(gdf['name']):
+for i, name in enumerate(names):
     print(f"  {i+1}. {name}")
 
 # Create individual maps for each county
@@ -18,66 +22,57 @@ edge_colors = ['darkred', 'darkgreen', 'orange', 'navy', 'purple']
 
 os.makedirs("output_counties", exist_ok=True)
 
-for i, (idx, row) in enumerate(gdf.iterrows()):
-    name = row['name']
+paths = PathBuffer.from_geometries(gdf.geometry)
+renderer = MapRenderer(figsize=(10, 8))
+for i, name in enumerate(names):
     color = colors[i % len(colors)]
     edge_color = edge_colors[i % len(edge_colors)]
     
     print(f"Creating map for: {name}")
     
-    # Create single county GeoDataFrame
-    county = gpd.GeoDataFrame([row], crs=gdf.crs)
-    
-    # Create the map
-    fig, ax = plt.subplots(figsize=(10, 8))
-    county.plot(ax=ax, color=color, edgecolor=edge_color, linewidth=3)
+    # Swap this county into the shared figure
+    renderer.clear()
+    renderer.add_paths([paths.path(i)], paths.bounds[i], color=color, edgecolor=edge_color, linewidth=3)
+    renderer.frame(crs=gdf.crs)
     
-    ax.set_title(f"{name}", fontsize=18, pad=20, weight='bold')
-    ax.axis("off")
-    ax.set_facecolor('lightsteelblue')  # Water/background
+    renderer.set_title(f"{name}", fontsize=18, pad=20, weight='bold')
+    renderer.ax.set_facecolor('lightsteelblue')  # Water/background
     
     # Add some styling touches
-    ax.grid(True, alpha=0.2)
+    renderer.ax.grid(True, alpha=0.2)
     
     # Save individual map
     safe_name = name.replace(" ", "_")
     output_path = f"output_counties/{safe_name}_Individual.png"
-    plt.savefig(output_path, bbox_inches="tight", pad_inches=0.2, 
-               dpi=300, facecolor='white')
+    renderer.save_fitted(output_path, pad_inches=0.2, 
+                         dpi=300, facecolor='white')
     
     print(f"  ✅ Saved: {output_path}")
-    plt.show()
-    plt.close()
 
 # Create a combined map showing all counties together
 print("\nCreating combined map of all counties...")
 
-fig, ax = plt.subplots(figsize=(15, 12))
+combined = MapRenderer(figsize=(15, 12))
+combined.add_paths(paths.paths(), paths.total_bounds(),
+                   color=[colors[i % len(colors)] for i in range(len(gdf))],
+                   edgecolor=[edge_colors[i % len(edge_colors)] for i in range(len(gdf))],
+                   linewidth=2, alpha=0.8)
+combined.frame(crs=gdf.crs)
 
-for i, (idx, row) in enumerate(gdf.iterrows()):
-    county = gpd.GeoDataFrame([row], crs=gdf.crs)
-    county.plot(ax=ax, color=colors[i], edgecolor=edge_colors[i], 
-               linewidth=2, alpha=0.8)
-    
-    # Add county name labels
-    centroid = county.geometry.centroid.iloc[0]
-    ax.annotate(row['name'], xy=(centroid.x, centroid.y), 
-               fontsize=12, ha='center', va='center', weight='bold',
-               bbox=dict(boxstyle="round,pad=0.3", facecolor='white', alpha=0.8))
+# Add county name labels at their cached anchors, skipping any that would overlap
+combined.add_labels(names, anchors_of(gdf), fontsize=12, weight='bold',
+                    bbox=dict(boxstyle="round,pad=0.3", facecolor='white', alpha=0.8))
 
-ax.set_title("All Test UK Counties", fontsize=20, pad=30, weight='bold')
-ax.axis("off")
-ax.set_facecolor('lightsteelblue')
-ax.grid(True, alpha=0.2)
+combined.set_title("All Test UK Counties", fontsize=20, pad=30, weight='bold')
+combined.ax.set_facecolor('lightsteelblue')
+combined.ax.grid(True, alpha=0.2)
 
 # Save combined map
 combined_path = "output_counties/All_Counties_Combined.png"
-plt.savefig(combined_path, bbox_inches="tight", pad_inches=0.3, 
-           dpi=300, facecolor='white')
+combined.save_fitted(combined_path, pad_inches=0.3,
+                     dpi=300, facecolor='white')
 
 print(f"✅ Combined map saved: {combined_path}")
-plt.show()
-plt.close()
 
 print(f"\n🎉 Complete! Generated maps for all {len(gdf)} counties")
 print(f"📁 Files in output folder: {sorted(os.listdir('output_counties'))}")
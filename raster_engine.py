@@ -0,0 +1,226 @@
+"""Direct Pillow rasteriser for plain county silhouettes.
+
+The dark maps are a filled polygon, an edge stroke and a title on a flat
+background, so this engine skips matplotlib's artist stack entirely: the
+projected rings from a ``PathBuffer`` are scan-converted with
+``ImageDraw`` into supersampled masks (exteriors filled, holes cleared,
+edges stroked), box-filtered down for antialiasing and composited with the
+scheme colours before the PNG is written.
+
+The page layout comes from ``frame_layout.fit_frame``, the same crop the
+matplotlib engine uses: the data extent plus 5 % margins fitted into the
+default subplot box, the title above it and ``pad_inches`` all round, so
+the two engines give the same image size and framing.  The title is
+measured with matplotlib's own text layout when matplotlib is installed
+(its metrics changed between releases), else estimated with Pillow.
+
+``python raster_engine.py --compare DIR_A DIR_B`` pixel-diffs two output
+folders (e.g. one rendered with each engine).
+"""
+import functools
+import importlib.util
+import math
+import os
+import sys
+
+import numpy as np
+from PIL import Image, ImageChops, ImageColor, ImageDraw, ImageFont
+
+from frame_layout import fit_frame
+from geometry_paths import MOVETO
+
+
+def _title_font(size_px, weight='bold'):
+    """DejaVu Sans (matplotlib's default face) without importing matplotlib."""
+    name = "DejaVuSans-Bold.ttf" if weight == 'bold' else "DejaVuSans.ttf"
+    spec = importlib.util.find_spec("matplotlib")
+    if spec is not None and spec.submodule_search_locations:
+        path = os.path.join(spec.submodule_search_locations[0], "mpl-data", "fonts", "ttf", name)
+        if os.path.exists(path):
+            return ImageFont.truetype(path, size_px)
+    return ImageFont.load_default(size_px)
+
+
+@functools.lru_cache(maxsize=None)
+def _layout_text(dpi):
+    """A baseline-anchored matplotlib ``Text`` and Agg renderer at ``dpi``."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    figure = Figure(dpi=dpi)
+    renderer = FigureCanvasAgg(figure).get_renderer()
+    return figure.text(0, 0, "", va='baseline'), renderer
+
+
+def title_metrics(title, fontsize=12, weight='normal', dpi=300):
+    """``(width, ascent)`` in pixels of ``title`` as matplotlib would lay it out."""
+    if importlib.util.find_spec("matplotlib") is not None:
+        text, renderer = _layout_text(dpi)
+        text.set_text(title)
+        text.set_fontsize(fontsize)
+        text.set_fontweight(weight)
+        extent = text.get_window_extent(renderer)
+        return extent.width, extent.y1
+    # matplotlib sizes text by the "lp" glyph box, rounded up to whole
+    # pixels; the width is unhinted, so measure both on a large reference size
+    size_px = fontsize * dpi / 72
+    reference = _title_font(1000, weight)
+    ascent = math.ceil(-reference.getbbox("lp", anchor='ls')[1] * size_px / 1000)
+    return reference.getlength(title) * size_px / 1000, ascent
+
+
+def to_rgb(color):
+    return ImageColor.getrgb(color)[:3]
+
+
+def _rings(vertices, codes):
+    """Split one county's buffers into (ring, is_hole) pairs."""
+    starts = np.flatnonzero(codes == MOVETO)
+    for start, stop in zip(starts, list(starts[1:]) + [len(codes)]):
+        ring = vertices[start:stop]
+        x, y = ring[:, 0], ring[:, 1]
+        signed_area = np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1])
+        yield ring, signed_area < 0  # PathBuffer orients holes clockwise
+
+
+def scan_convert(vertices, codes, size, origin, scale, stroke_px, supersample=3, offsets=None):
+    """Antialiased ``(fill, edge)`` coverage masks of ``size`` pixels.
+
+    Data coordinates map to pixels as ``(origin_x + x * scale,
+    origin_y - y * scale)``.  Rings are drawn into masks ``supersample``
+    times larger and box-filtered down.  With several geometries in the
+    buffers, pass their vertex ``offsets``: each one's holes are then only
+    cleared from its own fill, so an enclave drawn before the county around
+    it is not erased.
+    """
+    ss = supersample
+    fill_mask = Image.new('L', (size[0] * ss, size[1] * ss), 0)
+    edge_mask = Image.new('L', fill_mask.size, 0)
+    edge_draw = ImageDraw.Draw(edge_mask)
+    stroke = max(1, int(round(stroke_px * ss)))
+    offsets = [0, len(codes)] if offsets is None else offsets
+    for start, stop in zip(offsets[:-1], offsets[1:]):
+        rings = list(_rings(vertices[start:stop], codes[start:stop]))
+        # Geometries with holes are filled on their own and merged in
+        target = (Image.new('L', fill_mask.size, 0)
+                  if len(offsets) > 2 and any(is_hole for _, is_hole in rings) else fill_mask)
+        fill_draw = ImageDraw.Draw(target)
+        for ring, is_hole in rings:
+            px = np.empty_like(ring)
+            px[:, 0] = (origin[0] + ring[:, 0] * scale) * ss
+            px[:, 1] = (origin[1] - ring[:, 1] * scale) * ss
+            points = [tuple(p) for p in px]
+            fill_draw.polygon(points, fill=0 if is_hole else 255)
+            edge_draw.line(points, fill=255, width=stroke, joint='curve')
+        if target is not fill_mask:
+            fill_mask = ImageChops.lighter(fill_mask, target)
+    return fill_mask.reduce(ss), edge_mask.reduce(ss)
+
+
+class RasterRenderer:
+    """Renders one county at a time straight to Pillow images.
+
+    ``rasterise`` does the scan conversion once per (county, size, DPI);
+    ``composite`` then turns the masks into an image for any colour scheme,
+    so several schemes of the same frame cost one rasterisation.
+    """
+
+    margin = 0.05
+
+    def __init__(self, figsize=(10, 8), supersample=3):
+        self.figsize = figsize
+        self.supersample = supersample
+
+    def set_figsize(self, figsize):
+        self.figsize = figsize
+
+    def layout(self, bounds, dpi, title_px=0, pad_inches=0.1, title_w=0):
+        """Image size and data->pixel transform for a frame fitted to ``bounds``."""
+        minx, miny, maxx, maxy = bounds
+        pad_x = (maxx - minx) * self.margin
+        pad_y = (maxy - miny) * self.margin
+        frame = fit_frame(maxx - minx + 2 * pad_x, maxy - miny + 2 * pad_y, self.figsize, dpi,
+                          title_w, title_px, pad_inches)
+        origin_x = frame.left - (minx - pad_x) * frame.scale
+        origin_y = frame.height - frame.bottom + (miny - pad_y) * frame.scale
+        return frame.width, frame.height, frame.scale, origin_x, origin_y
+
+    def rasterise(self, vertices, codes, bounds, dpi=300, linewidth=2, title=None,
+                  title_kw=None, pad_inches=0.1):
+        """Antialiased ``(fill, edge, title)`` coverage masks for one frame."""
+        title_kw = title_kw or {}
+        font = title_px = title_w = None
+        if title:
+            fontsize, weight = title_kw.get('fontsize', 12), title_kw.get('weight', 'normal')
+            font = _title_font(fontsize * dpi / 72, weight)
+            # matplotlib puts the title baseline ``pad`` points above the axes
+            title_w, ascent = title_metrics(title, fontsize, weight, dpi)
+            title_px = ascent + title_kw.get('pad', 6) * dpi / 72
+
+        image_w, image_h, scale, origin_x, origin_y = self.layout(bounds, dpi, title_px or 0,
+                                                                  pad_inches, title_w or 0)
+
+        fill_mask, edge_mask = scan_convert(vertices, codes, (image_w, image_h),
+                                            (origin_x, origin_y), scale,
+                                            linewidth * dpi / 72, self.supersample)
+
+        title_mask = Image.new('L', (image_w, image_h), 0)
+        if title:
+            axes_top = origin_y - (bounds[3] + (bounds[3] - bounds[1]) * self.margin) * scale
+            ImageDraw.Draw(title_mask).text(
+                (origin_x + (bounds[0] + bounds[2]) / 2 * scale, axes_top - title_kw.get('pad', 6) * dpi / 72),
+                title, font=font, fill=255, anchor='ms')
+        return fill_mask, edge_mask, title_mask
+
+    def composite(self, masks, scheme, facecolor='white', title_color='black'):
+        fill_mask, edge_mask, title_mask = masks
+        image = Image.new('RGB', fill_mask.size, to_rgb(facecolor))
+        image.paste(to_rgb(scheme['fill']), mask=fill_mask)
+        image.paste(to_rgb(scheme['edge']), mask=edge_mask)
+        image.paste(to_rgb(title_color), mask=title_mask)
+        return image
+
+    def render(self, vertices, codes, bounds, scheme, dpi=300, facecolor='white', **kwargs):
+        masks = self.rasterise(vertices, codes, bounds, dpi=dpi, **kwargs)
+        title_color = (kwargs.get('title_kw') or {}).get('color', 'black')
+        return self.composite(masks, scheme, facecolor, title_color)
+
+    def render_images(self, paths, idx, schemes, dpi=300, facecolor='white', **kwargs):
+        """Images of county ``idx`` in each of ``schemes``, from one rasterisation."""
+        start, stop = paths.offsets[idx], paths.offsets[idx + 1]
+        masks = self.rasterise(paths.vertices[start:stop], paths.codes[start:stop],
+                               paths.bounds[idx], dpi=dpi, **kwargs)
+        title_color = (kwargs.get('title_kw') or {}).get('color', 'black')
+        return [self.composite(masks, scheme, facecolor, title_color) for scheme in schemes]
+
+    def render_county(self, paths, idx, outputs, dpi=300, facecolor='white', **kwargs):
+        """Write county ``idx`` once per ``(scheme, target)`` in ``outputs``.
+
+        Targets are file paths or binary file objects.
+        """
+        images = self.render_images(paths, idx, [scheme for scheme, _ in outputs],
+                                    dpi=dpi, facecolor=facecolor, **kwargs)
+        for image, (_, target) in zip(images, outputs):
+            image.save(target, format='PNG', dpi=(dpi, dpi))
+        return [target for _, target in outputs]
+
+
+def image_diff(path_a, path_b, threshold=64):
+    """Fraction of pixels whose greyscale values differ by more than ``threshold``.
+
+    Returns 1.0 when the images differ in size.
+    """
+    a = np.asarray(Image.open(path_a).convert('L'), dtype=np.int16)
+    b = np.asarray(Image.open(path_b).convert('L'), dtype=np.int16)
+    if a.shape != b.shape:
+        return 1.0
+    return float((np.abs(a - b) > threshold).mean())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "--compare":
+        sys.exit("usage: python raster_engine.py --compare DIR_A DIR_B")
+    dir_a, dir_b = sys.argv[2:]
+    for filename in sorted(f for f in os.listdir(dir_a) if f.endswith('.png')):
+        if os.path.exists(os.path.join(dir_b, filename)):
+            diff = image_diff(os.path.join(dir_a, filename), os.path.join(dir_b, filename))
+            print(f"{diff:8.4%}  {filename}")
@@ -1,9 +1,14 @@
-import geopandas as gpd
-import matplotlib.pyplot as plt
-import requests
-import zipfile
 import os
-from io import BytesIO
+
+import pyogrio
+
+from archive_layers import find_layer_member, open_layer
+from boundary_fetch import FetchError
+from county_index import find_name_column
+from geometry_cache import read_layer
+from layer_stream import CHUNK_FEATURES, iter_chunks, layer_summary
+from render_engine import MapRenderer
+from source_probe import resolve
 
 print("📥 Downloading REAL UK County Boundaries from Official ONS Sources...")
 
@@ -30,51 +35,57 @@ official_sources = [
     }
 ]
 
+GPKG_OUTPUT = "data/UK_Real_Counties_Official.gpkg"
+
 success = False
 uk_gdf = None
 
-for source in official_sources:
-    print(f"\n🔄 Trying: {source['name']}")
-    print(f"   {source['description']}")
+# Probe every mirror at once and download from the first healthy one;
+# if its archive turns out to be unusable, carry on with the others
+remaining = list(official_sources)
+
+while remaining and not success:
+    print(f"\n🔄 Probing {len(remaining)} source(s) concurrently:")
+    for source in remaining:
+        print(f"   • {source['name']} - {source['description']}")
     
     try:
         print("   📡 Downloading ZIP file...")
-        response = requests.get(source['zip_url'], timeout=30)
+        zip_url, zip_path = resolve([s['zip_url'] for s in remaining], timeout=30)
+    except FetchError as e:
+        print(f"   ❌ {e}")
+        break
+    
+    source = next(s for s in remaining if s['zip_url'] == zip_url)
+    remaining.remove(source)
+    print(f"   ✅ Downloaded: {source['name']}")
+    
+    try:
+        # Find the shapefile from the archive listing
+        shp_member = find_layer_member(zip_path, ('.shp',))
         
-        if response.status_code == 200:
-            print("   📦 Extracting shapefile...")
+        if shp_member:
+            print(f"   📂 Found shapefile: {shp_member}")
+            
+            # Copy straight from the ZIP (GDAL /vsizip/) to a GeoPackage for easy
+            # reuse, a chunk at a time so the full-resolution layer fits in memory too
+            layer = open_layer(zip_path, ('.shp',))
+            if os.path.exists(GPKG_OUTPUT):
+                os.remove(GPKG_OUTPUT)
+            for start, chunk in iter_chunks(layer, CHUNK_FEATURES):
+                pyogrio.write_dataframe(chunk, GPKG_OUTPUT, driver="GPKG", append=start > 0)
+            area_count = pyogrio.read_info(GPKG_OUTPUT)["features"]
+            
+            print(f"   ✅ SUCCESS! Loaded {area_count} administrative areas")
+            print(f"   📊 Columns: {list(pyogrio.read_info(GPKG_OUTPUT)['fields'])}")
+            print(f"   💾 Saved as: {GPKG_OUTPUT}")
             
-            # Extract ZIP file
-            with zipfile.ZipFile(BytesIO(response.content)) as zip_file:
-                # Extract to temporary directory
-                extract_path = "data/temp_boundaries"
-                os.makedirs(extract_path, exist_ok=True)
-                zip_file.extractall(extract_path)
-                
-                # Find the shapefile
-                shp_files = [f for f in os.listdir(extract_path) if f.endswith('.shp')]
-                
-                if shp_files:
-                    shp_path = os.path.join(extract_path, shp_files[0])
-                    print(f"   📂 Found shapefile: {shp_files[0]}")
-                    
-                    # Load the data
-                    uk_gdf = gpd.read_file(shp_path)
-                    
-                    print(f"   ✅ SUCCESS! Loaded {len(uk_gdf)} administrative areas")
-                    print(f"   📊 Columns: {list(uk_gdf.columns)}")
-                    
-                    # Save as GeoPackage for easy reuse
-                    uk_gdf.to_file("data/UK_Real_Counties_Official.gpkg", driver="GPKG")
-                    print("   💾 Saved as: data/UK_Real_Counties_Official.gpkg")
-                    
-                    success = True
-                    break
-                else:
-                    print("   ❌ No shapefile found in ZIP")
-                    
+            # Only the first areas are needed in memory below
+            uk_gdf = read_layer(GPKG_OUTPUT, max_features=10)
+            
+            success = True
         else:
-            print(f"   ❌ Download failed: HTTP {response.status_code}")
+            print("   ❌ No shapefile found in ZIP")
             
     except Exception as e:
         print(f"   ❌ Error: {e}")
@@ -85,76 +96,69 @@ if success and uk_gdf is not None:
     
     # Find the best column for names
     name_columns = ['CTYUA23NM', 'NAME', 'name', 'CTYUA21NM', 'county_name', 'COUNTY']
-    name_col = None
-    
-    for col in name_columns:
-        if col in uk_gdf.columns:
-            name_col = col
-            print(f"📝 Using '{col}' for area names")
-            break
+    name_col = find_name_column(uk_gdf, name_columns)
     
-    if name_col is None:
+    if name_col is not None:
+        print(f"📝 Using '{name_col}' for area names")
+    else:
         name_col = uk_gdf.columns[0]
         print(f"📝 Using first column '{name_col}' for names")
     
     # Show sample of what we got
     print(f"\n🏴󠁧󠁢󠁥󠁮󠁧󠁿 Sample UK Counties/Areas:")
-    for i in range(min(10, len(uk_gdf))):
-        area_name = uk_gdf.iloc[i][name_col]
+    for i, area_name in enumerate(uk_gdf[name_col].head(10).tolist()):
         print(f"  {i+1:2d}. {area_name}")
     
-    if len(uk_gdf) > 10:
-        print(f"     ... and {len(uk_gdf) - 10} more areas")
+    if area_count > 10:
+        print(f"     ... and {area_count - 10} more areas")
     
     # Create a map of the first real county
     print(f"\n🗺️ Creating map of first area...")
-    first_row = uk_gdf.iloc[0]
-    first_name = str(first_row[name_col])
+    first_name = str(uk_gdf[name_col].iat[0])
     
     # Single county map
-    county_gdf = gpd.GeoDataFrame([first_row], crs=uk_gdf.crs)
-    
-    fig, ax = plt.subplots(figsize=(12, 10))
-    county_gdf.plot(ax=ax, color='lightcoral', edgecolor='darkred', linewidth=2)
+    renderer = MapRenderer(figsize=(12, 10))
+    renderer.add_geometries(uk_gdf.geometry.values[:1], color='lightcoral', edgecolor='darkred', linewidth=2)
+    renderer.frame(crs=uk_gdf.crs)
     
-    ax.set_title(f"REAL UK Boundary: {first_name}", fontsize=18, weight='bold', pad=20)
-    ax.axis('off')
-    ax.set_facecolor('lightsteelblue')
+    renderer.set_title(f"REAL UK Boundary: {first_name}", fontsize=18, weight='bold', pad=20)
+    renderer.ax.set_facecolor('lightsteelblue')
     
     # Save individual map
     safe_name = first_name.replace('/', '_').replace(' ', '_').replace("'", "")
     individual_path = f"output_counties/{safe_name}_REAL_OFFICIAL.png"
-    plt.savefig(individual_path, bbox_inches='tight', pad_inches=0.2, dpi=300, facecolor='white')
+    renderer.save_fitted(individual_path, pad_inches=0.2, dpi=300, facecolor='white')
     
     print(f"💾 Individual map saved: {individual_path}")
-    plt.show()
-    plt.close()
     
     # Create overview map of ALL real UK areas
-    print(f"\n🌍 Creating overview map of all {len(uk_gdf)} real UK areas...")
+    print(f"\n🌍 Creating overview map of all {area_count} real UK areas...")
     
-    fig, ax = plt.subplots(figsize=(20, 16))
+    overview = MapRenderer(figsize=(20, 16))
+    _, crs, bounds = layer_summary(GPKG_OUTPUT)
+    overview.frame(bounds, crs=crs)
     
-    # Plot all areas with different colors
-    uk_gdf.plot(ax=ax, color='lightgreen', edgecolor='white', linewidth=0.8, alpha=0.8)
+    overview.set_title(f"Official UK Counties & Unitary Authorities ({area_count} areas)", 
+                       fontsize=24, weight='bold', pad=30)
+    overview.ax.set_facecolor('lightsteelblue')
     
-    ax.set_title(f"Official UK Counties & Unitary Authorities ({len(uk_gdf)} areas)", 
-                fontsize=24, weight='bold', pad=30)
-    ax.axis('off')
-    ax.set_facecolor('lightsteelblue')
+    # Plot the areas chunk by chunk onto one canvas
+    with overview.accumulate(dpi=300, pad_inches=0.3, facecolor='white') as flush:
+        for _, chunk in iter_chunks(GPKG_OUTPUT, CHUNK_FEATURES, columns=[]):
+            overview.add_coverage(chunk.geometry.values, color='lightgreen', edgecolor='white', linewidth=0.8, alpha=0.8)
+            flush()
+        overview_image = overview.canvas_image()
     
     # Save overview
     overview_path = "output_counties/UK_All_Real_Counties_Official.png"
-    plt.savefig(overview_path, bbox_inches='tight', pad_inches=0.3, dpi=300, facecolor='white')
+    overview_image.save(overview_path, dpi=(300, 300))
     
     print(f"💾 Overview map saved: {overview_path}")
-    plt.show()
-    plt.close()
     
     print(f"\n🎯 SUCCESS SUMMARY:")
     print(f"✅ Downloaded official UK government boundary data")
-    print(f"✅ {len(uk_gdf)} real administrative areas loaded")
-    print(f"✅ Data saved as: data/UK_Real_Counties_Official.gpkg")
+    print(f"✅ {area_count} real administrative areas loaded")
+    print(f"✅ Data saved as: {GPKG_OUTPUT}")
     print(f"✅ Individual map: {individual_path}")
     print(f"✅ Overview map: {overview_path}")
     print(f"\n📁 These are REAL boundaries from the UK Office for National Statistics!")
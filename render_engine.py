@@ -0,0 +1,295 @@
+"""Headless, reusable map renderer shared by the county scripts.
+
+Builds one Agg ``Figure``/``FigureCanvasAgg`` pair up front and reuses it
+for every frame: between maps only the county artists, the axes extent and
+the title are swapped.  Nothing here touches ``matplotlib.pyplot``, so there
+is no global figure manager state and no GUI backend involved.
+
+``save_fitted`` writes the same crop as ``bbox_inches='tight'`` without
+its extra layout draw: the figure is sized to the frame computed by
+``frame_layout.fit_frame`` before the single draw that produces the PNG.
+"""
+from contextlib import contextmanager
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PatchCollection
+from matplotlib.figure import Figure
+from matplotlib.patches import PathPatch
+from matplotlib.transforms import Bbox
+from PIL import Image
+
+from frame_layout import fit_frame
+from geometry_paths import PathBuffer
+from label_layout import place_labels
+from topology import Topology
+
+
+class MapRenderer:
+    """One reusable figure + axes for drawing county maps.
+
+    Typical use::
+
+        renderer = MapRenderer(figsize=(10, 8))
+        renderer.clear()
+        renderer.add_paths([paths.path(i)], paths.bounds[i],
+                           color="black", edgecolor="white", linewidth=2)
+        renderer.frame(crs=gdf.crs)
+        renderer.set_title("Hartlepool", fontsize=16, weight="bold", pad=15)
+        renderer.save_fitted("out.png", dpi=300, pad_inches=0.1)
+    """
+
+    # Same padding matplotlib's autoscale adds around collections
+    margin = 0.05
+
+    def __init__(self, figsize=(10, 8)):
+        self.figsize = figsize
+        self.fig = Figure(figsize=figsize)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        self.ax.axis("off")
+        self._artists = []
+        self._bounds = None
+
+    def set_figsize(self, figsize):
+        self.figsize = figsize
+        self.fig.set_size_inches(figsize)
+
+    def clear(self):
+        """Drop the previous frame's artists, title and extent."""
+        self.clear_artists()
+        self._bounds = None
+        self.ax.set_title("")
+
+    def clear_artists(self):
+        """Drop the artists added since ``clear``, keeping the title and extent."""
+        for artist in self._artists:
+            artist.remove()
+        self._artists = []
+
+    def add_paths(self, paths, bounds, color, edgecolor, linewidth=1.0, alpha=None):
+        """Add pre-built ``Path`` objects covering ``bounds`` (minx, miny, maxx, maxy)."""
+        collection = PatchCollection([PathPatch(path) for path in paths],
+                                     facecolor=color, edgecolor=edgecolor,
+                                     linewidth=linewidth, alpha=alpha)
+        self.ax.add_collection(collection, autolim=False)
+        self._artists.append(collection)
+        self._extend_bounds(bounds)
+        return collection
+
+    def add_lines(self, lines, bounds, color, linewidth=1.0, alpha=None):
+        """Add polylines (``(n, 2)`` vertex arrays), e.g. shared borders from ``topology``."""
+        collection = LineCollection(lines, colors=color, linewidths=linewidth, alpha=alpha,
+                                    capstyle='round', joinstyle='round')
+        self.ax.add_collection(collection, autolim=False)
+        self._artists.append(collection)
+        self._extend_bounds(bounds)
+        return collection
+
+    def add_geometries(self, geometries, color, edgecolor, linewidth=1.0, alpha=None):
+        """Add shapely polygons; ``color``/``edgecolor`` may be per-geometry lists.
+
+        Loops that draw many counties from one layer should build a
+        ``PathBuffer`` once and call ``add_paths`` instead.
+        """
+        buffer = PathBuffer.from_geometries(geometries)
+        return self.add_paths(buffer.paths(), buffer.total_bounds(),
+                              color, edgecolor, linewidth, alpha)
+
+    def add_coverage(self, geometries, color, edgecolor, linewidth=1.0, alpha=None):
+        """Add polygons that share borders: edge-less fills, then each border once.
+
+        Stroking every polygon outline draws shared borders twice (and, with
+        ``alpha``, darker than the coast); returns ``(fills, borders)``.
+        """
+        buffer = PathBuffer.from_geometries(geometries)
+        fills = self.add_paths(buffer.paths(), buffer.total_bounds(), color, 'none', alpha=alpha)
+        borders = self.add_lines(Topology.from_geometries(geometries).arc_coordinates(),
+                                 buffer.total_bounds(), edgecolor, linewidth, alpha)
+        return fills, borders
+
+    def annotate(self, text, xy, **kwargs):
+        annotation = self.ax.annotate(text, xy=xy, **kwargs)
+        self._artists.append(annotation)
+        return annotation
+
+    def add_labels(self, texts, anchors, priority=None, gap=0.3, **kwargs):
+        """Label areas at ``anchors`` (``label_layout``), dropping labels that would collide.
+
+        Call after ``frame``: label sizes are converted to data units with the
+        framed scale.  ``gap`` is the margin kept around each label in
+        multiples of its font size (0.3 fits a ``boxstyle="round,pad=0.3"``
+        bbox).  Returns the placed annotations.
+        """
+        xmin, xmax = self.ax.get_xlim()
+        ymin, ymax = self.ax.get_ylim()
+        aspect = self.ax.get_aspect()
+        # At 72 DPI one pixel is one point, whatever DPI the map is saved at
+        points_per_unit = fit_frame(xmax - xmin, (ymax - ymin) * aspect, self.figsize, 72).scale
+
+        annotations = [self.ax.annotate(text, xy=(x, y), ha='center', va='center', **kwargs)
+                       for text, (x, y) in zip(texts, np.asarray(anchors)[:, :2])]
+        renderer, to_points = self.canvas.get_renderer(), 72 / self.fig.dpi
+        sizes = np.array([(extent.width * to_points + 2 * gap * ann.get_fontsize(),
+                           extent.height * to_points + 2 * gap * ann.get_fontsize())
+                          for ann in annotations
+                          for extent in [ann.get_window_extent(renderer)]])
+        sizes /= (points_per_unit, points_per_unit * aspect)
+
+        placed = []
+        for ann, xy in zip(annotations, place_labels(anchors, sizes, priority)):
+            if np.isnan(xy[0]):
+                ann.remove()
+                continue
+            ann.xy = ann.xyann = tuple(xy)
+            self._artists.append(ann)
+            placed.append(ann)
+        return placed
+
+    def set_title(self, text, **kwargs):
+        return self.ax.set_title(text, **kwargs)
+
+    def frame(self, bounds=None, crs=None):
+        """Fit the axes to ``bounds`` (default: everything added since ``clear``).
+
+        Geographic (lon/lat) ``crs`` get the same ``1 / cos(latitude)`` aspect
+        correction geopandas applies; projected data use an equal aspect.
+        """
+        minx, miny, maxx, maxy = bounds if bounds is not None else self._bounds
+        pad_x = (maxx - minx) * self.margin
+        pad_y = (maxy - miny) * self.margin
+        self.ax.set_xlim(minx - pad_x, maxx + pad_x)
+        self.ax.set_ylim(miny - pad_y, maxy + pad_y)
+        if crs is not None and crs.is_geographic:
+            self.ax.set_aspect(1 / np.cos(np.deg2rad((miny + maxy) / 2)))
+        else:
+            self.ax.set_aspect("equal")
+
+    def save(self, path, dpi=300, **kwargs):
+        self.fig.savefig(path, dpi=dpi, **kwargs)
+
+    def save_fitted(self, path, dpi=300, pad_inches=0.1, **kwargs):
+        """Save cropped to the framed axes, title and ``pad_inches`` in one draw.
+
+        Gives the image ``bbox_inches='tight'`` would for a map with the axes
+        turned off, but computes the crop from the axes limits, aspect and
+        title and label extents instead of drawing the figure to measure it.
+        """
+        if self.ax.get_aspect() == "auto":  # not framed; only a draw can tell the extent
+            return self.save(path, dpi=dpi, bbox_inches="tight", pad_inches=pad_inches, **kwargs)
+        with self._fitted(dpi, pad_inches):
+            self.fig.savefig(path, dpi=dpi, **kwargs)
+
+    def render_fitted(self, dpi=300, pad_inches=0.1, facecolor='white', edgecolor='none'):
+        """The ``save_fitted`` crop as an RGB Pillow image, left to the caller to encode."""
+        if self.ax.get_aspect() == "auto":
+            raise ValueError("render_fitted needs a framed axes; call frame() first")
+        patch = self.fig.patch
+        colors = patch.get_facecolor(), patch.get_edgecolor()
+        patch.set_facecolor(facecolor)
+        patch.set_edgecolor(edgecolor)
+        try:
+            with self._fitted(dpi, pad_inches):
+                self.canvas.draw()
+                return self.canvas_image()
+        finally:
+            patch.set_facecolor(colors[0])
+            patch.set_edgecolor(colors[1])
+
+    @contextmanager
+    def accumulate(self, dpi=300, pad_inches=0.1, facecolor='white', edgecolor='none'):
+        """Fitted canvas that keeps what is drawn on it, for layers read in chunks.
+
+        Call after ``frame`` (with the layer's full bounds) and ``set_title``.
+        On entry the background, title and any artists added so far are
+        drawn once; inside the block, the ``flush`` callable it yields draws
+        the artists added since the last call straight onto that canvas and
+        removes them, so only one chunk's artists exist at a time.
+        ``canvas_image`` reads the result.
+        """
+        if self.ax.get_aspect() == "auto":
+            raise ValueError("accumulate needs a framed axes; call frame() first")
+        patch = self.fig.patch
+        colors = patch.get_facecolor(), patch.get_edgecolor()
+        patch.set_facecolor(facecolor)
+        patch.set_edgecolor(edgecolor)
+
+        def flush():
+            for artist in self._artists:
+                self.ax.draw_artist(artist)
+            self.clear_artists()
+
+        try:
+            with self._fitted(dpi, pad_inches):
+                self.canvas.draw()
+                self.clear_artists()
+                yield flush
+        finally:
+            patch.set_facecolor(colors[0])
+            patch.set_edgecolor(colors[1])
+
+    def canvas_image(self):
+        """The canvas as drawn so far, as an RGB Pillow image.
+
+        ``convert`` copies, so the canvas can be reused for the next frame.
+        """
+        return Image.frombuffer('RGBA', self.canvas.get_width_height(),
+                                self.canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1).convert('RGB')
+
+    @contextmanager
+    def _fitted(self, dpi, pad_inches):
+        """Size the figure and place the axes for the fitted crop at ``dpi``."""
+        size, position = self.fig.get_size_inches(), self.ax.get_position(original=True)
+        self.fig.set_dpi(dpi)
+        title_w = title_h = 0
+        if self.ax.get_title():
+            # Text layout only needs font metrics at this DPI, not a draw
+            title = self.ax.title.get_window_extent(self.canvas.get_renderer())
+            title_w, title_h = title.width, title.y1 - self.ax.bbox.y1
+
+        xmin, xmax = self.ax.get_xlim()
+        ymin, ymax = self.ax.get_ylim()
+        extent = xmax - xmin, (ymax - ymin) * self.ax.get_aspect()
+        frame = fit_frame(*extent, self.figsize, dpi, title_w, title_h, pad_inches)
+        self._place(frame, dpi)
+        overhang = self._text_overhang()
+        if any(overhang):
+            # Labels keep their offset from the axes, so measuring them once
+            # placed is enough to widen the crop around them
+            frame = fit_frame(*extent, self.figsize, dpi, title_w, title_h, pad_inches, overhang)
+            self._place(frame, dpi)
+        try:
+            yield frame
+        finally:
+            self.fig.set_size_inches(size)
+            self.ax.set_position(position)
+
+    def _place(self, frame, dpi):
+        # Pixels -> inches -> pixels can land just below a whole pixel
+        # (603 / 150 * 150 == 602.999...), which matplotlib < 3.11 truncates
+        self.fig.set_size_inches((frame.width + 1e-6) / dpi, (frame.height + 1e-6) / dpi)
+        self.ax.set_position([frame.left / frame.width, frame.bottom / frame.height,
+                              frame.axes_w / frame.width, frame.axes_h / frame.height])
+
+    def _text_overhang(self):
+        """How far the axes' texts reach past its left, bottom, right and top, in pixels.
+
+        Uses the extents ``bbox_inches='tight'`` would: annotations whose
+        point lies outside the axes are not drawn and don't count.
+        """
+        renderer, box = self.canvas.get_renderer(), self.ax.bbox
+        extents = [text.get_tightbbox(renderer) for text in self.ax.texts
+                   if text.get_visible() and text.get_in_layout()]
+        extents = [extent for extent in extents if extent.width > 0 and extent.height > 0]
+        if not extents:
+            return (0.0, 0.0, 0.0, 0.0)
+        union = Bbox.union(extents)
+        return (max(box.x0 - union.x0, 0.0), max(box.y0 - union.y0, 0.0),
+                max(union.x1 - box.x1, 0.0), max(union.y1 - box.y1, 0.0))
+
+    def _extend_bounds(self, bounds):
+        if self._bounds is None:
+            self._bounds = tuple(bounds)
+        else:
+            self._bounds = (min(self._bounds[0], bounds[0]), min(self._bounds[1], bounds[1]),
+                            max(self._bounds[2], bounds[2]), max(self._bounds[3], bounds[3]))
@@ -0,0 +1,75 @@
+"""Content-addressed manifest for incremental batch renders.
+
+Each output PNG is recorded with a SHA-256 digest of everything that
+determines its pixels: the county geometry as WKB, its name and the style /
+figure settings.  A later run only re-renders files whose digest changed
+(or that went missing) and deletes recorded PNGs no longer produced by
+the layer.
+"""
+import hashlib
+import json
+import os
+
+import shapely
+
+MANIFEST_NAME = "MANIFEST.json"
+
+
+def settings_digest(*settings):
+    """Stable digest of JSON-serialisable settings (dict key order ignored)."""
+    payload = json.dumps(settings, sort_keys=True, default=str).encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+def county_digests(geometries, names, settings):
+    """One hex digest per county covering geometry WKB, name and ``settings``."""
+    style = settings_digest(settings).encode()
+    wkbs = shapely.to_wkb(list(geometries))
+    digests = []
+    for wkb, name in zip(wkbs, names):
+        h = hashlib.sha256(style)
+        h.update(str(name).encode())
+        h.update(b"\0")
+        h.update(wkb if wkb is not None else b"")
+        digests.append(h.hexdigest())
+    return digests
+
+
+class RenderManifest:
+    """``{filename: {"digest": ..., **extra}}`` stored beside FILE_INDEX.txt."""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.entries = json.load(f).get("files", {})
+
+    def is_fresh(self, filename, digest):
+        entry = self.entries.get(filename)
+        return (entry is not None and entry["digest"] == digest
+                and os.path.exists(os.path.join(self.output_dir, filename)))
+
+    def record(self, filename, digest, **extra):
+        self.entries[filename] = {"digest": digest, **extra}
+
+    def remove_orphans(self, expected):
+        """Delete recorded images (and entries) not in ``expected``; returns removed names.
+
+        Only files with a manifest entry are touched: images the manifest
+        never recorded (e.g. from before it existed) are left alone.
+        """
+        orphans = sorted(set(self.entries) - set(expected))
+        for filename in orphans:
+            path = os.path.join(self.output_dir, filename)
+            if os.path.exists(path):
+                os.remove(path)
+            self.entries.pop(filename, None)
+        return orphans
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"files": self.entries}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
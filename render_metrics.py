@@ -0,0 +1,173 @@
+"""Per-county, per-stage timing and memory metrics for batch renders.
+
+``RenderMetrics`` records wall time (``perf_counter``), CPU time
+(``process_time``) and peak resident memory for each stage of each
+county.  On Linux the kernel's RSS high-water mark is reset at the start of
+every stage (``/proc/self/clear_refs``), so the peak is that stage's own;
+elsewhere it falls back to the process-wide ``ru_maxrss``.
+
+Stages can also be attached to methods the renderer calls internally,
+e.g. ``Figure.draw`` inside ``savefig``, without changing the rendering
+code (``instrument``), or to each item a generator produces
+(``iterate``).  Method stages nest inside the one that triggers
+them (``draw`` within ``save``), so they overlap rather than
+add up; ``total`` covers the whole county.
+"""
+import csv
+import functools
+import json
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+CSV_NAME = "RENDER_METRICS.csv"
+JSON_NAME = "RENDER_METRICS.json"
+FIELDS = ['idx', 'name', 'stage', 'wall_s', 'cpu_s', 'peak_rss_mb']
+
+
+def _reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+class RenderMetrics:
+    """Collects ``FIELDS`` rows; one per (county, stage)."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.rows = []
+        self._county = (None, None)
+        self._open_peaks = []  # running peak of each enclosing stage
+
+    @contextmanager
+    def county(self, idx, name):
+        """Scope for one county; records its ``total`` stage."""
+        previous, self._county = self._county, (idx, name)
+        try:
+            with self.stage("total"):
+                yield
+        finally:
+            self._county = previous
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        # Resetting the high-water mark would hide the enclosing stages'
+        # peaks so far, so fold the current one into them first
+        if self._open_peaks:
+            peak = _peak_rss_mb()
+            self._open_peaks = [max(p, peak) for p in self._open_peaks]
+        _reset_peak_rss()
+        self._open_peaks.append(0.0)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            peak = max(self._open_peaks.pop(), _peak_rss_mb())
+            if self._open_peaks:
+                self._open_peaks = [max(p, peak) for p in self._open_peaks]
+            idx, county_name = self._county
+            self.rows.append({
+                'idx': idx, 'name': county_name, 'stage': name,
+                'wall_s': time.perf_counter() - wall,
+                'cpu_s': time.process_time() - cpu,
+                'peak_rss_mb': peak,
+            })
+
+    def instrument(self, obj, method, stage):
+        """Time every call of ``obj.method`` as ``stage`` (instance-level wrap)."""
+        original = getattr(obj, method)
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            with self.stage(stage):
+                return original(*args, **kwargs)
+
+        setattr(obj, method, timed)
+
+    def iterate(self, iterable, stage):
+        """Yield from ``iterable``, timing each item's production as ``stage``.
+
+        For reads done by a generator, e.g. a layer read chunk by chunk.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(stage):
+                item = next(iterator, StopIteration)
+            if item is StopIteration:
+                return
+            yield item
+
+    def take_rows(self):
+        """Return and clear the rows recorded so far (for worker results)."""
+        rows, self.rows = self.rows, []
+        return rows
+
+
+# Shared no-op recorder for callers that don't collect metrics
+NO_METRICS = RenderMetrics(enabled=False)
+
+
+def stage_summary(rows):
+    """``{stage: {count, wall_s, cpu_s, max_peak_rss_mb}}`` over ``rows``."""
+    summary = {}
+    for row in rows:
+        entry = summary.setdefault(row['stage'], {'count': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                                  'max_peak_rss_mb': 0.0})
+        entry['count'] += 1
+        entry['wall_s'] += row['wall_s']
+        entry['cpu_s'] += row['cpu_s']
+        entry['max_peak_rss_mb'] = max(entry['max_peak_rss_mb'], row['peak_rss_mb'])
+    return summary
+
+
+def slowest(rows, top=5):
+    """The ``top`` county ``total`` rows by wall time."""
+    totals = [row for row in rows if row['stage'] == 'total' and row['idx'] is not None]
+    return sorted(totals, key=lambda row: row['wall_s'], reverse=True)[:top]
+
+
+def select_rows(rows, counties, overview=True):
+    """Rows of the county indices in ``counties``, plus the overview's if ``overview``."""
+    return [row for row in rows
+            if (overview if row['idx'] is None else row['idx'] in counties)]
+
+
+def write_metrics(output_dir, rows, run_info, top=5):
+    """Write ``RENDER_METRICS.csv`` (every row) and ``RENDER_METRICS.json`` (summary).
+
+    Nothing is written without rows, so a run with nothing to render keeps
+    the previous run's metrics.  Returns whether the files were written.
+    """
+    if not rows:
+        return False
+    with open(f"{output_dir}/{CSV_NAME}", 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, 'wall_s': f"{row['wall_s']:.6f}",
+                             'cpu_s': f"{row['cpu_s']:.6f}",
+                             'peak_rss_mb': f"{row['peak_rss_mb']:.1f}"})
+    with open(f"{output_dir}/{JSON_NAME}", 'w') as f:
+        json.dump({"run": run_info, "stages": stage_summary(rows),
+                   "slowest": slowest(rows, top)}, f, indent=1)
+    return True
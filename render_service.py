@@ -0,0 +1,259 @@
+"""Local HTTP render service with a warm geometry cache.
+
+Loads the boundary layer once, keeps a pool of render processes that each
+hold the layer, its level-of-detail paths and a reusable figure, and serves
+
+    GET /county/{code}.png?scheme=navy&dpi=150
+
+where ``{code}`` is a GSS code or a county name (URL-encoded).  Rendered
+PNGs are kept in an in-memory LRU cache bounded by total byte size;
+concurrent requests for the same image share one render.
+
+    python render_service.py --gpkg data/Counties.gpkg --port 8000 --workers 0
+
+``GET /counties`` lists the codes and names being served and ``GET /stats``
+reports cache usage.  A name shared by several counties is answered with
+409 and their codes, so the client can ask for one by code.
+"""
+import argparse
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pandas as pd
+
+from county_index import CountyIndex
+from generate_all_counties_dark import (ENGINES, Variant, color_schemes, county_names,
+                                        county_settings, draw_county, make_renderer)
+from geometry_cache import GPKG_PATH, load_boundaries, text_values
+from geometry_paths import LodPaths
+
+DEFAULT_CACHE_BYTES = 256 << 20  # 256 MiB
+DPI_RANGE = (10, 600)
+
+
+class AmbiguousCounty(KeyError):
+    """A county name that matches several counties; ``codes`` lists them."""
+
+    def __init__(self, key, codes):
+        super().__init__(f"{key!r} matches {len(codes)} counties; request one by code")
+        self.codes = codes
+
+
+class ByteLRUCache:
+    """Thread-safe LRU mapping evicted by total value size, not entry count."""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self.size,
+                    "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
+
+
+# Per-process state for the render pool (same layout as the batch workers)
+_worker_names = None
+_worker_crs = None
+_worker_lod = None
+_worker_renderer = None
+
+
+def _init_worker(gpkg_path, engine):
+    global _worker_names, _worker_crs, _worker_lod, _worker_renderer
+    gdf = load_boundaries(gpkg_path, columns=['name'])
+    _worker_names = county_names(gdf['name'])
+    _worker_crs = gdf.crs
+    _worker_lod = LodPaths(gpkg_path, gdf.geometry.values)
+    _worker_renderer = make_renderer(engine)
+
+
+def _render_png(idx, scheme_name, dpi):
+    buffer = io.BytesIO()
+    variant = Variant(scheme_name, dpi, county_settings['figsize'])
+    draw_county(_worker_renderer, idx, _worker_lod, _worker_names[idx],
+                [(variant, buffer)], crs=_worker_crs)
+    return buffer.getvalue()
+
+
+def _ready():
+    return os.getpid()
+
+
+class RenderService:
+    """County lookup, byte cache and process pool behind the HTTP handler."""
+
+    def __init__(self, gpkg_path=GPKG_PATH, engine='matplotlib', workers=1,
+                 cache_bytes=DEFAULT_CACHE_BYTES):
+        self.gdf = load_boundaries(gpkg_path, columns=['code', 'name'])
+        self.index = CountyIndex(self.gdf)
+        self.engine = engine
+        self.cache = ByteLRUCache(cache_bytes)
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                        initargs=(gpkg_path, engine))
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+
+        # Start every worker now so the first requests don't pay the cold start
+        for future in [self.pool.submit(_ready) for _ in range(workers)]:
+            future.result()
+
+    def render(self, key, scheme_name, dpi):
+        """PNG bytes for county ``key``; raises ``KeyError`` for unknown counties.
+
+        A name shared by several counties raises ``AmbiguousCounty``.
+        """
+        positions = self.index.positions(key)
+        if len(positions) > 1:
+            raise AmbiguousCounty(key, text_values(self.gdf['code'].iloc[positions]))
+        idx = positions[0]
+        cache_key = (idx, scheme_name, dpi)
+        png = self.cache.get(cache_key)
+        if png is not None:
+            return png, True
+
+        # Identical concurrent requests wait on the same render
+        with self._pending_lock:
+            future = self._pending.get(cache_key)
+            submitted = future is None
+            if submitted:
+                future = self.pool.submit(_render_png, idx, scheme_name, dpi)
+                self._pending[cache_key] = future
+        if submitted:
+            # Outside the lock: the callback runs inline if the render already finished
+            future.add_done_callback(lambda f: self._finish(cache_key, f))
+        return future.result(), False
+
+    def _finish(self, cache_key, future):
+        if future.exception() is None:
+            self.cache.put(cache_key, future.result())
+        with self._pending_lock:
+            self._pending.pop(cache_key, None)
+
+    def counties(self):
+        return [{"code": None if pd.isna(code) else code, "name": name}
+                for code, name in zip(self.gdf['code'], self.gdf['name'])]
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    service = None  # set by make_server
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/counties":
+            return self._send_json(200, self.service.counties())
+        if url.path == "/stats":
+            return self._send_json(200, self.service.cache.stats())
+        if not (url.path.startswith("/county/") and url.path.endswith(".png")):
+            return self._send_json(404, {"error": f"Unknown path {url.path}"})
+
+        key = unquote(url.path[len("/county/"):-len(".png")])
+        query = parse_qs(url.query)
+        scheme_name = query.get("scheme", ["black"])[0]
+        if scheme_name not in color_schemes:
+            return self._send_json(400, {"error": f"Unknown scheme {scheme_name!r}",
+                                         "schemes": list(color_schemes)})
+        try:
+            dpi = int(query.get("dpi", [county_settings['dpi']])[0])
+        except ValueError:
+            dpi = None
+        if dpi is None or not DPI_RANGE[0] <= dpi <= DPI_RANGE[1]:
+            return self._send_json(400, {"error": f"dpi must be an integer in {DPI_RANGE}"})
+
+        try:
+            png, hit = self.service.render(key, scheme_name, dpi)
+        except AmbiguousCounty as e:
+            return self._send_json(409, {"error": str(e.args[0]), "codes": e.codes})
+        except KeyError as e:
+            return self._send_json(404, {"error": str(e.args[0])})
+        except Exception as e:
+            return self._send_json(500, {"error": str(e)})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(png)))
+        self.send_header("Cache-Control", "max-age=3600")
+        self.send_header("X-Cache", "HIT" if hit else "MISS")
+        self.end_headers()
+        self.wfile.write(png)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def make_server(service, host="127.0.0.1", port=8000):
+    handler = type("BoundRenderHandler", (RenderHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve county map PNGs over HTTP")
+    parser.add_argument("--gpkg", default=GPKG_PATH, help="Boundary GeoPackage to serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Render processes (0 = one per CPU core)")
+    parser.add_argument("--cache-mb", type=int, default=DEFAULT_CACHE_BYTES >> 20,
+                        help="Size limit of the rendered-PNG cache")
+    parser.add_argument("--engine", choices=ENGINES, default='matplotlib',
+                        help="County render engine (raster = direct Pillow rasteriser)")
+    args = parser.parse_args()
+    workers = args.workers or os.cpu_count()
+
+    print(f"🗺️ Loading {args.gpkg} and starting {workers} render worker(s)...")
+    service = RenderService(args.gpkg, engine=args.engine, workers=workers,
+                            cache_bytes=args.cache_mb << 20)
+    server = make_server(service, args.host, args.port)
+    print(f"🌐 Serving {len(service.index)} counties on http://{args.host}:{args.port}/county/<code>.png")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Concurrent health probes for the boundary download mirrors.
+
+Instead of trying mirrors one after another (each with its own timeout),
+``resolve`` probes every candidate URL at once and downloads from the
+best healthy one:
+
+* a probe is a one-byte ``Range`` GET (some servers refuse ``HEAD``), timed
+  to the response headers; a 200/206 answer is healthy, and a known size
+  plus ``Range`` support (a resumable download) ranks it as complete,
+* probes run as asyncio tasks on a private thread pool (the shared
+  ``requests`` session does the I/O); once one is healthy, the others get
+  ``RANK_WINDOW`` seconds more, and every healthy answer so far is ranked
+  like the cached ones below.  Probes still running then are not waited
+  for; as blocking requests they end by their own timeout in the
+  background,
+* results are kept in ``SOURCE_HEALTH.json`` for ``HEALTH_TTL`` seconds:
+  mirrors recently seen healthy are used straight away, ranked complete
+  first and then by latency, and ones recently seen failing are only
+  probed when nothing else is left,
+* a mirror whose download then fails is marked unhealthy and the next one
+  is resolved the same way.
+
+URLs are taken as given, so everything works against a local HTTP server::
+
+    python source_probe.py http://127.0.0.1:8000/a.zip http://127.0.0.1:8001/a.zip
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from boundary_fetch import DOWNLOAD_DIR, FetchError, cached, fetch, get_session
+
+HEALTH_PATH = os.path.join(DOWNLOAD_DIR, "SOURCE_HEALTH.json")
+HEALTH_TTL = 15 * 60
+PROBE_TIMEOUT = 5
+# Seconds to keep collecting probes after the first healthy one, for ranking
+RANK_WINDOW = 0.25
+
+# ``size`` is None when the server doesn't say; ``error`` is None when healthy
+Probe = namedtuple('Probe', 'url ok latency size ranges error checked')
+
+
+def _probe_blocking(url, timeout, session):
+    start = time.perf_counter()
+    try:
+        with session.get(url, stream=True, timeout=timeout, headers={"Range": "bytes=0-0"}) as r:
+            latency = time.perf_counter() - start
+            if r.status_code not in (200, 206):
+                return Probe(url, False, latency, None, False, f"HTTP {r.status_code}", time.time())
+            ranges = r.status_code == 206
+            if ranges:
+                total = r.headers.get("Content-Range", "").rpartition("/")[2]
+                size = int(total) if total.isdigit() else None
+            else:
+                length = r.headers.get("Content-Length")
+                size = int(length) if length and length.isdigit() else None
+            return Probe(url, True, latency, size, ranges, None, time.time())
+    except Exception as e:
+        return Probe(url, False, time.perf_counter() - start, None, False, str(e) or repr(e), time.time())
+
+
+def rank(probes):
+    """Healthy probes, complete (size known and resumable) first, then fastest."""
+    return sorted((p for p in probes if p.ok),
+                  key=lambda p: (not (p.ranges and p.size), p.latency))
+
+
+async def _best_healthy(urls, timeout, session, window=RANK_WINDOW):
+    """Best-ranked healthy ``Probe`` (or ``None``), plus every probe that finished.
+
+    Probes answering within ``window`` seconds of the first healthy one are
+    ranked together; later ones are not waited for.
+    """
+    loop = asyncio.get_running_loop()
+    pool = ThreadPoolExecutor(max_workers=len(urls))
+    tasks = [loop.run_in_executor(pool, _probe_blocking, url, timeout, session) for url in urls]
+    try:
+        pending, deadline = set(tasks), None
+        while pending:
+            wait = None if deadline is None else max(0.0, deadline - loop.time())
+            finished, pending = await asyncio.wait(pending, timeout=wait,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+            if deadline is None and any(task.result().ok for task in finished):
+                deadline = loop.time() + window
+            if deadline is not None and loop.time() >= deadline:
+                break
+        done = [task.result() for task in tasks if task.done()]
+        healthy = rank(done)
+        return (healthy[0] if healthy else None), done
+    finally:
+        for task in tasks:
+            task.cancel()
+        # A blocking request can't be interrupted: probes still running end
+        # by their own timeout in the background, and nobody waits for them
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def _probe_all(urls, timeout, session):
+    loop = asyncio.get_running_loop()
+    pool = ThreadPoolExecutor(max_workers=len(urls))
+    try:
+        return list(await asyncio.gather(*(loop.run_in_executor(pool, _probe_blocking, url,
+                                                                timeout, session)
+                                           for url in urls)))
+    finally:
+        pool.shutdown(wait=False)
+
+
+def probe_all(urls, timeout=PROBE_TIMEOUT, session=None):
+    """Probe every URL concurrently; returns all ``Probe``s in ``urls`` order."""
+    return asyncio.run(_probe_all(list(urls), timeout, session or get_session()))
+
+
+class HealthCache:
+    """``Probe``s by URL in a JSON file, trusted for ``ttl`` seconds."""
+
+    def __init__(self, path=HEALTH_PATH, ttl=HEALTH_TTL):
+        self.path, self.ttl = path, ttl
+        try:
+            with open(path) as f:
+                self.entries = {url: Probe(**entry) for url, entry in json.load(f).items()}
+        except (OSError, ValueError, TypeError):
+            self.entries = {}
+
+    def fresh(self, url):
+        probe = self.entries.get(url)
+        if probe is not None and time.time() - probe.checked < self.ttl:
+            return probe
+        return None
+
+    def update(self, probes):
+        for probe in probes:
+            self.entries[probe.url] = probe
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "w") as f:
+            json.dump({url: probe._asdict() for url, probe in self.entries.items()}, f, indent=1)
+        os.replace(self.path + ".tmp", self.path)
+
+    def mark_failed(self, url, error):
+        self.update([Probe(url, False, 0.0, None, False, str(error), time.time())])
+
+
+def resolve(urls, timeout=30, probe_timeout=PROBE_TIMEOUT, session=None, health=None,
+            progress=False):
+    """Download from the best available mirror; returns ``(url, path)``.
+
+    A mirror already downloaded wins without any network access.  Raises
+    ``FetchError`` listing every mirror's failure if none works.
+    """
+    urls = list(urls)
+    for url in urls:
+        path = cached(url)
+        if path is not None:
+            return url, path
+
+    session = session or get_session()
+    health = health or HealthCache()
+    errors = {}
+    while True:
+        remaining = [url for url in urls if url not in errors]
+        if not remaining:
+            raise FetchError("All mirrors failed:\n" + "\n".join(f"{url}: {error}"
+                                                                  for url, error in errors.items()))
+
+        known = {url: health.fresh(url) for url in remaining}
+        healthy = rank(probe for probe in known.values() if probe is not None)
+        if healthy:
+            url = healthy[0].url
+        else:
+            # Probe the mirrors not recently seen failing, or all if that's every one
+            candidates = [url for url in remaining if known[url] is None] or remaining
+            probe, probes = asyncio.run(_best_healthy(candidates, probe_timeout, session))
+            health.update(probes)
+            if probe is None:
+                errors.update((p.url, p.error) for p in probes)
+                continue
+            url = probe.url
+
+        try:
+            return url, fetch(url, timeout=timeout, session=session, progress=progress)
+        except Exception as e:
+            health.mark_failed(url, e)
+            errors[url] = e
+
+
+def main():
+    urls = sys.argv[1:]
+    if not urls:
+        sys.exit("usage: python source_probe.py URL [URL ...]")
+    print(f"📡 Probing {len(urls)} source(s) concurrently...")
+    probes = probe_all(urls)
+    HealthCache().update(probes)
+    ranked = rank(probes)
+    for probe in ranked:
+        size = f"{probe.size / 1e6:.1f} MB" if probe.size else "size unknown"
+        print(f"  ✅ {probe.latency * 1000:6.0f} ms  {size}, "
+              f"{'resumable' if probe.ranges else 'no ranges'}  {probe.url}")
+    for probe in probes:
+        if not probe.ok:
+            print(f"  ❌ {probe.url}: {probe.error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Sprite-sheet export of a folder of county maps.
+
+Packs every county image of an output folder into one or more atlas pages
+so a client can fetch a single file and crop locally.  Placement uses the
+MaxRects algorithm with the best-short-side-fit rule (Jylänki, "A Thousand
+Ways to Pack the Bin"): the free space of a page is kept as maximal
+rectangles, each sprite goes where it leaves the smallest leftover strip,
+and the biggest sprites are placed first.
+
+The pages and ``ATLAS.json`` go in an ``atlas/`` folder next to
+``FILE_INDEX.txt``.  ``ATLAS.json`` maps each GSS code (or the file name
+without extension, for counties without a unique one) to its page and
+pixel rect, with a name -> key lookup beside it (the first county's key
+where names repeat)::
+
+    python sprite_atlas.py output_counties/all_dark_counties --scale 0.25
+
+``generate_all_counties_dark.py --atlas`` rebuilds it after a batch; an
+atlas whose source files are unchanged is left alone.
+"""
+import argparse
+import json
+import os
+import re
+
+from PIL import Image
+
+from image_output import DEFAULT_FORMAT, FORMATS, IMAGE_EXTENSIONS, OutputFormat
+from render_manifest import MANIFEST_NAME, settings_digest
+
+ATLAS_DIR = "atlas"
+ATLAS_NAME = "ATLAS.json"
+DEFAULT_PAGE_SIZE = 4096  # widely supported texture limit
+COUNTY_FILE = re.compile(r"^(\d{3})_.+")
+
+
+def _contains(outer, inner):
+    return (outer[0] <= inner[0] and outer[1] <= inner[1]
+            and inner[0] + inner[2] <= outer[0] + outer[2]
+            and inner[1] + inner[3] <= outer[1] + outer[3])
+
+
+class MaxRectsBin:
+    """One page; ``free`` holds the maximal free ``(x, y, w, h)`` rectangles."""
+
+    def __init__(self, width, height):
+        self.width, self.height = width, height
+        self.free = [(0, 0, width, height)]
+
+    def insert(self, w, h):
+        """Place a ``w`` x ``h`` rect; returns ``(x, y)`` or ``None`` if it doesn't fit."""
+        best = None
+        for fx, fy, fw, fh in self.free:
+            if w <= fw and h <= fh:
+                score = (min(fw - w, fh - h), max(fw - w, fh - h))
+                if best is None or score < best[0]:
+                    best = (score, (fx, fy))
+        if best is None:
+            return None
+        x, y = best[1]
+        self._split(x, y, w, h)
+        return x, y
+
+    def _split(self, x, y, w, h):
+        pieces = set()
+        for fx, fy, fw, fh in self.free:
+            if x >= fx + fw or x + w <= fx or y >= fy + fh or y + h <= fy:
+                pieces.add((fx, fy, fw, fh))
+                continue
+            # Up to four maximal rectangles around the placed one
+            if x > fx:
+                pieces.add((fx, fy, x - fx, fh))
+            if x + w < fx + fw:
+                pieces.add((x + w, fy, fx + fw - x - w, fh))
+            if y > fy:
+                pieces.add((fx, fy, fw, y - fy))
+            if y + h < fy + fh:
+                pieces.add((fx, y + h, fw, fy + fh - y - h))
+        self.free = [r for r in pieces
+                     if not any(other != r and _contains(other, r) for other in pieces)]
+
+
+def pack(sizes, page_size=DEFAULT_PAGE_SIZE, padding=2):
+    """Place ``(w, h)`` sizes on ``page_size`` pages.
+
+    Returns ``(placements, page_sizes)``: one ``(page, x, y)`` per size, and
+    each page trimmed to its used area.  A sprite larger than a page gets a
+    page of its own size.
+    """
+    order = sorted(range(len(sizes)), key=lambda i: (-max(sizes[i]), -sizes[i][0] * sizes[i][1]))
+    bins, placements = [], [None] * len(sizes)
+    for i in order:
+        w, h = sizes[i][0] + padding, sizes[i][1] + padding
+        for page, packer in enumerate(bins):
+            spot = packer.insert(w, h)
+            if spot is not None:
+                break
+        else:
+            page = len(bins)
+            bins.append(MaxRectsBin(max(page_size, w), max(page_size, h)))
+            spot = bins[page].insert(w, h)
+        placements[i] = (page,) + spot
+
+    page_sizes = [[0, 0] for _ in bins]
+    for (page, x, y), (w, h) in zip(placements, sizes):
+        page_sizes[page][0] = max(page_sizes[page][0], x + w)
+        page_sizes[page][1] = max(page_sizes[page][1], y + h)
+    return placements, [tuple(size) for size in page_sizes]
+
+
+def county_entries(output_dir, layer=None):
+    """``[(filename, code, name)]`` for the county images in ``output_dir``.
+
+    Codes and names come from the folder's manifest, else from ``layer``
+    (``{filename: (code, name)}`` of the current layer), else from the
+    filename.  Files are only matched by their full name, never by their
+    ``NNN_`` position, which may belong to another layer's county.
+    """
+    manifest = {}
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f).get("files", {})
+
+    entries = []
+    for filename in sorted(os.listdir(output_dir)):
+        match = COUNTY_FILE.match(filename)
+        if not (match and filename.endswith(IMAGE_EXTENSIONS)):
+            continue
+        idx = int(match.group(1)) - 1
+        if idx < 0:  # 000_ is the overview
+            continue
+        entry = manifest.get(filename)
+        if entry is not None:
+            code, name = entry.get('code'), entry.get('name')
+        else:
+            code, name = (layer or {}).get(filename, (None, None))
+        if not isinstance(code, str):  # layers without codes give NaN
+            code = None
+        entries.append((filename, code, name or os.path.splitext(filename)[0][4:]))
+    return entries
+
+
+def build_atlas(output_dir, entries, output_format=DEFAULT_FORMAT, scale=1.0,
+                page_size=DEFAULT_PAGE_SIZE, padding=2, force=False):
+    """Write the atlas pages and ``ATLAS.json`` for ``entries``; returns the manifest.
+
+    Returns ``None`` when the existing atlas already covers the same files.
+    """
+    atlas_dir = os.path.join(output_dir, ATLAS_DIR)
+    manifest_path = os.path.join(atlas_dir, ATLAS_NAME)
+    sources = [(filename, os.path.getmtime(os.path.join(output_dir, filename)))
+               for filename, _, _ in entries]
+    digest = settings_digest(sources, entries, output_format._asdict(), scale, page_size, padding)
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            if json.load(f).get("digest") == digest:
+                return None
+
+    sizes = []
+    for filename, _, _ in entries:
+        with Image.open(os.path.join(output_dir, filename)) as image:
+            sizes.append((max(1, round(image.width * scale)), max(1, round(image.height * scale))))
+    placements, page_sizes = pack(sizes, page_size, padding)
+
+    pages = [Image.new('RGB', size, 'white') for size in page_sizes]
+    sprites, by_name = {}, {}
+    for (filename, code, name), (w, h), (page, x, y) in zip(entries, sizes, placements):
+        with Image.open(os.path.join(output_dir, filename)) as image:
+            # The maps are opaque; dropping alpha first avoids premultiplied resampling
+            image = image.convert('RGB')
+        if image.size != (w, h):
+            # Box-reduce by whole factors first, then LANCZOS the remainder
+            image = image.resize((w, h), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        pages[page].paste(image, (x, y))
+        # Names repeat across counties without codes; file names never do
+        key = code if code and code not in sprites else os.path.splitext(filename)[0]
+        sprites[key] = {"name": name, "code": code, "file": filename,
+                        "page": page, "x": x, "y": y, "w": w, "h": h}
+        by_name.setdefault(name, key)
+
+    os.makedirs(atlas_dir, exist_ok=True)
+    page_files = [f"atlas_{page}{output_format.extension}" for page in range(len(pages))]
+    for page_file, image in zip(page_files, pages):
+        output_format.encode(image, os.path.join(atlas_dir, page_file), dpi=72)
+    for stale in os.listdir(atlas_dir):
+        if stale.startswith("atlas_") and stale not in page_files:
+            os.remove(os.path.join(atlas_dir, stale))
+
+    used = sum(w * h for w, h in sizes)
+    atlas = {
+        "digest": digest,
+        "scale": scale,
+        "pages": [{"file": page_file, "width": w, "height": h}
+                  for page_file, (w, h) in zip(page_files, page_sizes)],
+        "fill": round(used / sum(w * h for w, h in page_sizes), 4),
+        "sprites": sprites,
+        "names": by_name,
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(atlas, f, indent=1)
+    return atlas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack a folder of county maps into atlas pages")
+    parser.add_argument("output_dir", help="Folder with the NNN_*.png county maps")
+    parser.add_argument("--scale", type=float, default=1.0, help="Resize sprites by this factor")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE,
+                        help="Maximum atlas page width/height in pixels")
+    parser.add_argument("--padding", type=int, default=2, help="Gap between sprites in pixels")
+    parser.add_argument("--format", choices=list(FORMATS), default=DEFAULT_FORMAT.format,
+                        help="Image format of the atlas pages")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if up to date")
+    args = parser.parse_args()
+
+    entries = county_entries(args.output_dir)
+    atlas = build_atlas(args.output_dir, entries, OutputFormat(args.format), args.scale,
+                        args.page_size, args.padding, force=args.force)
+    if atlas is None:
+        print(f"🧩 Atlas in {args.output_dir}/{ATLAS_DIR}/ is up to date")
+    else:
+        print(f"🧩 Packed {len(entries)} maps into {len(atlas['pages'])} page(s) "
+              f"({atlas['fill']:.0%} filled): {args.output_dir}/{ATLAS_DIR}/{ATLAS_NAME}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TEST_LAYER = os.path.join(ROOT, "data", "UK_Test_Realistic.gpkg")
+
+
+@pytest.fixture(scope="session")
+def test_layer(tmp_path_factory):
+    """``(gdf, lod)`` of the five-county test layer, cached in a temporary folder."""
+    from geometry_cache import load_boundaries
+    from geometry_paths import LodPaths
+    from label_layout import ANCHOR_COLUMNS
+
+    cache_dir = str(tmp_path_factory.mktemp("cache"))
+    gdf = load_boundaries(TEST_LAYER, cache_dir=cache_dir, columns=['name'] + ANCHOR_COLUMNS)
+    return gdf, LodPaths(TEST_LAYER, gdf.geometry.values, cache_dir=cache_dir)
+
+
+def etag(body):
+    return f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    """GETs of ``server.files`` with ETags and ``Range``/``If-Range`` support.
+
+    ``server.ranges`` is ``"normal"``, ``"ignore"`` (always 200) or
+    ``"shift"`` (206 starting one byte early); ``server.status`` forces an
+    error status and ``server.delay`` slows every answer.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, dict(self.headers)))
+        time.sleep(server.delay)
+        body = server.files.get(self.path)
+        if server.status or body is None:
+            self.send_response(server.status or 404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        tag = etag(body)
+        requested = self.headers.get("Range")
+        if self.headers.get("If-Range", tag) != tag or server.ranges == "ignore":
+            requested = None
+        if requested is None:
+            self._send(200, body, tag)
+            return
+        start, _, end = requested.removeprefix("bytes=").partition("-")
+        start, end = int(start), int(end) if end else len(body) - 1
+        if start >= len(body):
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(body)}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if server.ranges == "shift":
+            start = max(0, start - 1)
+        end = min(end, len(body) - 1)
+        self._send(206, body[start:end + 1], tag, f"bytes {start}-{end}/{len(body)}")
+
+    def _send(self, status, body, tag, content_range=None):
+        self.send_response(status)
+        self.send_header("ETag", tag)
+        self.send_header("Accept-Ranges", "bytes")
+        if content_range:
+            self.send_header("Content-Range", content_range)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def http_server():
+    """Factory of localhost ``FileHandler`` servers (port 0), shut down after the test."""
+    servers = []
+
+    def start(files, ranges="normal", status=None, delay=0.0):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), FileHandler)
+        server.files, server.ranges, server.status, server.delay = files, ranges, status, delay
+        server.requests = []
+        server.url = f"http://127.0.0.1:{server.server_address[1]}"
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,28 @@
+import os
+
+from benchmark import StageTimer, run_pipeline, synthetic_boundaries
+from generate_all_counties_dark import DEFAULT_VARIANT, county_filename, variant_digests
+from geometry_cache import load_boundaries
+from image_output import DEFAULT_FORMAT
+from render_manifest import RenderManifest
+
+
+def test_index_write_records_production_digests(tmp_path):
+    """The manifest the benchmark writes is what a real run would find up to date."""
+    source = str(tmp_path / "synthetic.gpkg")
+    synthetic_boundaries(counties=6, vertices=40).to_file(source, driver="GPKG")
+    timer = StageTimer()
+    drawn = run_pipeline(source, str(tmp_path / "run"), timer, sample=2, overview=False)
+    assert drawn == 2 and timer.runs["index_write"]
+
+    gdf = load_boundaries(source, cache_dir=str(tmp_path / "run" / "cache"), columns=['name'])
+    names = gdf['name'].tolist()
+    digests = variant_digests(gdf.geometry, names, DEFAULT_VARIANT, 'matplotlib', DEFAULT_FORMAT)
+    output_dir = str(tmp_path / "run" / "output")
+    manifest = RenderManifest(output_dir)
+    drawn_files = {f for f in os.listdir(output_dir) if f.endswith(".png")}
+    assert len(drawn_files) == 2
+    for idx, name in enumerate(names):
+        filename = county_filename(idx, name)
+        assert manifest.entries[filename]["digest"] == digests[idx]
+        assert manifest.is_fresh(filename, digests[idx]) == (filename in drawn_files)
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+
+import pytest
+import requests
+
+import boundary_fetch
+from boundary_fetch import FetchError, cached, fetch
+from conftest import etag
+
+DATA = bytes(range(256)) * 1000
+SHA = hashlib.sha256(DATA).hexdigest()
+
+
+@pytest.fixture
+def session():
+    with requests.Session() as s:
+        yield s
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    """Counts full-file SHA-256 computations."""
+    calls = []
+    original = boundary_fetch.file_sha256
+    monkeypatch.setattr(boundary_fetch, "file_sha256",
+                        lambda path: calls.append(path) or original(path))
+    return calls
+
+
+def _partial(dest, url, data, tag=None):
+    with open(dest + ".part", "wb") as f:
+        f.write(data)
+    with open(dest + ".part.json", "w") as f:
+        json.dump({"url": url, "etag": tag}, f)
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_download_and_cache_hit(http_server, session, tmp_path, hashes):
+    server = http_server({"/layer.zip": DATA})
+    url, dest = server.url + "/layer.zip", str(tmp_path / "layer.zip")
+
+    assert fetch(url, dest, sha256=SHA, session=session, progress=False) == dest
+    assert _read(dest) == DATA
+    with open(dest + ".meta.json") as f:
+        meta = json.load(f)
+    assert meta["sha256"] == SHA and meta["size"] == len(DATA) and meta["etag"] == etag(DATA)
+    assert not os.path.exists(dest + ".part")
+
+    # Matching size/mtime stamp: no request and no re-hash
+    assert fetch(url, dest, sha256=SHA, session=session, progress=False) == dest
+    assert len(server.requests) == 1
+    assert hashes == []
+
+
+def test_stamp_change_rehashes_once(http_server, session, tmp_path, hashes):
+    server = http_server({"/layer.zip": DATA})
+    url, dest = server.url + "/layer.zip", str(tmp_path / "layer.zip")
+    fetch(url, dest, session=session, progress=False)
+
+    os.utime(dest, (1, 1))  # same contents, new mtime
+    assert cached(url, dest) == dest
+    assert cached(url, dest) == dest
+    assert len(hashes) == 1  # the second call trusts the refreshed stamp
+
+    with open(dest, "r+b") as f:  # same size, different contents
+        f.write(b"\xff")
+    assert cached(url, dest) is None
+    assert fetch(url, dest, session=session, progress=False) == dest
+    assert _read(dest) == DATA
+    assert len(server.requests) == 2
+
+
+def test_resume_sends_range(http_server, session, tmp_path):
+    server = http_server({"/layer.zip": DATA})
+    url, dest = server.url + "/layer.zip", str(tmp_path / "layer.zip")
+    _partial(dest, url, DATA[:1000], etag(DATA))
+
+    fetch(url, dest, sha256=SHA, session=session, progress=False)
+
+    assert _read(dest) == DATA
+    headers = server.requests[0][1]
+    assert headers["Range"] == "bytes=1000-" and headers["If-Range"] == etag(DATA)
+
+
+def test_resume_of_changed_file_restarts(http_server, session, tmp_path):
+    server = http_server({"/layer.zip": DATA})
+    url, dest = server.url + "/layer.zip", str(tmp_path / "layer.zip")
+    _partial(dest, url, b"old contents", '"stale"')
+
+    fetch(url, dest, sha256=SHA, session=session, progress=False)
+
+    assert _read(dest) == DATA
+
+
+@pytest.mark.parametrize("ranges", ["ignore", "shift"])
+def test_resume_from_server_not_honouring_range(http_server, session, tmp_path, ranges):
+    server = http_server({"/layer.zip": DATA}, ranges=ranges)
+    url, dest = server.url + "/layer.zip", str(tmp_path / "layer.zip")
+    _partial(dest, url, DATA[:1000], etag(DATA))
+
+    fetch(url, dest, session=session, progress=False)  # no pinned digest to catch it
+
+    assert _read(dest) == DATA
+
+
+def test_complete_part_is_finished(http_server, session, tmp_path):
+    server = http_server({"/layer.zip": DATA})
+    url, dest = server.url + "/layer.zip", str(tmp_path / "layer.zip")
+    _partial(dest, url, DATA, etag(DATA))
+
+    fetch(url, dest, sha256=SHA, session=session, progress=False)
+
+    assert _read(dest) == DATA
+    assert len(server.requests) == 1  # the 416 answer, no second download
+
+
+def test_oversized_part_restarts(http_server, session, tmp_path):
+    server = http_server({"/layer.zip": DATA})
+    url, dest = server.url + "/layer.zip", str(tmp_path / "layer.zip")
+    _partial(dest, url, DATA + b"junk", etag(DATA))
+
+    fetch(url, dest, sha256=SHA, session=session, progress=False)
+
+    assert _read(dest) == DATA
+
+
+def test_sha256_mismatch(http_server, session, tmp_path):
+    server = http_server({"/layer.zip": DATA})
+    url, dest = server.url + "/layer.zip", str(tmp_path / "layer.zip")
+
+    with pytest.raises(FetchError, match="SHA-256 mismatch"):
+        fetch(url, dest, sha256="0" * 64, session=session, progress=False)
+    assert not any(os.path.exists(dest + suffix) for suffix in ("", ".part", ".meta.json"))
+
+
+def test_http_error(http_server, session, tmp_path):
+    server = http_server({}, status=503)
+    with pytest.raises(FetchError, match="HTTP 503"):
+        fetch(server.url + "/layer.zip", str(tmp_path / "layer.zip"), session=session,
+              progress=False)
@@ -0,0 +1,26 @@
+import pytest
+from PIL import Image
+
+from generate_all_counties_dark import Variant, draw_county, make_renderer
+from raster_engine import image_diff
+
+# Share of pixels allowed to differ: antialiasing and glyph rendering
+# differ along the edges and the title, nothing else should
+MAX_DIFF = 0.02
+
+
+@pytest.mark.parametrize("dpi", [300, 150, 72])
+@pytest.mark.parametrize("county", ["Yorkshire", "Cornwall", "Kent"])
+def test_raster_matches_matplotlib(test_layer, tmp_path, county, dpi):
+    gdf, lod = test_layer
+    idx = list(gdf['name']).index(county)
+    variant = Variant('black', dpi, (10, 8))
+    targets = {}
+    for engine in ('matplotlib', 'raster'):
+        targets[engine] = tmp_path / f"{engine}.png"
+        draw_county(make_renderer(engine), idx, lod, county, [(variant, targets[engine])],
+                    crs=gdf.crs)
+
+    with Image.open(targets['matplotlib']) as a, Image.open(targets['raster']) as b:
+        assert a.size == b.size
+    assert image_diff(targets['matplotlib'], targets['raster']) < MAX_DIFF
@@ -0,0 +1,75 @@
+import io
+
+import pytest
+from PIL import Image
+
+from frame_layout import SUBPLOT_FRACTION
+from generate_all_counties_dark import Variant, county_settings, draw_county
+from label_layout import anchors_of
+from render_engine import MapRenderer
+
+
+def _image_size(target):
+    target.seek(0)
+    with Image.open(target) as image:
+        return image.size
+
+
+def _fitted_and_tight(renderer, lod, idx, name, dpi, figsize, crs):
+    fitted = io.BytesIO()
+    draw_county(renderer, idx, lod, name, [(Variant('black', dpi, figsize), fitted)], crs=crs)
+    tight = io.BytesIO()
+    renderer.save(tight, dpi=dpi, bbox_inches='tight', **county_settings['savefig'])
+    return _image_size(fitted), _image_size(tight)
+
+
+@pytest.mark.parametrize("figsize", [(10, 8), (4, 3)])
+@pytest.mark.parametrize("dpi", [300, 150, 72])
+def test_fitted_size_matches_tight_bbox(test_layer, dpi, figsize):
+    gdf, lod = test_layer
+    renderer = MapRenderer(figsize=figsize)
+    for idx, name in enumerate(gdf['name']):
+        fitted, tight = _fitted_and_tight(renderer, lod, idx, name, dpi, figsize, gdf.crs)
+        assert fitted == tight, name
+
+
+def test_height_limited_frames_share_the_tight_height(test_layer):
+    """At the default settings every height-limited county is as tall as its tight render.
+
+    That height depends only on the figure size, DPI and title, so it is
+    the same for all of them.
+    """
+    gdf, lod = test_layer
+    figsize, dpi = county_settings['figsize'], county_settings['dpi']
+    box_aspect = figsize[0] * SUBPLOT_FRACTION[0] / (figsize[1] * SUBPLOT_FRACTION[1])
+    renderer = MapRenderer(figsize=figsize)
+    heights = set()
+    for idx, name in enumerate(gdf['name']):
+        minx, miny, maxx, maxy = lod.bounds[idx]
+        if (maxx - minx) / (maxy - miny) > box_aspect:
+            continue  # width-limited: the height depends on the county's shape
+        fitted, tight = _fitted_and_tight(renderer, lod, idx, name, dpi, figsize, gdf.crs)
+        assert fitted[1] == tight[1], name
+        heights.add(fitted[1])
+    assert len(heights) == 1
+
+
+@pytest.mark.parametrize("fontsize", [12, 60])
+def test_fitted_crop_includes_labels_like_tight_bbox(test_layer, fontsize):
+    gdf, lod = test_layer
+    paths = lod.level(0)
+    renderer = MapRenderer(figsize=(15, 12))
+    renderer.add_paths(paths.paths(), paths.total_bounds(), color='gold', edgecolor='black')
+    renderer.frame(crs=gdf.crs)
+    renderer.set_title("All Test UK Counties", fontsize=20, pad=30, weight='bold')
+    unlabelled = io.BytesIO()
+    renderer.save_fitted(unlabelled, dpi=72, pad_inches=0.3)
+    assert renderer.add_labels(gdf['name'], anchors_of(gdf), fontsize=fontsize, weight='bold',
+                               bbox=dict(boxstyle="round,pad=0.3", facecolor='white'))
+
+    fitted, tight = io.BytesIO(), io.BytesIO()
+    renderer.save_fitted(fitted, dpi=72, pad_inches=0.3, facecolor='white')
+    renderer.save(tight, dpi=72, bbox_inches='tight', pad_inches=0.3, facecolor='white')
+    assert _image_size(fitted) == _image_size(tight)
+    if fontsize == 60:  # labels this big reach past the axes
+        assert _image_size(fitted)[0] > _image_size(unlabelled)[0]
@@ -0,0 +1,133 @@
+import io
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import geopandas as gpd
+import pytest
+from PIL import Image
+
+from conftest import TEST_LAYER
+from generate_all_counties_dark import Variant, county_settings, draw_county, make_renderer
+from geometry_cache import load_boundaries
+from geometry_paths import LodPaths
+from render_service import ByteLRUCache, RenderService, make_server
+
+CODES = ["E06000001", "E06000002", "E06000003", "E06000004", "E06000005"]
+DPI = 40
+
+
+@pytest.fixture(scope="module")
+def served(tmp_path_factory):
+    """Service on port 0 over the test layer with codes; Devon renamed to a second "Kent"."""
+    folder = tmp_path_factory.mktemp("service")
+    layer = gpd.read_file(TEST_LAYER)
+    names = ["Kent" if name == "Devon" else name for name in layer['name']]
+    gpd.GeoDataFrame({'CTYUA23CD': CODES, 'CTYUA23NM': names}, geometry=layer.geometry,
+                     crs=layer.crs).to_file(folder / "served.gpkg", driver="GPKG")
+
+    cwd = os.getcwd()
+    os.chdir(folder)  # the geometry cache goes to data/cache under the working directory
+    service = RenderService("served.gpkg", workers=2, cache_bytes=1 << 20)
+    server = make_server(service, port=0)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    try:
+        yield service, f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+        os.chdir(cwd)
+
+
+def _get(url):
+    try:
+        with urllib.request.urlopen(url) as r:
+            return r.status, dict(r.headers), r.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read()
+
+
+def _expected_png(code, scheme, dpi):
+    gdf = load_boundaries("served.gpkg", columns=['code', 'name'])
+    idx = list(gdf['code']).index(code)
+    buffer = io.BytesIO()
+    draw_county(make_renderer(), idx, LodPaths("served.gpkg", gdf.geometry.values),
+                gdf['name'][idx], [(Variant(scheme, dpi, county_settings['figsize']), buffer)],
+                crs=gdf.crs)
+    return buffer.getvalue()
+
+
+def test_png_by_code_and_name(served):
+    service, base = served
+    status, headers, body = _get(f"{base}/county/{CODES[0]}.png?scheme=navy&dpi={DPI}")
+    assert status == 200 and headers["Content-Type"] == "image/png"
+    assert headers["X-Cache"] == "MISS"
+    assert body == _expected_png(CODES[0], "navy", DPI)
+    assert Image.open(io.BytesIO(body)).format == "PNG"
+
+    # Same image by (URL-encoded, differently cased) name comes from the cache
+    status, headers, again = _get(f"{base}/county/%20yorkshire.png?scheme=navy&dpi={DPI}")
+    assert status == 200 and headers["X-Cache"] == "HIT" and again == body
+
+
+def test_concurrent_requests_share_one_render(served, monkeypatch):
+    service, base = served
+    submitted = []
+    submit = service.pool.submit
+    monkeypatch.setattr(service.pool, "submit",
+                        lambda *args: submitted.append(args) or submit(*args))
+    url = f"{base}/county/{CODES[1]}.png?dpi={DPI + 1}"
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(_get, [url] * 8))
+
+    assert len(submitted) == 1
+    assert {status for status, _, _ in results} == {200}
+    assert len({body for _, _, body in results}) == 1
+
+
+def test_errors(served):
+    service, base = served
+    status, _, body = _get(f"{base}/county/Kent.png?dpi={DPI}")
+    assert status == 409
+    assert sorted(json.loads(body)["codes"]) == [CODES[3], CODES[4]]
+
+    assert _get(f"{base}/county/Atlantis.png")[0] == 404
+    assert _get(f"{base}/nothing")[0] == 404
+    assert _get(f"{base}/county/{CODES[0]}.png?scheme=plaid")[0] == 400
+    assert _get(f"{base}/county/{CODES[0]}.png?dpi=5000")[0] == 400
+    assert _get(f"{base}/county/{CODES[0]}.png?dpi=high")[0] == 400
+
+    status, _, body = _get(f"{base}/counties")
+    assert status == 200 and [c["code"] for c in json.loads(body)] == CODES
+
+
+def test_service_cache_evicts_by_size(served):
+    service, base = served
+    service.cache.max_bytes = 0  # measure one image without caching it
+    status, _, png = _get(f"{base}/county/{CODES[2]}.png?dpi={DPI + 2}")
+    service.cache.max_bytes = len(png) + 10
+    for code in CODES[2], CODES[3]:
+        assert _get(f"{base}/county/{code}.png?dpi={DPI + 2}")[1]["X-Cache"] == "MISS"
+    stats = json.loads(_get(f"{base}/stats")[2])
+    assert stats["entries"] == 1 and stats["bytes"] <= stats["max_bytes"]
+    assert _get(f"{base}/county/{CODES[3]}.png?dpi={DPI + 2}")[1]["X-Cache"] == "HIT"
+    assert _get(f"{base}/county/{CODES[2]}.png?dpi={DPI + 2}")[1]["X-Cache"] == "MISS"
+
+
+def test_byte_lru_cache():
+    cache = ByteLRUCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    assert cache.get("a") == b"1234"  # "a" is now the most recent
+    cache.put("c", b"1234")
+    assert cache.get("b") is None  # least recently used went first
+    assert cache.get("a") == b"1234" and cache.get("c") == b"1234"
+    cache.put("a", b"12")  # replacing a value adjusts the size
+    assert cache.size == 6
+    cache.put("huge", b"x" * 11)  # never fits, never stored
+    assert cache.get("huge") is None
+    assert cache.stats() == {"entries": 2, "bytes": 6, "max_bytes": 10, "hits": 3, "misses": 2}
@@ -0,0 +1,110 @@
+import json
+import time
+
+import pytest
+import requests
+
+import source_probe
+from boundary_fetch import FetchError
+from source_probe import HealthCache, Probe, rank, resolve
+
+DATA = b"boundary layer" * 1000
+
+
+@pytest.fixture
+def session():
+    with requests.Session() as s:
+        yield s
+
+
+@pytest.fixture
+def health(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # downloads go to data/downloads under the working directory
+    return HealthCache(str(tmp_path / "SOURCE_HEALTH.json"))
+
+
+def _probe(url, ok=True, latency=0.1, size=100, ranges=True, checked=None):
+    return Probe(url, ok, latency, size, ranges, None if ok else "down",
+                 time.time() if checked is None else checked)
+
+
+def _probed(server):
+    return [headers for _, headers in server.requests if headers.get("Range") == "bytes=0-0"]
+
+
+def test_rank():
+    probes = [_probe("fast-no-ranges", latency=0.01, ranges=False),
+              _probe("slow-complete", latency=0.3),
+              _probe("down", ok=False, latency=0.0),
+              _probe("fast-complete", latency=0.1),
+              _probe("unknown-size", latency=0.02, size=None)]
+    assert [p.url for p in rank(probes)] == ["fast-complete", "slow-complete",
+                                             "fast-no-ranges", "unknown-size"]
+
+
+def test_health_ttl(tmp_path):
+    path = str(tmp_path / "health.json")
+    HealthCache(path).update([_probe("old", checked=time.time() - 120), _probe("new")])
+    cache = HealthCache(path, ttl=60)
+    assert cache.fresh("old") is None
+    assert cache.fresh("new").url == "new"
+    assert cache.fresh("unknown") is None
+
+
+def test_fresh_probes_are_ranked(http_server, session, health):
+    # The first answer is a server without Range support; a complete mirror
+    # answering shortly after wins, a failing one is recorded
+    partial = http_server({"/layer.zip": DATA}, ranges="ignore")
+    complete = http_server({"/layer.zip": DATA}, delay=0.05)
+    failing = http_server({}, status=503)
+    urls = [s.url + "/layer.zip" for s in (partial, complete, failing)]
+
+    url, path = resolve(urls, session=session, health=health)
+
+    assert url == urls[1]
+    with open(path, "rb") as f:
+        assert f.read() == DATA
+    with open(health.path) as f:
+        saved = json.load(f)
+    assert saved[urls[0]]["ok"] and not saved[urls[0]]["ranges"]
+    assert saved[urls[1]]["ok"] and saved[urls[1]]["size"] == len(DATA)
+    assert not saved[urls[2]]["ok"] and saved[urls[2]]["error"] == "HTTP 503"
+
+
+def test_cached_health_skips_probing(http_server, session, health):
+    slow, fast = http_server({"/layer.zip": DATA}), http_server({"/layer.zip": DATA})
+    urls = [slow.url + "/layer.zip", fast.url + "/layer.zip"]
+    health.update([_probe(urls[0], latency=0.5), _probe(urls[1], latency=0.01)])
+
+    assert resolve(urls, session=session, health=health)[0] == urls[1]
+    assert _probed(slow) == [] and _probed(fast) == []
+    assert len(fast.requests) == 1  # just the download
+
+
+def test_expired_health_is_probed_again(http_server, session, health):
+    server = http_server({"/layer.zip": DATA})
+    url = server.url + "/layer.zip"
+    health.update([_probe(url, checked=time.time() - source_probe.HEALTH_TTL - 1)])
+
+    resolve([url], session=session, health=health)
+
+    assert len(_probed(server)) == 1
+
+
+def test_falls_back_after_failed_download(http_server, session, health):
+    broken = http_server({"/layer.zip": DATA}, status=500)
+    good = http_server({"/layer.zip": DATA})
+    urls = [broken.url + "/layer.zip", good.url + "/layer.zip"]
+    # Seen healthy a moment ago, so it is tried first without a probe
+    health.update([_probe(urls[0], latency=0.001)])
+
+    assert resolve(urls, session=session, health=health)[0] == urls[1]
+    assert not health.fresh(urls[0]).ok
+    assert health.fresh(urls[1]).ok
+
+
+def test_all_mirrors_fail(http_server, session, health):
+    servers = [http_server({}, status=503), http_server({}, status=404)]
+    with pytest.raises(FetchError, match="All mirrors failed") as error:
+        resolve([s.url + "/layer.zip" for s in servers], session=session, health=health)
+    assert "HTTP 503" in str(error.value) and "HTTP 404" in str(error.value)
@@ -0,0 +1,39 @@
+import json
+
+from PIL import Image
+
+from render_manifest import MANIFEST_NAME
+from sprite_atlas import ATLAS_DIR, ATLAS_NAME, build_atlas, county_entries
+
+
+def _write_maps(folder, filenames):
+    for i, filename in enumerate(filenames):
+        Image.new('RGB', (20 + i, 10), 'black').save(folder / filename)
+
+
+def test_more_images_than_layer_rows(tmp_path):
+    # Left over from a bigger layer: six maps, the current layer has two rows
+    _write_maps(tmp_path, ["000_overview.png", "001_Kent.png", "002_Devon.png",
+                           "003_Fife.png", "004_Moray.png", "005_Powys.png", "006_Bury.png"])
+    with open(tmp_path / MANIFEST_NAME, 'w') as f:
+        json.dump({"files": {"003_Fife.png": {"digest": "x", "code": "S12000047",
+                                              "name": "Fife"}}}, f)
+    # 002 is another county at the same position, so it must not get Cornwall's details
+    layer = {"001_Kent.png": ("E10000016", "Kent"), "002_Cornwall.png": ("E06000052", "Cornwall")}
+
+    entries = county_entries(str(tmp_path), layer)
+
+    assert entries == [
+        ("001_Kent.png", "E10000016", "Kent"),
+        ("002_Devon.png", None, "Devon"),
+        ("003_Fife.png", "S12000047", "Fife"),
+        ("004_Moray.png", None, "Moray"),
+        ("005_Powys.png", None, "Powys"),
+        ("006_Bury.png", None, "Bury"),
+    ]
+    atlas = build_atlas(str(tmp_path), entries)
+    assert set(atlas["sprites"]) == {"E10000016", "002_Devon", "S12000047",
+                                     "004_Moray", "005_Powys", "006_Bury"}
+    assert atlas["names"]["Devon"] == "002_Devon"
+    assert (tmp_path / ATLAS_DIR / ATLAS_NAME).exists()
+    assert build_atlas(str(tmp_path), entries) is None  # unchanged sources
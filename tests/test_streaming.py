@@ -0,0 +1,72 @@
+import csv
+import glob
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from benchmark import synthetic_boundaries
+from conftest import ROOT
+from render_metrics import CSV_NAME
+
+COUNTIES, CHUNK = 200, 20
+
+# Growth allowed over the interpreter with the pipeline imported: one
+# chunk of counties plus a 72 DPI overview canvas.  Holding the whole
+# synthetic layer (--stream 200) already peaks ~150 MB above it.
+ALLOWANCE_MB = 100
+
+
+def _rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def _run_sampled(args, cwd):
+    """Run a child Python and sample its RSS from outside; returns ``(stdout, peak MB)``.
+
+    The child's own metrics reset the kernel high-water mark per stage, so
+    only an outside view covers whatever runs between stages.
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    with open(cwd / "stdout.txt", "w+") as out:
+        child = subprocess.Popen([sys.executable, *args], cwd=cwd, env=env, stdout=out,
+                                 stderr=subprocess.PIPE, text=True)
+        peak = 0.0
+        while child.poll() is None:
+            peak = max(peak, _rss_mb(child.pid))
+            time.sleep(0.005)
+        stderr = child.stderr.read()
+        assert child.returncode == 0, stderr
+        out.seek(0)
+        return out.read(), peak
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="samples RSS from /proc")
+def test_stream_peak_rss_is_bounded(tmp_path):
+    synthetic_boundaries(COUNTIES, vertices=2000).to_file(tmp_path / "synthetic.gpkg", driver="GPKG")
+    _, baseline = _run_sampled(["-c", "import generate_all_counties_dark"], tmp_path)
+    ceiling = baseline + ALLOWANCE_MB
+
+    _, sampled = _run_sampled([os.path.join(ROOT, "generate_all_counties_dark.py"),
+                               "--gpkg", "synthetic.gpkg", "--stream", str(CHUNK), "--dpi", "72"],
+                              tmp_path)
+
+    [metrics_csv] = glob.glob(str(tmp_path / "output_counties" / "*" / CSV_NAME))
+    with open(metrics_csv, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert len({row['idx'] for row in rows if row['stage'] == 'total' and row['idx']}) == COUNTIES
+    reads = [float(row['peak_rss_mb']) for row in rows if row['stage'] == 'read']
+    assert len(reads) == -(-COUNTIES // CHUNK) + 1  # every chunk, plus the final empty read
+    peak = max(float(row['peak_rss_mb']) for row in rows)
+    assert max(reads) < ceiling, f"chunk reads peak {max(reads):.0f} MB, imports {baseline:.0f} MB"
+    assert peak < ceiling, f"metrics peak {peak:.0f} MB, imports alone {baseline:.0f} MB"
+    assert sampled < ceiling, f"sampled peak {sampled:.0f} MB, imports alone {baseline:.0f} MB"
@@ -0,0 +1,88 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+from conftest import TEST_LAYER
+from tile_pyramid import TILE_INDEX, TileLayer, build_pyramid, tile_range
+
+SCHEME = {'fill': 'black', 'edge': 'white'}
+ZOOMS = (6, 7)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # The layer cache goes under the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def _directory_tiles(root):
+    """``{(z, x, y): png bytes}`` of a directory pyramid."""
+    tiles = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith(".png"):
+                z, x = os.path.relpath(dirpath, root).split(os.sep)
+                with open(os.path.join(dirpath, filename), 'rb') as f:
+                    tiles[int(z), int(x), int(filename[:-4])] = f.read()
+    return tiles
+
+
+def test_directory_pyramid_layout_and_empty_tiles(workdir):
+    root = str(workdir / "tiles")
+    written = build_pyramid(TEST_LAYER, root, SCHEME, zooms=ZOOMS)
+    tiles = _directory_tiles(root)
+    assert len(tiles) == written
+
+    layer = TileLayer(TEST_LAYER)
+    for z in range(ZOOMS[0], ZOOMS[1] + 1):
+        xs, ys = tile_range(layer.bounds, z)
+        in_range = {(z, x, y) for x in xs for y in ys}
+        at_zoom = {tile for tile in tiles if tile[0] == z}
+        assert at_zoom and at_zoom <= set(layer.occupied_tiles(z))
+        assert len(at_zoom) < len(in_range)  # sea-only tiles are skipped
+    assert all(data.startswith(b"\x89PNG") for data in tiles.values())
+
+    with open(os.path.join(root, "metadata.json")) as f:
+        metadata = json.load(f)
+    assert (metadata["minzoom"], metadata["maxzoom"]) == ZOOMS
+    with open(os.path.join(root, TILE_INDEX)) as f:
+        assert {line.strip() for line in f} == {f"{z}/{x}/{y}" for z, x, y in tiles}
+
+
+def test_directory_rebuild_removes_stale_tiles(workdir):
+    root = workdir / "tiles"
+    build_pyramid(TEST_LAYER, str(root), SCHEME, zooms=ZOOMS)
+    (root / "README").write_text("not a tile")
+
+    written = build_pyramid(TEST_LAYER, str(root), SCHEME, zooms=(ZOOMS[0], ZOOMS[0]))
+    tiles = _directory_tiles(str(root))
+    assert len(tiles) == written and {z for z, _, _ in tiles} == {ZOOMS[0]}
+    assert not (root / str(ZOOMS[1])).exists()
+    assert (root / "README").exists()
+    with open(root / TILE_INDEX) as f:
+        assert len(f.read().split()) == written
+
+
+def test_mbtiles_schema_and_tms_rows(workdir):
+    root = str(workdir / "tiles")
+    build_pyramid(TEST_LAYER, root, SCHEME, zooms=ZOOMS)
+    expected = _directory_tiles(root)
+
+    path = str(workdir / "tiles.mbtiles")
+    assert build_pyramid(TEST_LAYER, path, SCHEME, zooms=ZOOMS) == len(expected)
+    db = sqlite3.connect(path)
+    try:
+        columns = {table: [row[1] for row in db.execute(f"PRAGMA table_info({table})")]
+                   for table in ("metadata", "tiles")}
+        assert columns == {"metadata": ["name", "value"],
+                           "tiles": ["zoom_level", "tile_column", "tile_row", "tile_data"]}
+        metadata = dict(db.execute("SELECT name, value FROM metadata"))
+        assert (metadata["format"], metadata["minzoom"], metadata["maxzoom"]) == ("png", "6", "7")
+        rows = {(z, x, row): bytes(data) for z, x, row, data in db.execute("SELECT * FROM tiles")}
+    finally:
+        db.close()
+    # MBTiles counts rows from the south: TMS row = 2^z - 1 - XYZ y
+    assert rows == {(z, x, (1 << z) - 1 - y): data for (z, x, y), data in expected.items()}
@@ -0,0 +1,30 @@
+import shapely
+
+from topology import Topology
+
+
+def _squares():
+    # Two unit squares sharing the edge x = 1, and a separate island
+    return [shapely.box(0, 0, 1, 1), shapely.box(1, 0, 2, 1), shapely.box(5, 5, 6, 6)]
+
+
+def test_shared_border_is_one_arc():
+    topology = Topology.from_geometries(_squares())
+    left, right = topology.geometry_rings(0)[0][0], topology.geometry_rings(1)[0][0]
+    shared = {ref if ref >= 0 else ~ref for ref in left} & {ref if ref >= 0 else ~ref for ref in right}
+    assert len(shared) == 1
+    # Both sides walk the shared arc, in opposite directions
+    (arc,) = shared
+    assert (arc in left) != (arc in right) and (~arc in left) != (~arc in right)
+
+
+def test_topojson_keeps_empty_geometries_in_place():
+    geometries = [shapely.Polygon(), *_squares(), shapely.Polygon(), None]
+    properties = [{"row": row} for row in range(len(geometries))]
+    topology = Topology.from_geometries(geometries)
+    assert topology.geometry_count == len(geometries)
+
+    objects = topology.to_topojson(properties, to_crs=None)["objects"]["counties"]["geometries"]
+    assert [obj["properties"]["row"] for obj in objects] == list(range(len(geometries)))
+    assert [obj["type"] for obj in objects] == [None, "Polygon", "Polygon", "Polygon", None, None]
+    assert "arcs" not in objects[0] and "arcs" not in objects[-1]
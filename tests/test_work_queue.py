@@ -0,0 +1,55 @@
+import generate_all_counties_dark as generate
+from image_output import DEFAULT_FORMAT
+from work_queue import WorkQueue
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    path = str(tmp_path / "queue.db")
+    with WorkQueue(path) as a, WorkQueue(path) as b:
+        a.submit({}, [{"n": 1}])
+        task_id, payload = a.claim("a", lease_s=-1)  # already expired
+        assert payload == {"n": 1}
+
+        assert b.claim("b", lease_s=600) == (task_id, payload)
+        assert b.tasks("claimed") and a.claim("a") is None  # b's lease still holds
+        assert not a.complete(task_id, "a")
+        assert not a.fail(task_id, "a", "too late")
+        assert b.complete(task_id, "b")
+        assert b.counts()["done"] == 1
+
+
+def test_lease_expired_on_last_attempt_fails(tmp_path):
+    with WorkQueue(str(tmp_path / "queue.db")) as queue:
+        queue.submit({}, [{"n": 1}])
+        queue.claim("a", lease_s=-1, max_attempts=2)
+        queue.claim("b", lease_s=-1, max_attempts=2)
+        assert queue.claim("c", max_attempts=2) is None
+        [(_, _, status, error)] = queue.tasks()
+        assert (status, error) == ("failed", "lease expired")
+
+
+def test_worker_does_not_count_a_lost_lease(tmp_path, monkeypatch, capsys):
+    path = str(tmp_path / "queue.db")
+    run = {'gpkg': "unused.gpkg", 'engine': 'raster', 'output_format': DEFAULT_FORMAT._asdict(),
+           'write_threads': 0, 'overview_labels': False}
+    variant = list(generate.DEFAULT_VARIANT)
+    with WorkQueue(path) as queue:
+        queue.submit(run, [{'idx': idx, 'name': f"Area {idx}", 'code': None,
+                            'outputs': [[variant, f"{idx:03d}.png", "digest"]]} for idx in (0, 1)])
+
+    stolen = []
+
+    def render(idx, variants):
+        if not stolen:  # the first render outlives its lease and another worker takes over
+            with WorkQueue(path) as other:
+                stolen.append(other.claim("other", lease_s=600))
+        return idx, None, None
+
+    monkeypatch.setattr(generate, "_init_worker", lambda *args: None)
+    monkeypatch.setattr(generate, "_render_in_worker", render)
+    assert generate.run_queue_worker(path, "me", lease_s=-1) == (1, 0)
+    assert stolen[0][1]['idx'] == 0
+    assert "lost the lease on task" in capsys.readouterr().out
+    with WorkQueue(path) as queue:
+        assert [(task['idx'], status) for _, task, status, _ in queue.tasks()] == [
+            (0, 'claimed'), (1, 'done')]
@@ -0,0 +1,266 @@
+"""XYZ tile pyramid for the county layer.
+
+Renders the boundary layer as standard 256 px Web Mercator (EPSG:3857)
+``z/x/y`` tiles instead of one huge overview PNG:
+
+* every level of detail is reprojected to Web Mercator once per process and
+  indexed with a shapely ``STRtree``, so a tile only draws the counties that
+  intersect it,
+* the level of detail follows the zoom's ground resolution
+  (``tolerance_for_pixel``), and geometries are clipped to a slightly
+  padded tile box before scan conversion,
+* tiles with no intersecting county are skipped,
+* tiles are rasterised in batches across worker processes with the
+  Pillow scanline filler from ``raster_engine``,
+* output is either a ``{z}/{x}/{y}.png`` directory tree or a single
+  MBTiles (SQLite) file when the target ends in ``.mbtiles``; either way
+  a rebuild replaces the previous pyramid rather than adding to it.
+
+``generate_all_counties_dark.py --tiles PATH --zoom 0 10`` drives this.
+"""
+import io
+import json
+import math
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import shapely
+from PIL import Image
+from tqdm import tqdm
+
+from geometry_cache import load_boundaries, tolerance_for_pixel
+from geometry_paths import PathBuffer
+from raster_engine import scan_convert, to_rgb
+
+TILE_SIZE = 256
+TILE_CRS = "EPSG:3857"
+WEB_MERCATOR_HALF = 20037508.342789244  # metres from origin to edge of the world
+
+# Tiles handed to a worker process per task
+TILE_BATCH = 64
+# Tiles a directory pyramid holds, one ``z/x/y`` per line
+TILE_INDEX = "TILES.txt"
+
+
+def tile_bounds(z, x, y):
+    """``(minx, miny, maxx, maxy)`` of tile ``z/x/y`` in Web Mercator metres."""
+    span = 2 * WEB_MERCATOR_HALF / (1 << z)
+    minx = -WEB_MERCATOR_HALF + x * span
+    maxy = WEB_MERCATOR_HALF - y * span
+    return minx, maxy - span, minx + span, maxy
+
+
+def tile_range(bounds, z):
+    """Column and row ranges of the tiles at zoom ``z`` covering ``bounds``."""
+    n = 1 << z
+    span = 2 * WEB_MERCATOR_HALF / n
+    minx, miny, maxx, maxy = bounds
+    x0 = int(np.clip((minx + WEB_MERCATOR_HALF) // span, 0, n - 1))
+    x1 = int(np.clip((maxx + WEB_MERCATOR_HALF) // span, 0, n - 1))
+    y0 = int(np.clip((WEB_MERCATOR_HALF - maxy) // span, 0, n - 1))
+    y1 = int(np.clip((WEB_MERCATOR_HALF - miny) // span, 0, n - 1))
+    return range(x0, x1 + 1), range(y0, y1 + 1)
+
+
+class TileLayer:
+    """Web Mercator copies of a cached layer with one ``STRtree`` per level."""
+
+    def __init__(self, source):
+        self.source = source
+        self._levels = {}
+        base = load_boundaries(source, columns=[])
+        self.lon_lat_bounds = tuple(base.to_crs("EPSG:4326").total_bounds)
+        self.geometries, self.tree = self.level(0, base)
+        self.bounds = tuple(shapely.total_bounds(self.geometries))
+
+    def level(self, tolerance, gdf=None):
+        """``(geometries, STRtree)`` in Web Mercator for one level of detail."""
+        if tolerance not in self._levels:
+            if gdf is None:
+                gdf = load_boundaries(self.source, tolerance, columns=[])
+            geometries = gdf.to_crs(TILE_CRS).geometry.values
+            self._levels[tolerance] = (geometries, shapely.STRtree(geometries))
+        return self._levels[tolerance]
+
+    def tolerance(self, z):
+        # Mercator stretches ground distances by 1 / cos(latitude); use the
+        # northernmost latitude so the level errs on detail
+        mercator_pixel = 2 * WEB_MERCATOR_HALF / ((1 << z) * TILE_SIZE)
+        latitude = max(abs(self.lon_lat_bounds[1]), abs(self.lon_lat_bounds[3]))
+        ground_pixel = mercator_pixel * math.cos(math.radians(latitude))
+        return tolerance_for_pixel(ground_pixel)
+
+    def occupied_tiles(self, z):
+        """Tiles ``(z, x, y)`` at zoom ``z`` that intersect at least one county."""
+        xs, ys = tile_range(self.bounds, z)
+        tiles = [(z, x, y) for x in xs for y in ys]
+        boxes = shapely.box(*np.array([tile_bounds(*tile) for tile in tiles]).T)
+        hit = np.unique(self.tree.query(boxes, predicate='intersects')[0])
+        return [tiles[i] for i in hit]
+
+    def render_tile(self, z, x, y, scheme, linewidth=1.0, supersample=3):
+        """RGBA tile image, or ``None`` when no county touches it."""
+        minx, miny, maxx, maxy = tile_bounds(z, x, y)
+        geometries, tree = self.level(self.tolerance(z))
+        hits = tree.query(shapely.box(minx, miny, maxx, maxy), predicate='intersects')
+        if len(hits) == 0:
+            return None
+
+        # Clip well outside the tile so clip edges never get stroked inside it
+        scale = TILE_SIZE / (maxx - minx)
+        pad = (linewidth * 2 + 2) / scale
+        clipped = shapely.clip_by_rect(geometries[hits], minx - pad, miny - pad, maxx + pad, maxy + pad)
+        paths = PathBuffer.from_geometries(clipped)
+        fill_mask, edge_mask = scan_convert(paths.vertices, paths.codes, (TILE_SIZE, TILE_SIZE),
+                                            (-minx * scale, maxy * scale), scale,
+                                            linewidth, supersample, paths.offsets)
+
+        image = Image.new('RGBA', (TILE_SIZE, TILE_SIZE), (0, 0, 0, 0))
+        image.paste(to_rgb(scheme['fill']) + (255,), mask=fill_mask)
+        image.paste(to_rgb(scheme['edge']) + (255,), mask=edge_mask)
+        return image
+
+
+def encode_png(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+# Per-process layer for the parallel tile renderer
+_worker_layer = None
+
+
+def _init_worker(source):
+    global _worker_layer
+    _worker_layer = TileLayer(source)
+
+
+def _render_batch(tiles, scheme, linewidth):
+    results = []
+    for z, x, y in tiles:
+        image = _worker_layer.render_tile(z, x, y, scheme, linewidth)
+        if image is not None:
+            results.append((z, x, y, encode_png(image)))
+    return results
+
+
+class DirectoryTileWriter:
+    """Writes ``{root}/{z}/{x}/{y}.png``, replacing the tiles of the last build.
+
+    Every tile written is appended to ``TILE_INDEX`` first; ``close`` deletes
+    the indexed tiles this build didn't write (other zooms or extents, tiles
+    now empty, leftovers of an interrupted build) and rewrites the index.
+    Files the index never listed are left alone.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.index_path = os.path.join(root, TILE_INDEX)
+        self.written = set()
+        os.makedirs(root, exist_ok=True)
+        self.index = open(self.index_path, 'a')
+
+    def _path(self, z, x, y):
+        return os.path.join(self.root, str(z), str(x), f"{y}.png")
+
+    def write(self, z, x, y, data):
+        tile = f"{z}/{x}/{y}"
+        self.index.write(tile + "\n")
+        self.index.flush()
+        path = self._path(z, x, y)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.written.add(tile)
+
+    def close(self, metadata):
+        self.index.close()
+        with open(self.index_path) as f:
+            stale = {line.strip() for line in f if line.strip()} - self.written
+        for tile in stale:
+            path = self._path(*tile.split("/"))
+            if os.path.exists(path):
+                os.remove(path)
+            column = os.path.dirname(path)
+            for folder in (column, os.path.dirname(column)):  # drop emptied x and z folders
+                if os.path.isdir(folder) and not os.listdir(folder):
+                    os.rmdir(folder)
+        with open(self.index_path + ".tmp", 'w') as f:
+            f.writelines(tile + "\n" for tile in sorted(self.written))
+        os.replace(self.index_path + ".tmp", self.index_path)
+        with open(os.path.join(self.root, "metadata.json"), 'w') as f:
+            json.dump(metadata, f, indent=1)
+
+
+class MBTilesWriter:
+    """Writes tiles into one MBTiles 1.3 SQLite file (TMS row order)."""
+
+    def __init__(self, path):
+        if os.path.exists(path):
+            os.remove(path)
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE metadata (name TEXT, value TEXT);
+            CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER,
+                                tile_row INTEGER, tile_data BLOB);
+            CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row);
+        """)
+
+    def write(self, z, x, y, data):
+        self.db.execute("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)",
+                        (z, x, (1 << z) - 1 - y, sqlite3.Binary(data)))
+
+    def close(self, metadata):
+        self.db.executemany("INSERT INTO metadata VALUES (?, ?)",
+                            [(name, str(value)) for name, value in metadata.items()])
+        self.db.commit()
+        self.db.close()
+
+
+def build_pyramid(source, output, scheme, zooms=(0, 8), linewidth=1.0, workers=1,
+                  name="UK Counties"):
+    """Render zoom levels ``zooms[0]..zooms[1]`` of ``source`` into ``output``.
+
+    Returns the number of tiles written.
+    """
+    layer = TileLayer(source)
+    tiles = [tile for z in range(zooms[0], zooms[1] + 1) for tile in layer.occupied_tiles(z)]
+    batches = [tiles[i:i + TILE_BATCH] for i in range(0, len(tiles), TILE_BATCH)]
+
+    writer = MBTilesWriter(output) if output.endswith('.mbtiles') else DirectoryTileWriter(output)
+    written = 0
+    with tqdm(total=len(tiles), desc="Rendering tiles", unit="tile") as bar:
+        if workers == 1:
+            _init_worker(source)
+            results = (_render_batch(batch, scheme, linewidth) for batch in batches)
+            for batch, rendered in zip(batches, results):
+                for tile in rendered:
+                    writer.write(*tile)
+                written += len(rendered)
+                bar.update(len(batch))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(source,)) as pool:
+                futures = {pool.submit(_render_batch, batch, scheme, linewidth): len(batch)
+                           for batch in batches}
+                for future in as_completed(futures):
+                    rendered = future.result()
+                    for tile in rendered:
+                        writer.write(*tile)
+                    written += len(rendered)
+                    bar.update(futures[future])
+
+    writer.close({
+        "name": name,
+        "format": "png",
+        "type": "overlay",
+        "version": "1",
+        "minzoom": zooms[0],
+        "maxzoom": zooms[1],
+        "bounds": ",".join(f"{v:.6f}" for v in layer.lon_lat_bounds),
+    })
+    return written
+
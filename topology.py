@@ -0,0 +1,183 @@
+"""Shared-border topology for a boundary layer, TopoJSON-style.
+
+``Topology.from_geometries`` splits every polygon ring into arcs so each
+border between two counties is stored once and referenced by both:
+
+* all ring segments are collected in one vectorised pass and matched up
+  regardless of direction (coverage-simplified levels from
+  ``geometry_cache`` keep shared borders vertex-identical),
+* a vertex is a junction when its degree in the graph of unique segments
+  is not 2, i.e. where three areas meet or a border meets the coast,
+* rings are cut at their junctions; a ring without any (an island, or an
+  enclave inside a single neighbour) is one closed arc that starts at its
+  smallest vertex so both sides agree,
+* each arc is kept once; rings refer to it by index, ``~index`` when they
+  run the other way (the TopoJSON convention).
+
+The overview uses ``arc_coordinates`` to stroke each border exactly once on
+top of edge-less fills, and ``to_topojson`` writes a quantised, delta
+encoded TopoJSON file for web clients::
+
+    python topology.py data/Counties.gpkg --tolerance 125 -o counties.topojson
+"""
+import argparse
+import json
+
+import numpy as np
+import pyproj
+import shapely
+
+from geometry_cache import LOD_TOLERANCES, load_boundaries
+
+
+class Topology:
+    """Unique ``arcs`` plus, per ring, the arc references that rebuild it.
+
+    ``ring_part``/``part_geom`` map rings to polygon parts and parts to
+    input geometries; the first ring of each part is its exterior.
+    ``geometry_count`` is the number of input geometries, empty ones included.
+    """
+
+    def __init__(self, arcs, ring_arcs, ring_part, part_geom, crs=None, geometry_count=None):
+        self.arcs = arcs
+        self.ring_arcs = ring_arcs
+        self.ring_part = ring_part
+        self.part_geom = part_geom
+        self.crs = crs
+        if geometry_count is None:
+            geometry_count = int(part_geom.max()) + 1 if len(part_geom) else 0
+        self.geometry_count = geometry_count
+
+    @classmethod
+    def from_geometries(cls, geometries, crs=None):
+        geoms = shapely.orient_polygons(np.asarray(geometries, dtype=object))
+        parts, part_geom = shapely.get_parts(geoms, return_index=True)
+        rings, ring_part = shapely.get_rings(parts, return_index=True)
+        coords, vertex_ring = shapely.get_coordinates(rings, return_index=True)
+
+        # Vertex ids by exact coordinate, segment ids regardless of direction
+        points, vertex_id = np.unique(coords, axis=0, return_inverse=True)
+        vertex_id = vertex_id.ravel()
+        seg_start = np.flatnonzero(vertex_ring[:-1] == vertex_ring[1:])
+        ends = np.sort(np.column_stack([vertex_id[seg_start], vertex_id[seg_start + 1]]), axis=1)
+        edges, seg_id = np.unique(ends, axis=0, return_inverse=True)
+        seg_id = seg_id.ravel()
+        degree = np.bincount(edges.ravel(), minlength=len(points))
+        junction = degree != 2
+
+        # An arc is identified by its first and last segment, whichever side
+        # walks it; ``segs[k]`` joins ``ids[k]`` to the next vertex
+        arcs, arc_index, ring_arcs = [], {}, []
+        offsets = np.append(0, np.cumsum(np.bincount(vertex_ring, minlength=len(rings))))
+        for start, stop in zip(offsets[:-1], offsets[1:]):
+            ids = vertex_id[start:stop - 1]  # without the closing vertex
+            segs = seg_id[np.searchsorted(seg_start, start):np.searchsorted(seg_start, stop - 1)]
+            refs = []
+            ring_arcs.append(refs)
+            if len(ids) < 3:
+                continue
+            cuts = np.flatnonzero(junction[ids])
+            first = cuts[0] if len(cuts) else int(np.argmin(ids))
+            ids, segs = np.roll(ids, -first), np.roll(segs, -first)
+            cuts = np.append(cuts - first if len(cuts) else 0, len(ids))
+            for a, b in zip(cuts[:-1], cuts[1:]):
+                chain = np.append(ids[a:b], ids[b % len(ids)])
+                key = (min(segs[a], segs[b - 1]), max(segs[a], segs[b - 1]))
+                if key not in arc_index:
+                    arc_index[key] = len(arcs)
+                    arcs.append(chain)
+                    refs.append(arc_index[key])
+                    continue
+                stored = arcs[arc_index[key]]
+                same = stored[0] == chain[0] and stored[1] == chain[1]
+                refs.append(arc_index[key] if same else ~arc_index[key])
+
+        return cls([points[chain] for chain in arcs], ring_arcs, ring_part, part_geom, crs,
+                   len(geoms))
+
+    def __len__(self):
+        return len(self.arcs)
+
+    def arc_coordinates(self):
+        """Arc vertex arrays, each border once (e.g. for a ``LineCollection``)."""
+        return self.arcs
+
+    def vertex_count(self):
+        return sum(len(arc) for arc in self.arcs)
+
+    def geometry_rings(self, geom):
+        """Arc references of geometry ``geom`` as ``[[exterior, *holes], ...]`` per part."""
+        parts = np.flatnonzero(self.part_geom == geom)
+        return [[self.ring_arcs[ring] for ring in np.flatnonzero(self.ring_part == part)]
+                for part in parts]
+
+    def to_topojson(self, properties=None, object_name="counties", quantization=100_000,
+                    to_crs="EPSG:4326"):
+        """TopoJSON dict with one (Multi)Polygon per geometry.
+
+        Arcs are reprojected to ``to_crs`` (longitude/latitude, what web
+        clients expect), quantised onto a ``quantization`` grid and delta
+        encoded.  Empty geometries become null-type objects, so objects line
+        up with the input rows.  ``properties`` is an optional list of dicts,
+        one per geometry.
+        """
+        arcs = self.arcs
+        if to_crs is not None and self.crs is not None:
+            transformer = pyproj.Transformer.from_crs(self.crs, to_crs, always_xy=True)
+            arcs = [np.column_stack(transformer.transform(arc[:, 0], arc[:, 1])) for arc in arcs]
+
+        stacked = np.concatenate(arcs) if arcs else np.zeros((0, 2))
+        lo = stacked.min(axis=0) if len(stacked) else np.zeros(2)
+        span = np.maximum(stacked.max(axis=0) - lo, 1e-12) if len(stacked) else np.ones(2)
+        scale = span / (quantization - 1)
+        encoded = []
+        for arc in arcs:
+            q = np.round((arc - lo) / scale).astype(np.int64)
+            keep = np.append(True, np.any(q[1:] != q[:-1], axis=1))
+            q = q[keep] if keep.sum() >= 2 else q[[0, -1]]  # arcs keep both ends
+            encoded.append(np.vstack([q[:1], np.diff(q, axis=0)]).tolist())
+
+        geometries = []
+        for geom in range(self.geometry_count):
+            polygons = [rings for rings in self.geometry_rings(geom) if rings]  # not empty parts
+            if not polygons:
+                geometry = {"type": None}
+            elif len(polygons) == 1:
+                geometry = {"type": "Polygon", "arcs": polygons[0]}
+            else:
+                geometry = {"type": "MultiPolygon", "arcs": polygons}
+            if properties is not None:
+                geometry["properties"] = properties[geom]
+            geometries.append(geometry)
+
+        return {
+            "type": "Topology",
+            "transform": {"scale": scale.tolist(), "translate": lo.tolist()},
+            "objects": {object_name: {"type": "GeometryCollection", "geometries": geometries}},
+            "arcs": encoded,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a boundary layer as TopoJSON")
+    parser.add_argument("source", help="Boundary GeoPackage (or .zip)")
+    parser.add_argument("--tolerance", type=int, choices=LOD_TOLERANCES, default=125,
+                        help="Cached simplification level in metres")
+    parser.add_argument("--quantization", type=int, default=100_000)
+    parser.add_argument("-o", "--output", default="counties.topojson")
+    args = parser.parse_args()
+
+    gdf = load_boundaries(args.source, args.tolerance, columns=['code', 'name'])
+    topology = Topology.from_geometries(gdf.geometry.values, crs=gdf.crs)
+    properties = [{"code": code if isinstance(code, str) else None, "name": name}
+                  for code, name in zip(gdf['code'], gdf['name'])]
+    with open(args.output, 'w') as f:
+        json.dump(topology.to_topojson(properties, quantization=args.quantization), f,
+                  separators=(',', ':'))
+    ring_vertices = len(shapely.get_coordinates(gdf.geometry.values))
+    print(f"🧵 {len(topology)} arcs, {topology.vertex_count()} vertices "
+          f"(rings had {ring_vertices}): {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
 import geopandas as gpd
-import matplotlib.pyplot as plt
 import os
 
+from boundary_fetch import FetchError
+from county_index import find_name_column
+from geometry_cache import read_layer
+from render_engine import MapRenderer
+from source_probe import resolve
+
 print("Downloading real UK boundary data...")
 
 # Create data directory
@@ -28,11 +33,23 @@ sources = [
 
 success = False
 
-for source in sources:
+# Probe every source at once and download from the first healthy one; if
+# it turns out to be unreadable, resolve again among the others
+remaining = list(sources)
+
+while remaining:
+    try:
+        url, path = resolve([s['url'] for s in remaining], timeout=30)
+    except FetchError as e:
+        print(f"❌ {e}")
+        break
+    
+    source = next(s for s in remaining if s['url'] == url)
+    remaining.remove(source)
     print(f"\nTrying: {source['name']}")
     try:
-        # Read directly from URL
-        uk_gdf = gpd.read_file(source['url'])
+        # Read the downloaded (or verified local) copy from disk
+        uk_gdf = read_layer(path)
         
         print(f"✅ Success! Downloaded {len(uk_gdf)} areas")
         print(f"Columns available: {list(uk_gdf.columns)}")
@@ -42,12 +59,7 @@ for source in sources:
         
         # Find the best name column
         name_cols = ['name', 'NAME', 'Name', 'county', 'COUNTY', 'region', 'REGION']
-        name_col = None
-        
-        for col in name_cols:
-            if col in uk_gdf.columns:
-                name_col = col
-                break
+        name_col = find_name_column(uk_gdf, name_cols)
         
         if not name_col:
             name_col = uk_gdf.columns[0]  # Use first column as fallback
@@ -56,57 +68,48 @@ for source in sources:
         
         # Show first few area names
         print("Sample areas:")
-        for i in range(min(5, len(uk_gdf))):
-            area_name = uk_gdf.iloc[i][name_col]
+        for i, area_name in enumerate(uk_gdf[name_col].head(5).tolist()):
             print(f"  {i+1}. {area_name}")
         
         # Create visualization of first area
-        row = uk_gdf.iloc[0]
-        name = str(row[name_col])
+        name = str(uk_gdf[name_col].iat[0])
         print(f"\n🗺️ Creating map for: {name}")
         
-        # Create single area GeoDataFrame
-        area = gpd.GeoDataFrame([row], crs=uk_gdf.crs)
-        
         # Create the map
-        fig, ax = plt.subplots(figsize=(12, 10))
-        area.plot(ax=ax, color="lightcoral", edgecolor="darkred", linewidth=2)
+        renderer = MapRenderer(figsize=(12, 10))
+        renderer.add_geometries(uk_gdf.geometry.values[:1], color="lightcoral", edgecolor="darkred", linewidth=2)
+        renderer.frame(crs=uk_gdf.crs)
         
-        ax.set_title(f"Real UK Boundary: {name}", fontsize=18, pad=20, weight='bold')
-        ax.axis("off")
-        ax.set_facecolor('lightblue')  # Water/background color
+        renderer.set_title(f"Real UK Boundary: {name}", fontsize=18, pad=20, weight='bold')
+        renderer.ax.set_facecolor('lightblue')  # Water/background color
         
         # Add grid for context
-        ax.grid(True, alpha=0.3)
+        renderer.ax.grid(True, alpha=0.3)
         
         # Save the map
         os.makedirs("output_counties", exist_ok=True)
         safe_name = name.replace("/", "_").replace(" ", "_").replace("'", "")
         
         output_path = f"output_counties/{safe_name}_REAL.png"
-        plt.savefig(output_path, bbox_inches="tight", pad_inches=0.2, 
-                   dpi=300, facecolor='white', edgecolor='none')
+        renderer.save_fitted(output_path, pad_inches=0.2, 
+                             dpi=300, facecolor='white', edgecolor='none')
         
         print(f"💾 Map saved: {output_path}")
-        plt.show()
-        plt.close()
         
         # Create a overview map of all areas
         print("\n🌍 Creating overview map of all UK areas...")
-        fig, ax = plt.subplots(figsize=(15, 12))
-        uk_gdf.plot(ax=ax, color="lightgreen", edgecolor="white", linewidth=0.5)
+        overview = MapRenderer(figsize=(15, 12))
+        overview.add_coverage(uk_gdf.geometry.values, color="lightgreen", edgecolor="white", linewidth=0.5)
+        overview.frame(crs=uk_gdf.crs)
         
-        ax.set_title("All UK Administrative Areas", fontsize=20, pad=30, weight='bold')
-        ax.axis("off")
-        ax.set_facecolor('lightblue')
+        overview.set_title("All UK Administrative Areas", fontsize=20, pad=30, weight='bold')
+        overview.ax.set_facecolor('lightblue')
         
         overview_path = "output_counties/UK_All_Areas_Overview.png"
-        plt.savefig(overview_path, bbox_inches="tight", pad_inches=0.2, 
-                   dpi=300, facecolor='white')
+        overview.save_fitted(overview_path, pad_inches=0.2, 
+                             dpi=300, facecolor='white')
         
         print(f"💾 Overview map saved: {overview_path}")
-        plt.show()
-        plt.close()
         
         success = True
         break
@@ -149,17 +152,14 @@ if not success:
     # Visualize first test county
     row = test_gdf.iloc[0]
     name = row['name']
-    area = gpd.GeoDataFrame([row], crs=test_gdf.crs)
     
-    fig, ax = plt.subplots(figsize=(10, 8))
-    area.plot(ax=ax, color="gold", edgecolor="darkorange", linewidth=2)
-    ax.set_title(f"Realistic Test Shape: {name}", fontsize=16, weight='bold')
-    ax.axis("off")
+    renderer = MapRenderer(figsize=(10, 8))
+    renderer.add_geometries([row.geometry], color="gold", edgecolor="darkorange", linewidth=2)
+    renderer.frame(crs=test_gdf.crs)
+    renderer.set_title(f"Realistic Test Shape: {name}", fontsize=16, weight='bold')
     
-    plt.savefig(f"output_counties/{name}_RealisticTest.png", 
-               bbox_inches="tight", pad_inches=0.1, dpi=300)
-    plt.show()
-    plt.close()
+    renderer.save_fitted(f"output_counties/{name}_RealisticTest.png", 
+                         pad_inches=0.1, dpi=300)
     
     print(f"✅ Created realistic test data with {len(test_gdf)} areas")
 
@@ -1,38 +1,30 @@
-import geopandas as gpd
-import matplotlib.pyplot as plt
 import os
 import re
-import zipfile
-import requests
+from boundary_fetch import fetch
+from geometry_cache import load_boundaries
+from geometry_paths import PathBuffer
+from render_engine import MapRenderer
 
 # --- 1. Download ---
 url = "https://osdatahub.os.uk/downloads/open/BoundaryLine/GB/CountyUnitary.gpkg.zip"
-r = requests.get(url)
-with open("CountyUnitary.zip", "wb") as f:
-    f.write(r.content)
+fetch(url, "CountyUnitary.zip")  # no-op when the verified ZIP is already here
 
-# --- 2. Extract ---
-with zipfile.ZipFile("CountyUnitary.zip", "r") as zip_ref:
-    zip_ref.extractall("data")
-
-# --- 3. Load ---
-gdf = gpd.read_file("data/CountyUnitary.gpkg")
+# --- 2./3. Load straight from the ZIP ---
+gdf = load_boundaries("CountyUnitary.zip", columns=["name"])
 
 # --- 4. Create output folder ---
 os.makedirs("output_counties", exist_ok=True)
 
 # --- 5. Loop and save maps ---
-for _, row in gdf.iterrows():
-    name = row["CTYUA21NM"]  # adjust if column name differs
+paths = PathBuffer.from_geometries(gdf.geometry)
+renderer = MapRenderer(figsize=(6,6))
+for i, name in enumerate(gdf["name"].tolist()):
     safe_name = re.sub(r'[\\/*?:"<>|]', "_", name)
     
-    county = gpd.GeoDataFrame([row], crs=gdf.crs)
-    
-    fig, ax = plt.subplots(figsize=(6,6))
-    county.plot(ax=ax, color="skyblue", edgecolor="black")
-    ax.axis("off")
+    renderer.clear()
+    renderer.add_paths([paths.path(i)], paths.bounds[i], color="skyblue", edgecolor="black")
+    renderer.frame(crs=gdf.crs)
     
-    plt.savefig(f"output_counties/{safe_name}.png", bbox_inches="tight", pad_inches=0, dpi=300)
-    plt.close()
+    renderer.save_fitted(f"output_counties/{safe_name}.png", pad_inches=0, dpi=300)
 
 print("All county PNGs saved in output_counties/")
@@ -0,0 +1,131 @@
+"""SQLite work queue with leases, for spreading a batch over several machines.
+
+One database file holds the run's settings (``meta``) and one row per task.
+A worker ``claim``s the oldest runnable task, which leases it for
+``lease_s`` seconds; it then reports ``complete`` or ``fail``.  A failed
+task goes back to ``pending`` until it has been tried ``max_attempts``
+times, and a task whose lease ran out (a worker died mid-render) can be
+claimed again the same way.  Claims run in ``BEGIN IMMEDIATE``
+transactions, so two workers never get the same task.
+
+Put the file on a disk every worker can reach.  SQLite locking needs a
+local disk or a network filesystem with working POSIX locks; the rollback
+journal is used (not WAL) so that plain shared mounts work too.
+"""
+import json
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    error TEXT,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, id);
+"""
+
+STATUSES = ('pending', 'claimed', 'done', 'failed')
+DEFAULT_LEASE = 600.0
+DEFAULT_ATTEMPTS = 3
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """Tasks are JSON payloads; ``claim`` returns ``(task_id, payload)`` or ``None``."""
+
+    def __init__(self, path, timeout=60.0):
+        self.path = path
+        # Autocommit mode, so each method controls its own transaction
+        self.db = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, meta, payloads):
+        """Replace the queue's contents with a new run."""
+        now = time.time()
+        with self._transaction():
+            self.db.execute("DELETE FROM tasks")
+            self.db.execute("DELETE FROM meta")
+            self.db.executemany("INSERT INTO meta (key, value) VALUES (?, ?)",
+                                [(key, json.dumps(value)) for key, value in meta.items()])
+            self.db.executemany("INSERT INTO tasks (payload, updated) VALUES (?, ?)",
+                                [(json.dumps(payload), now) for payload in payloads])
+
+    def meta(self):
+        return {key: json.loads(value) for key, value in self.db.execute("SELECT key, value FROM meta")}
+
+    def claim(self, worker, lease_s=DEFAULT_LEASE, max_attempts=DEFAULT_ATTEMPTS):
+        now = time.time()
+        with self._transaction():
+            # Leases that ran out on their last attempt are given up on
+            self.db.execute("UPDATE tasks SET status = 'failed', error = 'lease expired', updated = ? "
+                            "WHERE status = 'claimed' AND lease_until < ? AND attempts >= ?",
+                            (now, now, max_attempts))
+            row = self.db.execute("SELECT id, payload FROM tasks "
+                                  "WHERE status = 'pending' OR (status = 'claimed' AND lease_until < ?) "
+                                  "ORDER BY id LIMIT 1", (now,)).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE tasks SET status = 'claimed', worker = ?, lease_until = ?, "
+                            "attempts = attempts + 1, updated = ? WHERE id = ?",
+                            (worker, now + lease_s, now, row[0]))
+        return row[0], json.loads(row[1])
+
+    def complete(self, task_id, worker):
+        """Mark a claimed task done; ``False`` if the lease was lost to another worker."""
+        cursor = self.db.execute("UPDATE tasks SET status = 'done', error = NULL, updated = ? "
+                                 "WHERE id = ? AND worker = ? AND status = 'claimed'",
+                                 (time.time(), task_id, worker))
+        return cursor.rowcount == 1
+
+    def fail(self, task_id, worker, error, max_attempts=DEFAULT_ATTEMPTS):
+        """Record a failed attempt: back to ``pending`` unless attempts are used up."""
+        cursor = self.db.execute("UPDATE tasks SET status = CASE WHEN attempts < ? THEN 'pending' "
+                                 "ELSE 'failed' END, error = ?, updated = ? "
+                                 "WHERE id = ? AND worker = ? AND status = 'claimed'",
+                                 (max_attempts, str(error), time.time(), task_id, worker))
+        return cursor.rowcount == 1
+
+    def counts(self):
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(self.db.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status"))
+        return counts
+
+    def tasks(self, status=None):
+        """``[(task_id, payload, status, error)]`` in submission order."""
+        query = "SELECT id, payload, status, error FROM tasks"
+        rows = (self.db.execute(query + " WHERE status = ? ORDER BY id", (status,)) if status
+                else self.db.execute(query + " ORDER BY id"))
+        return [(task_id, json.loads(payload), state, error) for task_id, payload, state, error in rows]
+
+    @contextmanager
+    def _transaction(self):
+        """Write lock taken up front, so concurrent claims queue instead of racing."""
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")